@@ -2,6 +2,7 @@ import json
 from typing import Optional, Any
 from langchain_core.tools import tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from tools.collector.service import acollector_mcp_connection
 from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
@@ -19,9 +20,11 @@ import time
 import asyncio
 from utils.db_cache import dump_message_json_log, check_analyzed_json_log, get_analyzed_json_log
 from utils.ai_log_manager import ai_log_manager
-from utils.replacement_rubric import check_replacement_rubric
+from utils.replacement_rubric import acheck_replacement_rubric
+from utils.classify_store import classify_key, lookup_classification, store_classification
 from tools.collector.collector import get_function_source
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 
 # 使用统一的模型实例
 model = get_model()
@@ -70,18 +73,7 @@ async def build_graph():
     # 用当前 globs.db_path 创建 MCP client，保证 GetFunctionInfo 等连到当前 testcase 的 DB（非默认）
     _client = MultiServerMCPClient(
         {
-            "lcmhal_collector": {
-                "command": "python",
-                "args": [
-                    "-m",
-                    "tools.collector.mcp_server",
-                    "--db-path",
-                    db_path,
-                    "--transport",
-                    "stdio"
-                ],
-                "transport": "stdio"
-            },
+            "lcmhal_collector": await acollector_mcp_connection(db_path),
         }
     )
 
@@ -185,7 +177,7 @@ async def build_graph():
             ai_log_manager.log_langgraph_node_start(agent_name, node_name, state, function_name)
         
         # Use the imported summary prompt to ensure LLM only summarizes and doesn't call tools
-        response = model_with_structured_output.invoke(
+        response = llm_limiter.invoke(model_with_structured_output,
             state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
         )
         current_fn = state.get("function_name", "")
@@ -252,7 +244,7 @@ async def build_graph():
         from utils.llm_usage import extract_usage_from_message
 
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
@@ -290,6 +282,21 @@ async def build_graph():
     _graph_key = key
     return _graph
 
+async def _recheck_shared_replacement(func_name: str, final_response: FunctionClassifyResponse) -> Optional[str]:
+    """共享结果来自其他 testcase：其中的替换代码在当前 testcase 中重新验证后才采纳（与新分类的采纳条件一致：
+    Rubric + 开启时的编译验证；no_feedback 实验只做 Rubric）。通过返回 None，否则返回原因"""
+    replacement = getattr(final_response, "function_replacement", "") or ""
+    if not getattr(final_response, "has_replacement", False) or not replacement.strip():
+        return None
+    if getattr(globs, "experiment_mode", "full") == "no_feedback":
+        original_code = get_function_source(globs.db_path, func_name) if globs.db_path else None
+        check_result = await acheck_replacement_rubric(func_name, replacement, original_code=original_code)
+        return None if check_result["pass"] else check_result["reason"]
+    from tools.builder.core import verify_replacement
+    result = await asyncio.to_thread(verify_replacement, func_name, replacement)
+    return None if result.get("pass") else result.get("reason", "verification failed")
+
+
 async def function_classify(func_name : str, overwrite: bool = False) -> FunctionClassifyResponse:
     # 检查函数是否已经分析过
     if check_analyzed(func_name) and not overwrite:
@@ -302,12 +309,36 @@ async def function_classify(func_name : str, overwrite: bool = False) -> Functio
         except Exception as e:
             print(f"[FunctionClassifier] 读取缓存失败 {func_name}: {e}，将重新分析", flush=True)
             return await function_classify(func_name, overwrite=True)
+    # 其他 testcase 中分类过内容相同的函数（函数体与直接上下文一致）时直接复用，见 utils.classify_store
+    system_prompt = _classifier_system_prompt()
+    try:
+        shared_key = classify_key(func_name, system_prompt)
+    except Exception as e:
+        print(f"[FunctionClassifier] 计算共享分类 key 失败 {func_name}: {e}", flush=True)
+        shared_key = None
+    if not overwrite:
+        shared = lookup_classification(shared_key)
+        if shared is not None:
+            try:
+                final_response = FunctionClassifyResponse(**{**shared["final_response"], "function_name": func_name})
+            except Exception as e:
+                print(f"[FunctionClassifier] 共享分类结果无效 {func_name}: {e}，将重新分析", flush=True)
+            else:
+                provenance = shared.get("provenance", {})
+                reason = await _recheck_shared_replacement(func_name, final_response)
+                if reason is not None:
+                    print(f"[FunctionClassifier] 共享分类结果的替换在当前 testcase 中未通过验证 {func_name}: {reason}，将重新分析", flush=True)
+                else:
+                    print(f"[FunctionClassifier] 复用共享分类结果: {func_name} (来自 {provenance.get('db_path', '?')})", flush=True)
+                    if globs.ai_log_enable:
+                        dump_message_json_log("function_classify", {"messages": [], "final_response": final_response})
+                    return final_response
     # 构建graph
     graph = await build_graph()
     # llm 调用
     initial_state = {
         "messages": [
-            {"role": "system", "content": _classifier_system_prompt()},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"Classify the function : {func_name}"}
         ],
         "function_name": func_name
@@ -325,7 +356,7 @@ async def function_classify(func_name : str, overwrite: bool = False) -> Functio
         # Rubric check: if classifier produced a replacement, validate it before use
         if getattr(final_response, "has_replacement", False) and getattr(final_response, "function_replacement", "").strip():
             original_code = get_function_source(globs.db_path, func_name) if globs.db_path else None
-            check_result = check_replacement_rubric(
+            check_result = await acheck_replacement_rubric(
                 func_name,
                 final_response.function_replacement,
                 original_code=original_code,
@@ -335,6 +366,9 @@ async def function_classify(func_name : str, overwrite: bool = False) -> Functio
                 d = final_response.model_dump()
                 d["replacement_check_reason"] = check_result["reason"]
                 final_response = FunctionClassifyResponse(**d)
+        # 只共享 rubric 通过的结果
+        if final_response is not None and not getattr(final_response, "replacement_check_reason", None):
+            store_classification(shared_key, final_response.model_dump(), func_name)
         return final_response
     except Exception as e:
         from langgraph.errors import GraphRecursionError
@@ -389,7 +423,8 @@ def _raw_function_type_from_classify_log(func_name: str) -> Optional[str]:
 
 
 def _analyze_max_concurrent() -> Optional[int]:
-    """并发上限：环境变量 LCMHAL_ANALYZE_MAX_CONCURRENT；未设置时默认 8；0 或负数表示不限制。"""
+    """并发上限：环境变量 LCMHAL_ANALYZE_MAX_CONCURRENT；未设置时默认 8；0 或负数表示不限制。
+    实际的模型调用并发再由 utils.llm_limiter 控制，只会比这个上限更低。"""
     raw = os.environ.get("LCMHAL_ANALYZE_MAX_CONCURRENT", "").strip()
     if raw == "":
         return 8
@@ -405,13 +440,13 @@ def _analyze_max_concurrent() -> Optional[int]:
 async def analyze_functions(function_list):
     mmio_info_list = {}
     max_retries = 3
-    retry_delay = 1
     max_c = _analyze_max_concurrent()
     nfn = len(function_list)
     if max_c is None:
         print(f"[analyze_functions] classifying {nfn} functions (LCMHAL_ANALYZE_MAX_CONCURRENT=0: unlimited concurrency)")
     else:
         print(f"[analyze_functions] classifying {nfn} functions (max concurrent: {max_c}, env LCMHAL_ANALYZE_MAX_CONCURRENT)")
+    print(f"[analyze_functions] LLM concurrency: {llm_limiter.stats()}")
 
     async def _classify_with_retry(fn: str):
         for attempt in range(max_retries):
@@ -429,7 +464,7 @@ async def analyze_functions(function_list):
                     f"(attempt {attempt + 1}/{max_retries}): {exc}"
                 )
             if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
+                await asyncio.sleep(llm_limiter.backoff_delay(attempt))
         return None
 
     if max_c is None:
@@ -446,6 +481,7 @@ async def analyze_functions(function_list):
 
     tasks = [_run(func_name) for func_name in function_list]
     results = await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"[analyze_functions] LLM concurrency after run: {llm_limiter.stats()}")
     
     for func_name, result in zip(function_list, results):
         if isinstance(result, Exception):
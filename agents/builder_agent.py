@@ -1,6 +1,7 @@
 from langchain.chat_models import init_chat_model
 from langchain_core.tools import tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from tools.collector.service import acollector_mcp_connection
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage
@@ -13,6 +14,7 @@ import time
 from utils.db_cache import dump_message_json_log, check_analyzed_json_log
 from utils.ai_log_manager import ai_log_manager
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 from tools.builder.core import init_builder
 from tools.builder.tool import build_project, get_replace_func_details_by_file, update_function_replacement, get_function_analysis_and_replacement, get_function_analysis_and_replacement_formatted
 from agents.builder_fixer_agent import builder_fixer_agent
@@ -40,20 +42,7 @@ async def build_graph():
     # Set up MCP client
     client = MultiServerMCPClient(
         {
-            "lcmhal_collector": {
-                    "command": "python",
-                    # Make sure to update to the full absolute path to your math_server.py file
-                    "args": [
-                        "-m",
-                        "tools.collector.mcp_server",
-                        "--db-path",
-                        globs.db_path,
-                        "--transport",
-                        "stdio"
-                    ],
-                    # "cwd": "/home/haojie/workspace/lcmhalmcp",
-                    "transport": "stdio"
-                },
+            "lcmhal_collector": await acollector_mcp_connection(globs.db_path),
             # "lcmhal_builder": {
             #     "command": "python",
             #     # Make sure to update to the full absolute path to your math_server.py file
@@ -128,7 +117,7 @@ async def build_graph():
             ai_log_manager.log_langgraph_node_start(agent_name, node_name, state, function_name)
         
         # Use the imported summary prompt to ensure LLM only summarizes and doesn't call tools
-        response = model_with_structured_output.invoke(
+        response = llm_limiter.invoke(model_with_structured_output,
             state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
         )
         # We return the final answer
@@ -180,7 +169,7 @@ async def build_graph():
         from utils.llm_usage import extract_usage_from_message
 
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
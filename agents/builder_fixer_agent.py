@@ -13,6 +13,7 @@ import time
 from utils.ai_log_manager import ai_log_manager
 from utils.llm_usage import extract_usage_from_message
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 from tools.builder.core import init_builder, build_project as core_build_project
 from tools.builder.tool import (
     build_project,
@@ -81,7 +82,7 @@ async def build_graph():
         response = None
         for _ in range(max_retries):
             try:
-                response = model_with_structured_output.invoke(
+                response = llm_limiter.invoke(model_with_structured_output,
                     state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
                 )
                 break
@@ -118,7 +119,7 @@ async def build_graph():
             )
         messages = state["messages"]
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
@@ -1,4 +1,5 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from tools.collector.service import acollector_mcp_connection
 from langchain.chat_models import init_chat_model
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
@@ -12,38 +13,11 @@ import time
 from utils.db_cache import dump_message_json_log, check_analyzed_json_log
 from utils.ai_log_manager import ai_log_manager
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 
 # 使用统一的模型实例
 model = get_model()
 
-# Set up MCP client
-client = MultiServerMCPClient(
-    {
-        # using connection
-        # "lcmhal_collector": {
-        #     # make sure you start your weather server on port 8000
-        #     "url": "http://localhost:8112/mcp/",
-        #     "transport": "streamable_http",
-        # },
-        "lcmhal_collector": {
-            "command": "python",
-            # Make sure to update to the full absolute path to your math_server.py file
-            "args": [
-                "-m",
-                "tools.collector.mcp_server",
-                "--db-path",
-                globs.db_path,
-                "--transport",
-                "stdio"
-            ],
-            # "cwd": "/home/haojie/workspace/lcmhalmcp",
-            "transport": "stdio"
-        },
-
-        # using stdio
-    }
-)
-
 class AgentState(MessagesState):
     # Final structured response from the agent
     final_response: DriverDirLocatorResponse
@@ -84,6 +58,21 @@ async def build_graph():
     if _graph is not None:
         return _graph
     
+    # Set up MCP client（构建 graph 时才解析连接：共享模式下可能要等待服务启动，不能在 import 时阻塞）
+    client = MultiServerMCPClient(
+        {
+            # using connection
+            # "lcmhal_collector": {
+            #     # make sure you start your weather server on port 8000
+            #     "url": "http://localhost:8112/mcp/",
+            #     "transport": "streamable_http",
+            # },
+            "lcmhal_collector": await acollector_mcp_connection(globs.db_path),
+
+            # using stdio
+        }
+    )
+
     # 异步获取工具
     tools = await client.get_tools()
 
@@ -129,7 +118,7 @@ async def build_graph():
             ai_log_manager.log_langgraph_node_start(agent_name, node_name, state, function_name)
         
         # Use the imported summary prompt to ensure LLM only summarizes and doesn't call tools
-        response = model_with_structured_output.invoke(
+        response = llm_limiter.invoke(model_with_structured_output,
             state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
         )
         # We return the final answer
@@ -162,7 +151,7 @@ async def build_graph():
         from utils.llm_usage import extract_usage_from_message
 
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
@@ -16,6 +16,7 @@ import time
 from utils.db_cache import dump_message_json_log, check_analyzed_json_log, dump_message_raw_log
 from utils.ai_log_manager import ai_log_manager
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 from agents.builder_agent import builder_agent
 from agents.fixer_agent import fixer_agent
 
@@ -114,7 +115,7 @@ async def build_graph():
             ai_log_manager.log_langgraph_node_start(agent_name, node_name, state, function_name)
         
         # Use the imported summary prompt to ensure LLM only summarizes and doesn't call tools
-        response = model_with_structured_output.invoke(
+        response = llm_limiter.invoke(model_with_structured_output,
             state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
         )
         # We return the final answer
@@ -158,7 +159,7 @@ async def build_graph():
         from utils.llm_usage import extract_usage_from_message
 
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
@@ -1,6 +1,7 @@
 from langchain.chat_models import init_chat_model
 from langchain_core.tools import tool
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from tools.collector.service import acollector_mcp_connection
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage
@@ -15,6 +16,7 @@ import time
 from utils.db_cache import dump_message_json_log, check_analyzed_json_log, dump_json_log
 from utils.ai_log_manager import ai_log_manager
 import config.globs as globs
+from utils.llm_limiter import llm_limiter
 from tools.builder.core import init_builder
 from tools.builder.tool import build_project, get_replace_func_details_by_file, update_function_replacement, get_function_analysis_and_replacement
 from tools.emulator.tool import emulate_proj, mmio_function_emulate_info, function_calls_emulate_info
@@ -43,20 +45,7 @@ async def build_graph():
     client = MultiServerMCPClient(
         {
             # # Emulator 执行模拟器，获取错误反馈
-            "lcmhal_collector": {
-                "command": "python",
-                # Make sure to update to the full absolute path to your math_server.py file
-                "args": [
-                    "-m",
-                    "tools.collector.mcp_server",
-                    "--db-path",
-                    globs.db_path,
-                    "--transport",
-                    "stdio"
-                ],
-                # "cwd": "/home/haojie/workspace/lcmhalmcp",
-                "transport": "stdio"
-            },
+            "lcmhal_collector": await acollector_mcp_connection(globs.db_path),
             # "lcmhal_emulator": {
             #     "command": "python",
             #     # Make sure to update to the full absolute path to your math_server.py file
@@ -154,7 +143,7 @@ async def build_graph():
         
         while retry_count < max_retries and response is None:
             try:
-                response = model_with_structured_output.invoke(
+                response = llm_limiter.invoke(model_with_structured_output,
                     state["messages"] + [HumanMessage(content=SUMMARY_PROMPT)]
                 )
                 # We return the final answer
@@ -205,7 +194,7 @@ async def build_graph():
         from utils.llm_usage import extract_usage_from_message
 
         t0 = time.perf_counter()
-        response = await model_with_tools.ainvoke(messages)
+        response = await llm_limiter.ainvoke(model_with_tools, messages)
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         if getattr(globs, "llm_usage_log_enable", False):
             ai_log_manager.append_llm_usage_record(
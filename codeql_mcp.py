@@ -1,29 +1,78 @@
+import asyncio
 import time
 import re
 import os
 import json
+import logging
 import subprocess
 import threading
 import uuid
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
 from pathlib import Path
 from utils.db_lock import remove_db_lock
+from utils.env import env_int
+from utils.query_compile_cache import ensure_compiled, server_args
 from utils.log import logger
 # CODEQL_PATH = "/home/haojie/test/codeql/codeql"
 CODEQL_PATH = "codeql"
 
+# 同一个 query-server 上同时在途的 evaluation/runQuery 上限，超出的请求在客户端排队
+DEFAULT_MAX_IN_FLIGHT = env_int("LCMHAL_QUERY_SERVER_MAX_INFLIGHT", 8)
+# 分页解码 BQRS 时每页的行数，单页 JSON 的大小与结果总量无关
+DEFAULT_BQRS_PAGE_ROWS = max(env_int("LCMHAL_BQRS_PAGE_ROWS", 5000), 1)
+
+
+def _disk_cache_args():
+    """LCMHAL_QUERY_SERVER_DISK_CACHE_MB：query-server 中间结果磁盘缓存上限（--max-disk-cache，MB），未设置时用 CodeQL 默认值"""
+    disk_cache_mb = env_int("LCMHAL_QUERY_SERVER_DISK_CACHE_MB", 0)
+    return [f"--max-disk-cache={disk_cache_mb}"] if disk_cache_mb > 0 else []
+
+
+class QueryServerError(RuntimeError):
+    """query-server 返回的 JSON-RPC error，或进程退出导致请求无法完成"""
+
+    def __init__(self, message, code=None, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+def _debug_enabled():
+    return logger.isEnabledFor(logging.DEBUG)
+
+
 class CodeQLQueryServer:
-    def __init__(self, codeql_path=CODEQL_PATH):
+    """
+    query-server2 的 JSON-RPC 客户端：每个请求对应一个 concurrent.futures.Future，
+    由读线程按 id 完成（result / error / 进程退出），请求之间互不阻塞。
+    同步调用方用 future.result()，asyncio 调用方用 *_async 方法。
+    """
+
+    def __init__(self, codeql_path=CODEQL_PATH, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
         self.registered_dbs = set()
         self.codeql_path = codeql_path
         self.proc = None
         self.reader_thread = None
+        self.stderr_thread = None
+        # id -> (Future, progressId)
         self.pending = {}
         self.running = True
         self.id_counter = 1
         self.progress_id = 0
         self.progress_callbacks = {}
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self._eval_in_flight = 0
+        # 等待发送的 evaluation 请求：(Future, method, params, progress_callback)
+        self._eval_queue = deque()
+        # 保护 id 分配、pending 表、排队队列以及 stdin 写入
+        self._lock = threading.RLock()
+        # query-server 以共享编译缓存启动时才需要预编译（见 utils.query_compile_cache）
+        self.shares_compile_cache = False
 
     def start(self):
+        compile_cache_args = server_args(self.codeql_path)
+        self.shares_compile_cache = bool(compile_cache_args)
         self.proc = subprocess.Popen(
             [
                 self.codeql_path,
@@ -36,6 +85,8 @@ class CodeQLQueryServer:
                 "5",
                 "-v",
                 "--log-to-stderr",
+                *compile_cache_args,
+                *_disk_cache_args(),
             ],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
@@ -52,109 +103,221 @@ class CodeQLQueryServer:
         )
         self.stderr_thread.start()
 
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
     def _stderr_loop(self):
         while self.running:
-            line = self.proc.stderr.readline()
-            # For debugging
-            if line:
-                try:
-                    logger.info(f"[CodeQL stderr] {line.strip()}")
-                except ValueError:
-                    # Handle the case where stderr is closed
-                    break
+            try:
+                line = self.proc.stderr.readline()
+            except ValueError:
+                # Handle the case where stderr is closed
+                break
+            if not line:
+                break
+            # evaluator 日志量很大，只在 DEBUG 时输出
+            if _debug_enabled():
+                logger.debug("[CodeQL stderr] %s", line.rstrip())
 
     def _read_loop(self):
-        logger.info("[*] Read loop started")
+        logger.debug("[*] Read loop started")
         while self.running:
-            line = self.proc.stdout.readline()
+            try:
+                line = self.proc.stdout.readline()
+            except ValueError:
+                break
             if not line:
-                logger.info("[*] Read loop: EOF or closed stdout")
+                logger.debug("[*] Read loop: EOF or closed stdout")
                 break
-            logger.info(f"[stdout] {line.strip()}")
             if line.startswith("Content-Length:"):
                 try:
                     length = int(line.strip().split(":")[1])
-                    blank = self.proc.stdout.readline()
+                    self.proc.stdout.readline()
                     content = self.proc.stdout.read(length)
-                    logger.info(f"[raw response body] {content.strip()}")
                     message = json.loads(content)
+                except Exception as e:
+                    logger.warning(f"[!] Failed to parse message: {e}")
+                    continue
+                try:
                     self._handle_message(message)
                 except Exception as e:
-                    logger.info(f"[!] Failed to parse message: {e}")
+                    logger.warning(f"[!] Failed to handle message: {e}")
+        self._fail_all_pending(QueryServerError("CodeQL query-server exited"))
+
+    def _fail_all_pending(self, error):
+        with self._lock:
+            entries = list(self.pending.values())
+            self.pending.clear()
+            queued = list(self._eval_queue)
+            self._eval_queue.clear()
+            self.progress_callbacks.clear()
+            self._eval_in_flight = 0
+        for future, _ in entries:
+            if not future.done():
+                future.set_exception(error)
+        for future, *_ in queued:
+            if not future.done():
+                future.set_exception(error)
 
     def _handle_message(self, message):
-        logger.info(f"\n[←] Received response:\n{json.dumps(message, indent=2)}\n")
+        if _debug_enabled():
+            logger.debug("[←] %s", json.dumps(message))
 
-        if message.get("method") == "ql/progressUpdated":
+        method = message.get("method")
+        if method == "ql/progressUpdated":
             params = message.get("params", {})
-            progress_id = params.get("id")
-            callback = self.progress_callbacks.get(progress_id)
+            callback = self.progress_callbacks.get(params.get("id"))
             if callback:
                 callback(params)
-            else:
-                logger.info(
-                    f"[ql-progress:{progress_id}] step={params.get('step')} / {params.get('maxStep')}"
-                )
             return
 
-        if "method" in message and message["method"] == "evaluation/progress":
-            progress_id = message["params"].get("progressId")
-            msg = message["params"].get("message")
-            callback = self.progress_callbacks.get(progress_id)
+        if method == "evaluation/progress":
+            params = message.get("params", {})
+            callback = self.progress_callbacks.get(params.get("progressId"))
             if callback:
-                callback(msg)
-            else:
-                logger.info(f"[progress:{progress_id}] {msg}")
+                callback(params.get("message"))
             return
 
-        if "id" in message and "result" in message:
-            request_id = message["id"]
-            if request_id in self.pending:
-                callback, progress_id = self.pending[request_id]
-                callback(message["result"])
-                del self.pending[request_id]
-                if progress_id in self.progress_callbacks:
-                    del self.progress_callbacks[progress_id]
-        elif "id" in message and "error" in message:
-            logger.info(
-                f"[!] Error response to request {message['id']}:\n{json.dumps(message['error'], indent=2)}"
-            )
+        if "id" not in message:
+            return
+        with self._lock:
+            entry = self.pending.pop(message["id"], None)
+            if entry is not None:
+                self.progress_callbacks.pop(entry[1], None)
+        if entry is None:
+            return
+        future = entry[0]
+        if future.done():
+            # 已被取消：query-server 到这时才真正停止执行
+            if getattr(future, "is_evaluation", False):
+                self._release_evaluation_slot()
+            return
+        try:
+            if "error" in message:
+                error = message["error"] or {}
+                future.set_exception(QueryServerError(
+                    error.get("message", "Unknown error"), error.get("code"), error.get("data"),
+                ))
+            else:
+                future.set_result(message.get("result"))
+        except InvalidStateError:
+            # 回复到达的同时被取消
+            if getattr(future, "is_evaluation", False):
+                self._release_evaluation_slot()
 
     def _send(self, payload):
         if not self.proc or not self.proc.stdin:
-            logger.info("[!] Tried to send but process not running.")
-            return
+            raise QueryServerError("CodeQL query-server is not running")
 
         data = json.dumps(payload)
         content = f"Content-Length: {len(data)}\r\n\r\n{data}"
-        logger.info(f"\n[→] Sending request:\n{json.dumps(payload, indent=2)}\n")
-        self.proc.stdin.write(content)
-        self.proc.stdin.flush()
-
-    def send_request(self, method, params, callback, progress_callback=None):
+        if _debug_enabled():
+            logger.debug("[→] %s", data)
+        with self._lock:
+            self.proc.stdin.write(content)
+            self.proc.stdin.flush()
+
+    def next_progress_id(self):
+        with self._lock:
+            progress_id = self.progress_id
+            self.progress_id += 1
+            return progress_id
+
+    def _dispatch(self, future, method, params, progress_callback):
+        """分配 id 并写入 stdin；调用方需持有 self._lock"""
         req_id = self.id_counter
         self.id_counter += 1
+        progress_id = params.get("progressId") if isinstance(params, dict) else None
+        if progress_id is not None and progress_callback is not None:
+            self.progress_callbacks[progress_id] = progress_callback
+        self.pending[req_id] = (future, progress_id)
+        future.request_id = req_id
+        try:
+            self._send({
+                "jsonrpc": "2.0",
+                "id": req_id,
+                "method": method,
+                "params": params,
+            })
+        except Exception as e:
+            self.pending.pop(req_id, None)
+            self.progress_callbacks.pop(progress_id, None)
+            future.set_exception(e if isinstance(e, QueryServerError) else QueryServerError(str(e)))
+
+    def _on_request_done(self, future):
+        if not future.cancelled():
+            return
+        # 取消：尚未发送的直接出队，已发送的通知 query-server 停止；
+        # pending 中的记录保留到 query-server 回复为止（evaluation 的名额在回复时才释放）
+        with self._lock:
+            req_id = getattr(future, "request_id", None)
+            if req_id is None:
+                self._eval_queue = deque(item for item in self._eval_queue if item[0] is not future)
+                return
+            entry = self.pending.get(req_id)
+            if entry is not None:
+                self.progress_callbacks.pop(entry[1], None)
+        if entry is not None:
+            try:
+                self._send({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": req_id}})
+            except QueryServerError:
+                pass
+
+    def send_request(self, method, params, callback=None, progress_callback=None):
+        """发送请求并返回 Future；callback 仅在成功时以 result 调用（兼容旧接口）"""
+        future = Future()
+        if callback is not None:
+            def _invoke(f):
+                if not f.cancelled() and f.exception() is None:
+                    callback(f.result())
+            future.add_done_callback(_invoke)
+        future.add_done_callback(self._on_request_done)
+        with self._lock:
+            self._dispatch(future, method, params, progress_callback)
+        return future
+
+    def _submit_evaluation(self, method, params, progress_callback=None):
+        """evaluation 请求受 max_in_flight 限制，超出部分排队，完成一个发送一个（不阻塞调用线程）"""
+        future = Future()
+        future.is_evaluation = True
+        future.add_done_callback(self._on_request_done)
+        future.add_done_callback(self._on_evaluation_done)
+        with self._lock:
+            if self._eval_in_flight < self.max_in_flight:
+                self._eval_in_flight += 1
+                self._dispatch(future, method, params, progress_callback)
+            else:
+                self._eval_queue.append((future, method, params, progress_callback))
+        return future
 
-        if isinstance(params, dict) and "progressId" in params:
-            self.progress_callbacks[params["progressId"]] = progress_callback
-
-        payload = {
-            "jsonrpc": "2.0",
-            "id": req_id,
-            "method": method,
-            "params": params,
-        }
-
-        self.pending[req_id] = (
-            callback,
-            params.get("progressId") if isinstance(params, dict) else None,
-        )
-        self._send(payload)
+    def _on_evaluation_done(self, future):
+        if getattr(future, "request_id", None) is None:
+            # 排队中被取消，从未占用名额
+            return
+        if future.cancelled() and self.is_alive():
+            # 已发送后被取消：query-server 可能还在执行，收到它的回复时再释放名额（见 _handle_message）
+            return
+        self._release_evaluation_slot()
+
+    def _release_evaluation_slot(self):
+        with self._lock:
+            self._eval_in_flight = max(self._eval_in_flight - 1, 0)
+            while self._eval_queue and self._eval_in_flight < self.max_in_flight:
+                queued, method, params, progress_callback = self._eval_queue.popleft()
+                if queued.done():
+                    continue
+                self._eval_in_flight += 1
+                self._dispatch(queued, method, params, progress_callback)
 
     def stop(self):
         self.running = False
         if self.proc:
             self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self._fail_all_pending(QueryServerError("CodeQL query-server stopped"))
 
     def find_class_identifier_position(self, filepath, class_name):
         """
@@ -211,30 +374,33 @@ class CodeQLQueryServer:
                 self.registered_dbs.add(db_path)  # 使用add而不是append
                 new_dbs.append(db_path)
             else:
-                logger.info(f"[!] Database {db_path} already registered.")
+                logger.debug(f"[!] Database {db_path} already registered.")
         # 修复：在每个数据库路径上调用remove_db_lock
         for db_path in new_dbs:
             remove_db_lock(db_path)
         # 如果没有新的数据库需要注册，直接返回
         if len(new_dbs) == 0:
-            logger.info("[INFO] No new databases to register.")
+            logger.debug("[INFO] No new databases to register.")
             # return
         
-        progress_id = self.progress_id
-        self.progress_id += 1
+        progress_id = self.next_progress_id()
 
         params = {"body": {"databases": new_dbs}, "progressId": progress_id}
 
-        logger.info(
-            f"[DEBUG] Sending evaluation/registerDatabases with progressId={progress_id}"
-        )
-        self.send_request(
+        future = self.send_request(
             "evaluation/registerDatabases",
             params,
-            callback or (lambda r: logger.info("[registerDatabases] done:", r)),
+            callback,
             progress_callback=progress_callback,
         )
 
+        def _on_failed(f):
+            # 注册失败时允许下次重试
+            if f.cancelled() or f.exception() is not None:
+                self.registered_dbs.difference_update(new_dbs)
+        future.add_done_callback(_on_failed)
+        return future
+
     def deregister_databases(
         self, db_paths, callback=None, progress_callback=None
     ):
@@ -247,27 +413,57 @@ class CodeQLQueryServer:
                 self.registered_dbs.discard(db_path)  # 使用discard而不是remove
                 removed_dbs.append(db_path)
             else:
-                logger.info(f"[!] Database {db_path} not registered.")
+                logger.debug(f"[!] Database {db_path} not registered.")
         
         # 如果没有数据库需要注销，直接返回
         if not removed_dbs:
-            return
+            return None
             
-        progress_id = self.progress_id
-        self.progress_id += 1
+        progress_id = self.next_progress_id()
 
         params = {"body": {"databases": removed_dbs}, "progressId": progress_id}
 
-        logger.info(
-            f"[DEBUG] Sending evaluation/deregisterDatabases with progressId={progress_id}"
-        )
-        self.send_request(
+        return self.send_request(
             "evaluation/deregisterDatabases",
             params,
-            callback or (lambda r: logger.info(f"[deregisterDatabases] done: {r}")),
+            callback,
             progress_callback=progress_callback,
         )
 
+    @staticmethod
+    def _check_run_result(result):
+        """runQuery 的 result 中 resultType != 0 表示评估失败，转为异常"""
+        if not isinstance(result, dict) or result.get("resultType") != 0:
+            message = result.get("message", "Unknown error") if isinstance(result, dict) else result
+            raise QueryServerError(f"CodeQL evaluation failed: {message}")
+        return result
+
+    def _chain_checked(self, raw, callback=None):
+        """把 runQuery 的原始 Future 转为“失败即异常”的 Future，取消会回传给原始请求"""
+        checked = Future()
+
+        def _done(f):
+            if checked.done():
+                return
+            if f.cancelled():
+                checked.cancel()
+                return
+            try:
+                checked.set_result(self._check_run_result(f.result()))
+            except Exception as e:
+                checked.set_exception(e)
+                return
+            if callback is not None:
+                callback(checked.result())
+
+        def _propagate_cancel(f):
+            if f.cancelled():
+                raw.cancel()
+
+        raw.add_done_callback(_done)
+        checked.add_done_callback(_propagate_cancel)
+        return checked
+
     def evaluate_queries(
         self,
         query_path,
@@ -275,13 +471,15 @@ class CodeQLQueryServer:
         output_path,
         callback=None,
         progress_callback=None,
+        progress_id=None,
     ):
+        """提交 evaluation/runQuery，返回 Future（结果为 runQuery 的 result，失败时为 QueryServerError）"""
         db = str(Path(db_path).resolve())
         query_path = str(Path(query_path).resolve())
         output_path = str(Path(output_path).resolve())
 
-        progress_id = self.progress_id
-        self.progress_id += 1
+        if progress_id is None:
+            progress_id = self.next_progress_id()
 
         params = {
             "body": {
@@ -296,33 +494,26 @@ class CodeQLQueryServer:
             "progressId": progress_id,
         }
 
-        def on_done(result):
-            logger.info(f"[evaluateQueries] done: {result}")
-            if result.get("resultType") != 0:
-                raise RuntimeError(
-                    f"CodeQL evaluation failed: {result.get('message', 'Unknown error')}"
-                )
-
-        logger.info(
-            f"[DEBUG] Sending evaluation/runQuery with progressId={progress_id}"
+        logger.debug(f"[evaluateQueries] {query_path} progressId={progress_id}")
+        raw = self._submit_evaluation("evaluation/runQuery", params, progress_callback)
+        return self._chain_checked(raw, callback)
+
+    def evaluate_and_wait(self, query_path, db_path, output_path, timeout=None):
+        """同步等待一次评估完成；失败抛出 QueryServerError（RuntimeError 子类）"""
+        # 先确保查询已在共享编译缓存中（见 utils.query_compile_cache），runQuery 不再重新编译
+        if self.shares_compile_cache:
+            ensure_compiled(str(query_path), self.codeql_path)
+        self.evaluate_queries(query_path, db_path, output_path).result(timeout)
+        logger.debug("[evaluate_and_wait] Query completed.")
+
+    async def evaluate_async(self, query_path, db_path, output_path, progress_callback=None):
+        """asyncio 版本；task 被取消时会向 query-server 发送 $/cancelRequest"""
+        if self.shares_compile_cache:
+            await asyncio.to_thread(ensure_compiled, str(query_path), self.codeql_path)
+        return await asyncio.wrap_future(
+            self.evaluate_queries(query_path, db_path, output_path, progress_callback=progress_callback)
         )
 
-        self.send_request(
-            "evaluation/runQuery",
-            params,
-            callback or on_done,
-            progress_callback=progress_callback,
-        )
-
-    def evaluate_and_wait(self, query_path, db_path, output_path):
-        progress_id = self.progress_id
-        progress_cb, done = self.wait_for_progress_done(progress_id)
-        self.evaluate_queries(
-            query_path, db_path, output_path, progress_callback=progress_cb
-        )
-        done.wait()
-        logger.info("[evaluate_and_wait] Query completed.")
-
     def quick_evaluate_and_wait(
         self,
         query_path,
@@ -332,9 +523,8 @@ class CodeQLQueryServer:
         start_col,
         end_line,
         end_col,
+        timeout=None,
     ):
-        progress_id = self.progress_id
-        progress_cb, done = self.wait_for_progress_done(progress_id)
         self.quick_evaluate(
             query_path,
             db_path,
@@ -343,10 +533,22 @@ class CodeQLQueryServer:
             start_col,
             end_line,
             end_col,
-            progress_callback=progress_cb,
-        )
-        done.wait()
-        logger.info("[evaluate_and_wait] Query completed.")
+        ).result(timeout)
+        logger.debug("[quick_evaluate_and_wait] Query completed.")
+
+    async def quick_evaluate_async(
+        self,
+        query_path,
+        db_path,
+        output_path,
+        start_line,
+        start_col,
+        end_line,
+        end_col,
+    ):
+        return await asyncio.wrap_future(self.quick_evaluate(
+            query_path, db_path, output_path, start_line, start_col, end_line, end_col,
+        ))
 
     def quick_evaluate(
         self,
@@ -359,9 +561,10 @@ class CodeQLQueryServer:
         end_col,
         callback=None,
         progress_callback=None,
+        progress_id=None,
     ):
-        progress_id = self.progress_id
-        self.progress_id += 1
+        if progress_id is None:
+            progress_id = self.next_progress_id()
 
         params = {
             "body": {
@@ -386,22 +589,9 @@ class CodeQLQueryServer:
             "progressId": progress_id,
         }
 
-        def on_done(result):
-            logger.info(f"[quickEvaluate] done: {result}")
-            if result.get("resultType") != 0:
-                raise RuntimeError(
-                    f"CodeQL evaluation failed: {result.get('message', 'Unknown error')}"
-                )
-
-        logger.info(
-            f"[DEBUG] Sending evaluation/evaluateQueries (quickEval) with progressId={progress_id}"
-        )
-        self.send_request(
-            "evaluation/runQuery",
-            params,
-            callback or on_done,
-            progress_callback=progress_callback,
-        )
+        logger.debug(f"[quickEvaluate] {file_path} progressId={progress_id}")
+        raw = self._submit_evaluation("evaluation/runQuery", params, progress_callback)
+        return self._chain_checked(raw, callback)
 
     def decode_bqrs(self, bqrs_path, output_format="json"):
         bqrs_path = str(Path(bqrs_path).resolve())
@@ -430,25 +620,67 @@ class CodeQLQueryServer:
 
         return result.stdout
 
-    def wait_for_progress_done(self, expected_progress_id):
-        event = threading.Event()
-
-        def progress_callback(message):
-            if (
-                isinstance(message, dict)
-                and message.get("id") == expected_progress_id
-                and message.get("step") == message.get("maxStep")
-            ):
-                event.set()
+    def iter_bqrs_pages(self, bqrs_path, result_set="#select", page_rows=DEFAULT_BQRS_PAGE_ROWS):
+        """
+        按 --rows/--start-at 分页解码 BQRS，逐页产出 tuples 列表；
+        每次只有一页的 JSON 在内存中，不再生成整个结果集的字符串
+        """
+        bqrs_path = str(Path(bqrs_path).resolve())
 
-        return progress_callback, event
+        if not os.path.exists(bqrs_path):
+            raise FileNotFoundError(f"BQRS file not found: {bqrs_path}")
 
-    def wait_for_completion_callback(self):
-        done = threading.Event()
-        result_holder = {}
+        start_at = None
+        while True:
+            cmd = [
+                self.codeql_path,
+                "bqrs",
+                "decode",
+                "--format=json",
+                f"--result-set={result_set}",
+                f"--rows={page_rows}",
+            ]
+            if start_at is not None:
+                cmd.append(f"--start-at={start_at}")
+            cmd.append(bqrs_path)
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Failed to decode BQRS: {result.stderr.strip()}"
+                )
+            page = json.loads(result.stdout)
+            del result
+            # 指定 --result-set 时输出即该结果集本身；兼容外层再包一层结果集名的格式
+            if "tuples" not in page and isinstance(page.get(result_set), dict):
+                page = page[result_set]
+            tuples = page.get("tuples") or []
+            next_offset = page.get("next")
+            del page
+            if tuples:
+                yield tuples
+            if next_offset is None or not tuples:
+                return
+            start_at = next_offset
+
+    def iter_bqrs_tuples(self, bqrs_path, result_set="#select", page_rows=DEFAULT_BQRS_PAGE_ROWS):
+        """逐行产出 BQRS 结果集中的 tuple"""
+        for page in self.iter_bqrs_pages(bqrs_path, result_set, page_rows):
+            yield from page
+
+    async def decode_bqrs_async(self, bqrs_path, output_format="json"):
+        bqrs_path = str(Path(bqrs_path).resolve())
 
-        def callback(result):
-            result_holder["result"] = result
-            done.set()
+        if not os.path.exists(bqrs_path):
+            raise FileNotFoundError(f"BQRS file not found: {bqrs_path}")
 
-        return callback, done, result_holder
\ No newline at end of file
+        proc = await asyncio.create_subprocess_exec(
+            self.codeql_path, "bqrs", "decode", "--format", output_format, bqrs_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"Failed to decode BQRS: {stderr.decode(errors='replace').strip()}"
+            )
+        return stdout.decode()
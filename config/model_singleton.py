@@ -43,3 +43,15 @@ def get_model():
                 base_url=llm_model_config["base_url"]
             )
     return _model_instance
+
+
+def get_model_name() -> str:
+    """
+    当前配置的模型名（用于缓存 key），读取配置失败时返回空字符串
+    不创建模型实例
+    """
+    try:
+        from config.llm_config import llm_model_config
+        return str(llm_model_config.get("model_name", ""))
+    except Exception:
+        return ""
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import asyncio
 from fastmcp import FastMCP, Context
 from codeql_mcp import CodeQLQueryServer
 from pathlib import Path
@@ -27,13 +28,10 @@ async def register_database(db_path: str) -> str:
             "dbDir": Path(db_path).resolve().as_uri(),
         },
     }
-    callback, done, result_holder = qs.wait_for_completion_callback()
-    qs.register_databases(
+    await asyncio.wrap_future(qs.register_databases(
         [db_path],
-        callback=callback,
         progress_callback=lambda msg: print("[progress] register:", msg),
-    )
-    done.wait()
+    ))
     return f"Database registered: {db_path}"
 
 async def dbanalyze(db_path: str) -> str:
@@ -42,13 +40,10 @@ async def dbanalyze(db_path: str) -> str:
     if not db_path_resolved.exists():
         return f"Database path does not exist: {db_path}"
 
-    callback, done, result_holder = qs.wait_for_completion_callback()
-    qs.analyze_databases(
+    await asyncio.wrap_future(qs.analyze_databases(
         [db_path],
-        callback=callback,
         progress_callback=lambda msg: print("[progress] analyze:", msg),
-    )
-    done.wait()
+    ))
     return f"Database analyzed: {db_path}"
 
 # @mcp.tool()
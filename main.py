@@ -222,14 +222,15 @@ async def main():
             "analyze",
             "dump-replacements",
             "classify-stats",
+            "collect-batch",
         ],
-        help="Command to execute: run, build, emulate, recover, clean, analyze, dump-replacements, or classify-stats",
+        help="Command to execute: run, build, emulate, recover, clean, analyze, dump-replacements, classify-stats, or collect-batch",
     )
     parser.add_argument(
         "script_path",
         nargs="?",
         default="",
-        help="Path to testcase dir, lcmhal_config.yml, or (for classify-stats) a root dir to scan recursively",
+        help="Path to testcase dir, lcmhal_config.yml, or (for classify-stats / collect-batch) a root dir to scan recursively",
     )
     parser.add_argument("--config", "-c", default=None, help="Path to config YAML file (overrides script_path)")
     parser.add_argument("--func-name", "-f", default=None, help="Function name (for 'clean' and 'analyze' commands)")
@@ -291,8 +292,53 @@ async def main():
         help="Enable LLM usage+timing records in session JSON under lcmhal_ai_log (analyze only)",
     )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="For 'collect-batch': concurrent collector queries shared by all databases (default: env LCMHAL_COLLECT_WORKERS or 8)",
+    )
+    parser.add_argument(
+        "--db-parallel",
+        type=int,
+        default=None,
+        metavar="N",
+        help="For 'collect-batch': databases collected at the same time (default: env LCMHAL_COLLECT_BATCH_DBS or 2)",
+    )
+    parser.add_argument(
+        "--disk-cache-mb",
+        type=int,
+        default=None,
+        metavar="MB",
+        help="For 'collect-batch': query-server disk cache budget (--max-disk-cache)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="For 'collect-batch': ignore existing lcmhal_tmp caches and collect again",
+    )
+
     args = parser.parse_args()
-    
+
+    if args.command == "collect-batch":
+        # 在一个 query-server 会话中为多个数据库收集信息，各 demo 之后的 run/build/analyze 直接命中 lcmhal_tmp 缓存
+        if not args.script_path:
+            print("Error: collect-batch 需要指定目录（递归查找数据库 / testcase）或列表文件。")
+            print("  示例: python main.py collect-batch testcases/server/zephyr --workers 8 --db-parallel 2")
+            return
+        from tools.collector.batch import collect_batch, discover_databases
+        db_paths = discover_databases(args.script_path)
+        if not db_paths:
+            print(f"Error: {args.script_path} 下没有找到数据库")
+            return
+        print(f"[collect-batch] {len(db_paths)} databases")
+        results = collect_batch(db_paths, max_workers=args.workers, db_parallel=args.db_parallel,
+                                disk_cache_mb=args.disk_cache_mb, force_refresh=args.force)
+        if any(r.errors for r in results):
+            sys.exit(1)
+        return
+
     if args.command == "clean":
         if args.config:
             config_path = args.config
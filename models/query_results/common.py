@@ -1,49 +1,86 @@
 from dataclasses import dataclass, field
-from utils.db_file import read_struct_with_start_line_from_db, read_line_from_db
-from typing import Any, Dict, List, Tuple
+from utils.db_file import read_struct_with_start_line_from_db, read_definitions_from_db, read_line_from_db
+from typing import Any, Dict, List, Optional, Tuple
 from models.query_results.base import QueryInfo
+from models.query_results.source_body import SourceBody, BodyLines, intern_body, body_from_content
 
 # common infos collector
 @dataclass
 class FunctionInfo(QueryInfo):
-    """函数信息数据结构"""
+    """函数信息数据结构（函数体保存在共享的 SourceBody 中）"""
     name: str
     file_path: str
     location_line: int
-    function_content: str
-    function_content_in_lines: Dict[int, str] = field(default_factory=dict)
+    body: SourceBody = None
+
+    def __init__(self, name: str, file_path: str, location_line: int, function_content: Any = "",
+                 function_content_in_lines: Optional[Dict[Any, str]] = None, body: Optional[SourceBody] = None):
+        self.name = name
+        self.file_path = file_path
+        self.location_line = location_line
+        if body is None:
+            body = body_from_content(file_path, location_line, function_content, function_content_in_lines)
+        self.body = body
+
+    @property
+    def function_content(self) -> str:
+        """前置注释 + 函数定义"""
+        return self.body.text
+
+    @property
+    def function_content_in_lines(self) -> BodyLines:
+        """{行号: 行内容}，行号可用 int 或 str"""
+        return self.body.lines
+
+    @property
+    def end_line(self) -> int:
+        return self.body.end_line
+
+    def __repr__(self) -> str:
+        return (f"FunctionInfo(name={self.name!r}, file_path={self.file_path!r}, "
+                f"location_line={self.location_line!r}, function_content={self.function_content!r}, "
+                f"function_content_in_lines={self.function_content_in_lines!r})")
 
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
-        return {
+        """转换为字典格式（按行内容由 function_content 推导，不再重复保存）"""
+        data = {
             "name": self.name,
             "file_path": self.file_path,
             "location_line": self.location_line,
+            "end_line": self.end_line,
             "function_content": self.function_content,
-            "function_content_in_lines": self.function_content_in_lines
         }
+        if self.body.comment_len:
+            data["comment_len"] = self.body.comment_len
+        return data
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'FunctionInfo':
-        """从字典数据创建FunctionInfo对象"""
+        """从字典数据创建FunctionInfo对象（兼容带 function_content_in_lines 的旧格式）"""
+        if "function_content_in_lines" in data:
+            body = body_from_content(data["file_path"], data["location_line"],
+                                     data["function_content"], data["function_content_in_lines"])
+        else:
+            body = intern_body(data["file_path"], data["location_line"],
+                               data["function_content"], data.get("comment_len", 0))
         return FunctionInfo(
             name=data["name"],
             file_path=data["file_path"],
             location_line=data["location_line"],
-            function_content=data["function_content"],
-            function_content_in_lines=data.get("function_content_in_lines", {})
+            body=body
         )
 
     @staticmethod
     def resolve_from_query_result(db_path: str, result: List[Dict[str, Any]]) -> Dict[str, 'FunctionInfo']:
         """从查询结果解析函数信息，返回字典，键为函数名。
         当同一函数名存在多处定义（如 __weak 与强符号）时，优先保留非 __weak（weak_flag='normal'）的定义。"""
-        # result 每行: (func_name, file_path, location_line, weak_flag, driver_flag)
+        # result 每行: (func_name, file_path, location_line, weak_flag, driver_flag, end_line, end_column)
         candidates: Dict[str, List[tuple]] = {}
         for item in result:
             func_name, file_path, location_line = item[0], item[1], item[2]
             weak_flag = item[3] if len(item) > 3 else "normal"
-            candidates.setdefault(func_name, []).append((file_path, location_line, weak_flag))
+            end = (item[5], item[6]) if len(item) > 6 else (None, None)
+            candidates.setdefault(func_name, []).append((file_path, location_line, weak_flag, end))
         functions: Dict[str, FunctionInfo] = {}
         for func_name, rows in candidates.items():
             # 优先选 non-weak：若有 weak_flag == "normal" 则用第一个这样的定义，否则用第一个
@@ -52,8 +89,9 @@ class FunctionInfo(QueryInfo):
                 if r[2] == "normal":
                     chosen = r
                     break
-            file_path, location_line, _ = chosen
-            function_content, function_content_in_lines = read_struct_with_start_line_from_db(db_path, file_path, location_line, func_name)
+            file_path, location_line, _, (end_line, end_column) = chosen
+            function_content, function_content_in_lines = read_struct_with_start_line_from_db(
+                db_path, file_path, location_line, func_name, end_line=end_line, end_column=end_column)
             if function_content == "":
                 continue
             functions[func_name] = FunctionInfo(
@@ -67,58 +105,102 @@ class FunctionInfo(QueryInfo):
 
 @dataclass
 class StructInfo(QueryInfo):
-    """结构体信息数据结构"""
+    """结构体信息数据结构（结构体定义保存在共享的 SourceBody 中）"""
     name: str
     file_path: str
     location_line: int
-    struct_content: str
-    struct_content_in_lines: Dict[int, str] = field(default_factory=dict)
+    body: SourceBody = None
     members: Dict[str, str] = field(default_factory=dict)
 
+    def __init__(self, name: str, file_path: str, location_line: int, struct_content: Any = "",
+                 struct_content_in_lines: Optional[Dict[Any, str]] = None, members: Optional[Dict[str, str]] = None,
+                 body: Optional[SourceBody] = None):
+        self.name = name
+        self.file_path = file_path
+        self.location_line = location_line
+        if body is None:
+            body = body_from_content(file_path, location_line, struct_content, struct_content_in_lines)
+        self.body = body
+        self.members = members if members is not None else {}
+
+    @property
+    def struct_content(self) -> str:
+        return self.body.text
+
+    @property
+    def struct_content_in_lines(self) -> BodyLines:
+        return self.body.lines
+
+    @property
+    def end_line(self) -> int:
+        return self.body.end_line
+
+    def __repr__(self) -> str:
+        return (f"StructInfo(name={self.name!r}, file_path={self.file_path!r}, "
+                f"location_line={self.location_line!r}, struct_content={self.struct_content!r}, "
+                f"struct_content_in_lines={self.struct_content_in_lines!r}, members={self.members!r})")
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
-        return {
+        data = {
             "name": self.name,
             "file_path": self.file_path,
             "location_line": self.location_line,
+            "end_line": self.end_line,
             "struct_content": self.struct_content,
-            "struct_content_in_lines": self.struct_content_in_lines,
             "members": self.members
         }
+        if self.body.comment_len:
+            data["comment_len"] = self.body.comment_len
+        return data
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'StructInfo':
-        """从字典数据创建StructInfo对象"""
+        """从字典数据创建StructInfo对象（兼容带 struct_content_in_lines 的旧格式）"""
+        if "struct_content_in_lines" in data:
+            body = body_from_content(data["file_path"], data["location_line"],
+                                     data["struct_content"], data["struct_content_in_lines"])
+        else:
+            body = intern_body(data["file_path"], data["location_line"],
+                               data["struct_content"], data.get("comment_len", 0))
         return StructInfo(
             name=data["name"],
             file_path=data["file_path"],
             location_line=data["location_line"],
-            struct_content=data["struct_content"],
-            struct_content_in_lines=data.get("struct_content_in_lines", {}),
-            members=data.get("members", {})
+            members=data.get("members", {}),
+            body=body
         )
 
     @staticmethod
     def resolve_from_query_result(db_path: str, result: List[Dict[str, Any]]) -> Dict[str, 'StructInfo']:
         """从查询结果解析结构体信息，返回字典，键为结构体名"""
-        structs: Dict[str, StructInfo] = {}
+        # result 每行: (struct_name, member_name, member_type, file_path, location_line, member_line, end_line, end_column)
+        # 每个成员一行：先按定义（结构体名、文件、起始行）分组，每个定义只提取一次，再挂上该定义的成员。
+        # 不同文件中的同名结构体保留第一个能提取到的定义，其他定义的成员不合并进来
+        groups: Dict[tuple, List[Any]] = {}
         for item in result:
-            struct_name, member_name, member_type, file_path, location_line = (
-                item[0], item[1], item[2], item[3], item[4]
-            )
-            struct_content, struct_content_in_lines = read_struct_with_start_line_from_db(db_path, file_path[1:], location_line, struct_name)
-            if struct_content == "" :
+            groups.setdefault((item[0], item[3], item[4]), []).append(item)
+
+        def request(item) -> tuple:
+            end_line, end_column = (item[6], item[7]) if len(item) > 7 else (None, None)
+            return item[3][1:], item[4], item[0], end_line, end_column
+
+        definitions = read_definitions_from_db(db_path, (request(rows[0]) for rows in groups.values()))
+        structs: Dict[str, StructInfo] = {}
+        for (struct_name, file_path, location_line), rows in groups.items():
+            if struct_name in structs:
                 continue
-            if struct_name not in structs:
-                structs[struct_name] = StructInfo(
-                    name=struct_name,
-                    file_path=file_path,
-                    location_line=location_line,
-                    struct_content=struct_content,
-                    struct_content_in_lines=struct_content_in_lines,
-                    members={}
-                )
-            structs[struct_name].members[member_name] = member_type
+            struct_content, struct_content_in_lines = definitions[request(rows[0])]
+            if struct_content == "":
+                continue
+            structs[struct_name] = StructInfo(
+                name=struct_name,
+                file_path=file_path,
+                location_line=location_line,
+                struct_content=struct_content,
+                struct_content_in_lines=struct_content_in_lines,
+                members={member[1]: member[2] for member in rows}
+            )
         return structs
 
 @dataclass
@@ -1,7 +1,8 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from .base import QueryInfo
-from utils.db_file import read_struct_with_start_line_from_db
+from .source_body import SourceBody, BodyLines, intern_body, body_from_content, type_definition_request
+from utils.db_file import read_definitions_from_db
 
 @dataclass
 class MmioExprInfo(QueryInfo):
@@ -58,49 +59,77 @@ class MmioExprInfo(QueryInfo):
 
 @dataclass
 class MmioFunctionContainsInfo(QueryInfo):
-    """MMIO函数包含信息数据结构"""
+    """MMIO函数包含信息数据结构（类型定义保存在共享的 SourceBody 中）"""
     type_name: str
     file_path: str
     start_line: int
     flag: str
-    type_content: str
-    type_lines: List[str]
+    body: SourceBody = None
+
+    def __init__(self, type_name: str, file_path: str, start_line: int, flag: str, type_content: Any = "",
+                 type_lines: Optional[Dict[Any, str]] = None, body: Optional[SourceBody] = None):
+        self.type_name = type_name
+        self.file_path = file_path
+        self.start_line = start_line
+        self.flag = flag
+        if body is None:
+            body = body_from_content(file_path, start_line, type_content, type_lines if type_lines is not None else {})
+        self.body = body
+
+    @property
+    def type_content(self) -> str:
+        return self.body.text
+
+    @property
+    def type_lines(self) -> BodyLines:
+        return self.body.lines
+
+    def __repr__(self) -> str:
+        return (f"MmioFunctionContainsInfo(type_name={self.type_name!r}, file_path={self.file_path!r}, "
+                f"start_line={self.start_line!r}, flag={self.flag!r}, type_content={self.type_content!r}, "
+                f"type_lines={self.type_lines!r})")
 
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
+        """转换为字典格式（type_lines 由 type_content 推导，不再重复保存）"""
         return {
             "type_name": self.type_name,
             "file_path": self.file_path,
             "start_line": self.start_line,
             "flag": self.flag,
             "type_content": self.type_content,
-            "type_lines": self.type_lines
+            "comment_len": self.body.comment_len
         }
 
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'MmioFunctionContainsInfo':
-        """从字典创建对象"""
+        """从字典创建对象（兼容带 type_lines 的旧格式）"""
+        file_path = data.get("file_path", "")
+        start_line = data.get("start_line", 0)
+        if "type_lines" in data:
+            body = body_from_content(file_path, start_line, data.get("type_content", ""), data.get("type_lines") or {})
+        else:
+            body = intern_body(file_path, start_line, data.get("type_content", ""), data.get("comment_len", 0))
         return MmioFunctionContainsInfo(
             type_name=data.get("type_name", ""),
-            file_path=data.get("file_path", ""),
-            start_line=data.get("start_line", 0),
+            file_path=file_path,
+            start_line=start_line,
             flag=data.get("flag", ""),
-            type_content=data.get("type_content", ""),
-            type_lines=data.get("type_lines", [])
+            body=body
         )
 
     @staticmethod
     def resolve_from_query_result(db_path: str, result: List[Dict[str, Any]]) -> Dict[str, List['MmioFunctionContainsInfo']]:
         """从查询结果解析MMIO函数包含信息，返回字典，键为函数名"""
-        
-        
+        # 同一类型会被多个函数包含：先收集不同的类型定义位置，每个只提取一次
+        result = list(result)
+        definitions = read_definitions_from_db(db_path, map(type_definition_request, result))
         contains_dict: Dict[str, List[MmioFunctionContainsInfo]] = {}
         for item in result:
             func_name = item[0]
             if func_name not in contains_dict:
                 contains_dict[func_name] = []
             
-            type_content, type_lines = read_struct_with_start_line_from_db(db_path, item[2][1:], item[3])
+            type_content, type_lines = definitions[type_definition_request(item)]
             
             contains_info = MmioFunctionContainsInfo(
                 type_name=item[1],
@@ -0,0 +1,150 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional
+import threading
+import weakref
+
+
+class SourceBody:
+    """
+    函数/结构体的源码片段：只保存一份文本，按 (file, start_line, end_line) 标识。
+    text = 前置注释 + 定义本体，定义本体从 start_line 开始逐行以 "\\n" 结尾；
+    按行访问通过偏移表计算，不再额外保存 {行号: 内容} 字典。
+    """
+
+    __slots__ = ("file_path", "start_line", "text", "comment_len", "_line_starts", "__weakref__")
+
+    def __init__(self, file_path: str, start_line: int, text: str, comment_len: int = 0):
+        self.file_path = file_path
+        self.start_line = start_line
+        self.text = text
+        self.comment_len = comment_len
+        self._line_starts: Optional[list] = None
+
+    @property
+    def definition(self) -> str:
+        """不含前置注释的定义本体"""
+        return self.text[self.comment_len:]
+
+    def _starts(self) -> list:
+        if self._line_starts is None:
+            starts = []
+            pos = self.comment_len
+            end = len(self.text)
+            while pos < end:
+                starts.append(pos)
+                nl = self.text.find("\n", pos)
+                if nl < 0:
+                    break
+                pos = nl + 1
+            self._line_starts = starts
+        return self._line_starts
+
+    @property
+    def line_count(self) -> int:
+        return len(self._starts())
+
+    @property
+    def end_line(self) -> int:
+        return self.start_line + self.line_count - 1
+
+    def line(self, line_no: int) -> Optional[str]:
+        """按源文件行号取一行（不含换行符），不在范围内返回 None"""
+        starts = self._starts()
+        idx = line_no - self.start_line
+        if idx < 0 or idx >= len(starts):
+            return None
+        begin = starts[idx]
+        nl = self.text.find("\n", begin)
+        return self.text[begin:] if nl < 0 else self.text[begin:nl]
+
+    @property
+    def lines(self) -> "BodyLines":
+        return BodyLines(self)
+
+    def ref(self) -> str:
+        return f"{self.file_path}:{self.start_line}-{self.end_line}"
+
+    def __repr__(self) -> str:
+        return f"SourceBody({self.ref()})"
+
+
+class BodyLines(Mapping):
+    """{行号: 行内容} 的只读视图，兼容旧代码用 int 或 str 行号访问 function_content_in_lines"""
+
+    __slots__ = ("_body",)
+
+    def __init__(self, body: SourceBody):
+        self._body = body
+
+    @staticmethod
+    def _to_line_no(key: Any) -> Optional[int]:
+        if isinstance(key, int):
+            return key
+        if isinstance(key, str) and key.lstrip("-").isdigit():
+            return int(key)
+        return None
+
+    def __getitem__(self, key: Any) -> str:
+        line_no = self._to_line_no(key)
+        line = self._body.line(line_no) if line_no is not None else None
+        if line is None:
+            raise KeyError(key)
+        return line
+
+    def __contains__(self, key: object) -> bool:
+        line_no = self._to_line_no(key)
+        return line_no is not None and self._body.start_line <= line_no <= self._body.end_line
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._body.start_line, self._body.end_line + 1))
+
+    def __len__(self) -> int:
+        return self._body.line_count
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+# 同一片段（相同文件、起始行、文本）在进程内只保留一个对象，
+# common/mmio 的 functions、mmio_functions、driver_functions、buffer_functions 共享
+_body_pool: "weakref.WeakValueDictionary[tuple, SourceBody]" = weakref.WeakValueDictionary()
+_body_pool_lock = threading.Lock()
+
+
+def intern_body(file_path: str, start_line: int, text: str, comment_len: int = 0) -> SourceBody:
+    key = (file_path, start_line, comment_len, text)
+    with _body_pool_lock:
+        body = _body_pool.get(key)
+        if body is None:
+            body = SourceBody(file_path, start_line, text, comment_len)
+            _body_pool[key] = body
+        return body
+
+
+def body_from_content(file_path: str, start_line: int, content: Any, content_in_lines: Optional[Dict[Any, str]] = None) -> SourceBody:
+    """
+    由 read_struct_with_start_line_from_db 的返回值（或旧缓存中的 content + 行字典）构造 SourceBody。
+    行字典只用于确定前置注释的长度；不传行字典时整段都视为定义本体，传入空字典时没有可按行访问的内容。
+    """
+    # 旧版 mmio 缓存里 content 可能被误存为 (content, lines)
+    if isinstance(content, (list, tuple)) and len(content) == 2:
+        content, content_in_lines = content[0], content[1]
+    content = content or ""
+    comment_len = 0
+    if content_in_lines:
+        ordered = sorted(content_in_lines.items(), key=lambda kv: int(kv[0]))
+        start_line = int(ordered[0][0])
+        definition = "\n".join(line for _, line in ordered) + "\n"
+        if content.endswith(definition):
+            comment_len = len(content) - len(definition)
+    elif content_in_lines is not None:
+        # 读取失败（错误信息）或空定义：没有可按行访问的内容
+        comment_len = len(content)
+    return intern_body(file_path, start_line, content, comment_len)
+
+
+def type_definition_request(item: Any) -> tuple:
+    """*_functioncontains 查询的一行 (func, type, file, start_line, flag[, end_line, end_column])
+    对应的类型定义读取请求（见 utils.db_file.read_definitions_from_db）"""
+    end_line, end_column = (item[5], item[6]) if len(item) > 6 else (None, None)
+    return item[2][1:], item[3], None, end_line, end_column
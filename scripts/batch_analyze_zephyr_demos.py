@@ -22,6 +22,9 @@
   # 限制单 demo 内 Classify 并发（示例）
   LCMHAL_ANALYZE_MAX_CONCURRENT=6 python scripts/batch_analyze_zephyr_demos.py
 
+  # 先在一个 query-server 会话中为所有 demo 收集 CodeQL 信息（main.py collect-batch），各 demo 直接命中缓存
+  python scripts/batch_analyze_zephyr_demos.py --collect-first
+
   # 只跑 classify，不要每 demo 后的 replacement 汇总与 classify 统计文件
   python scripts/batch_analyze_zephyr_demos.py --no-post-collect
 
@@ -175,6 +178,13 @@ async def _main_async(args: argparse.Namespace) -> int:
         flush=True,
     )
 
+    if args.collect_first:
+        from tools.collector.batch import run_collect_batch_command
+
+        rc = run_collect_batch_command(str(root), [str(d) for d in demo_dirs], args.dry_run)
+        if rc != 0:
+            print(f"!!! [collect-batch] exit_code={rc}；收集失败的 demo 会在各自分析时重新收集", flush=True)
+
     if args.dry_run:
         for d in demo_dirs:
             try:
@@ -239,6 +249,11 @@ def main() -> None:
         action="store_true",
         help="只列出将运行的 demo 路径，不执行分析",
     )
+    parser.add_argument(
+        "--collect-first",
+        action="store_true",
+        help="分析前先用 main.py collect-batch 在一个 query-server 会话中为所有 demo 收集 CodeQL 信息",
+    )
     parser.add_argument(
         "--no-post-collect",
         action="store_true",
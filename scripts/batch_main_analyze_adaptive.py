@@ -3,7 +3,9 @@ import argparse
 import json
 import os
 import re
+import sqlite3
 import subprocess
+import sys
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -111,6 +113,14 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Run preflight checks: cache coverage, ai_log coverage, and running demo processes",
     )
+    parser.add_argument(
+        "--collect-first",
+        action="store_true",
+        help=(
+            "Before running platform scripts, collect CodeQL infos for all selected demos in one "
+            "query-server session (main.py collect-batch), so each demo starts from warm lcmhal_tmp caches"
+        ),
+    )
     parser.add_argument(
         "--check-only",
         action="store_true",
@@ -203,6 +213,15 @@ def run_platform(
     return completed.returncode
 
 
+def run_collect_batch(root: Path, selected_platforms: List[str], dry_run: bool) -> int:
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from tools.collector.batch import run_collect_batch_command
+
+    demo_dirs = discover_demo_dirs(root, selected_platforms)
+    return run_collect_batch_command(str(root), [str(d) for d in demo_dirs], dry_run)
+
+
 def discover_demo_dirs(root: Path, selected_platforms: List[str]) -> List[Path]:
     demo_dirs: List[Path] = []
     for p in selected_platforms:
@@ -235,6 +254,21 @@ def parse_db_path_from_config(config_file: Path) -> str:
     return ""
 
 
+def sqlite_cached_categories(sqlite_path: Path) -> List[str]:
+    """codebase_info.sqlite 中已保存的信息类别（common/driver/mmio，见 tools/collector/sqlite_store.py 的 meta 表）"""
+    if not sqlite_path.exists():
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=5)
+        try:
+            rows = conn.execute("SELECT key FROM meta WHERE key LIKE 'keys:%'").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [key.split(":", 1)[1] for (key,) in rows]
+
+
 def check_demo_cache_status(demo_dir: Path, db_path_raw: str) -> Dict[str, object]:
     db_path = Path(db_path_raw)
     ltmp = db_path / "lcmhal_tmp"
@@ -243,8 +277,10 @@ def check_demo_cache_status(demo_dir: Path, db_path_raw: str) -> Dict[str, objec
     common_json = ltmp / "common_info.json"
     driver_json = ltmp / "driver_info.json"
     mmio_json = ltmp / "mmio_info.json"
+    codebase_sqlite = ltmp / "codebase_info.sqlite"
     src_zip = db_path / "src.zip"
 
+    sqlite_categories = sqlite_cached_categories(codebase_sqlite)
     classify_cnt = 0
     replacement_cnt = 0
     if ai_log.exists():
@@ -261,9 +297,9 @@ def check_demo_cache_status(demo_dir: Path, db_path_raw: str) -> Dict[str, objec
         "db_exists": db_path.exists(),
         "src_zip": src_zip.exists(),
         "tmp_dir": ltmp.exists(),
-        "common_info": common_json.exists(),
-        "driver_info": driver_json.exists(),
-        "mmio_info": mmio_json.exists(),
+        "common_info": common_json.exists() or "common" in sqlite_categories,
+        "driver_info": driver_json.exists() or "driver" in sqlite_categories,
+        "mmio_info": mmio_json.exists() or "mmio" in sqlite_categories,
         "ai_log_dir": ai_log.exists(),
         "classify_count": classify_cnt,
         "replacement_count": replacement_cnt,
@@ -429,6 +465,11 @@ def main() -> int:
             return 0
 
     all_results: List[Tuple[str, int]] = []
+    if args.collect_first:
+        rc = run_collect_batch(root, selected_names, args.dry_run)
+        if rc != 0:
+            print(f"[collect-batch] exit_code={rc}; demos with failed collection will collect on their own")
+
     now = datetime.now()
     w = timedelta(minutes=max(1, args.window_minutes))
     prev_start = now - 2 * w
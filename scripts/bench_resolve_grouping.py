@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+对比结构体 / 函数包含类型的两种解析方式（在真实数据库上运行）：
+  - per-row：每一行查询结果都调用一次 read_struct_with_start_line_from_db（原先的做法，
+    一个 60 个成员的结构体会被提取 60 次）；
+  - grouped：StructInfo / MmioFunctionContainsInfo / DriverFunctionContainsInfo.resolve_from_query_result，
+    先按定义位置分组，每个定义只提取一次。
+
+查询结果取自 collector 的查询缓存（<db>/lcmhal_tmp 下），缓存缺失时运行 CodeQL 查询。
+输出每种方式的提取次数、耗时，并检查两种方式得到的结构体定义一致。
+
+用法:
+  python scripts/bench_resolve_grouping.py <db_path> [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config.collector_infos import (  # noqa: E402
+    struct_collector_query_file,
+    mmioinfo_interestingmmiofunccontains_query_file,
+    driverfrom_function_contains_query_file,
+)
+from models.query_results.common import StructInfo  # noqa: E402
+from models.query_results.mmio import MmioFunctionContainsInfo  # noqa: E402
+from models.query_results.driver import DriverFunctionContainsInfo  # noqa: E402
+from utils import db_file  # noqa: E402
+from utils.db_file import read_struct_with_start_line_from_db  # noqa: E402
+
+
+def load_rows(db_path: str, query_file: str) -> List[Any]:
+    from utils.collector_cache import run_cached_query
+
+    def run():
+        # 只有缓存缺失时才需要 CodeQL
+        from utils.db_query import iter_query_tuples
+        return iter_query_tuples(db_path, query_path)
+
+    query_path = os.path.join(ROOT, query_file)
+    try:
+        rows, hit = run_cached_query(db_path, query_path, run)
+    except Exception as e:
+        print(f"[WARNING] {os.path.basename(query_file)}: {e}")
+        return []
+    rows = list(rows or [])
+    print(f"{os.path.basename(query_file)}: {len(rows)} rows ({'cached' if hit else 'fresh'})")
+    return rows
+
+
+class ExtractCounter:
+    """统计定义提取次数（utils.db_file._extract_definition 的调用次数）"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = db_file._extract_definition
+
+    def __enter__(self):
+        original = self._original
+
+        def counted(*args, **kwargs):
+            self.count += 1
+            return original(*args, **kwargs)
+
+        db_file._extract_definition = counted
+        return self
+
+    def __exit__(self, *exc):
+        db_file._extract_definition = self._original
+
+
+def structs_per_row(db_path: str, rows: List[Any]) -> Dict[str, str]:
+    structs: Dict[str, str] = {}
+    for item in rows:
+        end_line, end_column = (item[6], item[7]) if len(item) > 7 else (None, None)
+        content, _ = read_struct_with_start_line_from_db(db_path, item[3][1:], item[4], item[0],
+                                                         end_line=end_line, end_column=end_column)
+        if content != "" and item[0] not in structs:
+            structs[item[0]] = content
+    return structs
+
+
+def contains_per_row(db_path: str, rows: List[Any]) -> int:
+    for item in rows:
+        end_line, end_column = (item[5], item[6]) if len(item) > 6 else (None, None)
+        read_struct_with_start_line_from_db(db_path, item[2][1:], item[3], end_line=end_line, end_column=end_column)
+    return len(rows)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int, Any]:
+    best = float("inf")
+    extracts = 0
+    result = None
+    for _ in range(repeat):
+        with ExtractCounter() as counter:
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        extracts = counter.count
+    return best, extracts, result
+
+
+def report(name: str, per_row: Tuple[float, int, Any], grouped: Tuple[float, int, Any]) -> None:
+    (t0, n0, _), (t1, n1, _) = per_row, grouped
+    speedup = t0 / t1 if t1 > 0 else float("inf")
+    print(f"  {name:<28} per-row {n0:>7} extracts {t0 * 1000:9.1f} ms | "
+          f"grouped {n1:>6} extracts {t1 * 1000:9.1f} ms | x{speedup:.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_path")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式重复次数，取最快一次")
+    args = parser.parse_args()
+    db_path = args.db_path
+
+    struct_rows = load_rows(db_path, struct_collector_query_file)
+    mmio_rows = load_rows(db_path, mmioinfo_interestingmmiofunccontains_query_file)
+    driver_rows = load_rows(db_path, driverfrom_function_contains_query_file)
+
+    # 先预热源码缓存，两种方式都只比较提取本身
+    structs_per_row(db_path, struct_rows)
+
+    print(f"\nbest of {args.repeat}:")
+    per_row = measure(lambda: structs_per_row(db_path, struct_rows), args.repeat)
+    grouped = measure(lambda: StructInfo.resolve_from_query_result(db_path, struct_rows), args.repeat)
+    report("StructInfo", per_row, grouped)
+    expected = per_row[2]
+    actual = {name: info.struct_content for name, info in grouped[2].items()}
+    mismatched = [name for name in expected if actual.get(name) != expected[name]]
+    if mismatched or set(actual) != set(expected):
+        print(f"  [WARNING] struct definitions differ: {sorted(set(mismatched) | (set(actual) ^ set(expected)))[:10]}")
+
+    for name, rows, resolver in (
+        ("MmioFunctionContainsInfo", mmio_rows, MmioFunctionContainsInfo.resolve_from_query_result),
+        ("DriverFunctionContainsInfo", driver_rows, DriverFunctionContainsInfo.resolve_from_query_result),
+    ):
+        if rows:
+            report(name, measure(lambda: contains_per_row(db_path, rows), args.repeat),
+                   measure(lambda: resolver(db_path, rows), args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
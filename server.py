@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import asyncio
 from fastmcp import FastMCP, Context
 from codeql_mcp import CodeQLQueryServer
 from pathlib import Path
@@ -31,13 +32,13 @@ async def register_database(db_path: str) -> str:
             "dbDir": Path(db_path).resolve().as_uri(),
         },
     }
-    callback, done, result_holder = qs.wait_for_completion_callback()
-    qs.register_databases(
-        [db_path],
-        callback=callback,
-        progress_callback=lambda msg: print("[progress] register:", msg),
-    )
-    done.wait()
+    try:
+        await asyncio.wrap_future(qs.register_databases(
+            [db_path],
+            progress_callback=lambda msg: print("[progress] register:", msg),
+        ))
+    except RuntimeError as re:
+        return f"Database registration failed: {re}"
     return f"Database registered: {db_path}"
 
 
@@ -53,7 +54,7 @@ async def quick_evaluate(
             file, symbol
         )
     try:
-        qs.quick_evaluate_and_wait(
+        await qs.quick_evaluate_async(
             file, db, output_path, start, scol, end, ecol
         )
     except RuntimeError as re:
@@ -64,7 +65,7 @@ async def quick_evaluate(
 @mcp.tool()
 async def decode_bqrs(bqrs_path: str, fmt: str) -> str:
     """This can be used to decode CodeQL results, format is either csv for problem queries or json for path-problems"""
-    return qs.decode_bqrs(bqrs_path, fmt)
+    return await qs.decode_bqrs_async(bqrs_path, fmt)
 
 
 @mcp.tool()
@@ -73,7 +74,7 @@ async def evaluate_query(
 ) -> str:
     """Runs a CodeQL query on a given database"""
     try:
-        qs.evaluate_and_wait(query_path, db_path, output_path)
+        await qs.evaluate_async(query_path, db_path, output_path)
     except RuntimeError as re:
         return f"CodeQL evaluation failed: {re}"
     return output_path
@@ -115,10 +116,10 @@ async def driver_info_driverfromfunction_collector(db_path: str) -> str:
         Path(db_path, "lcmhal_tmp").mkdir(parents=True, exist_ok=True)
     if not Path(output_path).exists():
         try:
-            qs.evaluate_and_wait(query_path, db_path, output_path)
+            await qs.evaluate_async(query_path, db_path, output_path)
         except RuntimeError as re:
             return f"CodeQL evaluation failed: {re}"
-    return qs.decode_bqrs(output_path, output_format="json")
+    return await qs.decode_bqrs_async(output_path, output_format="json")
 
     # # 从当前目录的codeql_scripts文件夹中获取对应ql文件
     # query_path = str(Path(__file__) / "codeql_scripts" / "driver_info_driverfromfunction_collector.ql")
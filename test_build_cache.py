@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试 tools.builder.build_cache 的 key 计算与按最近使用时间淘汰（临时目录，不运行编译）
+"""
+import os
+import sys
+import tempfile
+import time
+
+# 将项目根目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config.globs as globs
+try:
+    from models.build_results.build_output import BuildOutput
+    from tools.builder.build_cache import RESULT_FILE, build_cache_key, lookup_build, store_build
+except ImportError as e:
+    # 缺少 pydantic 等运行依赖时跳过，不影响其他测试的收集
+    import pytest
+    pytest.skip(f"missing dependency: {e}", allow_module_level=True)
+
+
+def _conf_dir() -> str:
+    conf_path = tempfile.mkdtemp(prefix="lcmhal-build-cache-")
+    os.makedirs(os.path.join(conf_path, "emulate"))
+    with open(os.path.join(conf_path, "build.sh"), "w") as f:
+        f.write("make\n")
+    return conf_path
+
+
+def test_key_depends_on_kind_and_contents_only():
+    globs.db_path = None
+    conf_path = _conf_dir()
+    a = [("src/a.c", "int a;\n"), ("src/b.c", b"int b;\n")]
+    key = build_cache_key("build", conf_path, a)
+    assert key == build_cache_key("build", conf_path, list(reversed(a))), "file order changed the key"
+    assert key != build_cache_key("verify", conf_path, a)
+    assert key != build_cache_key("build", conf_path, [("src/a.c", "int a ;\n"), ("src/b.c", b"int b;\n")])
+    # 工具链脚本变化时 key 也变化
+    with open(os.path.join(conf_path, "build.sh"), "w") as f:
+        f.write("make -j8\n")
+    assert key != build_cache_key("build", conf_path, a)
+
+
+def test_disabled_cache_has_no_key():
+    os.environ["LCMHAL_BUILD_CACHE"] = "0"
+    try:
+        assert build_cache_key("build", _conf_dir(), [("src/a.c", "x")]) is None
+    finally:
+        os.environ.pop("LCMHAL_BUILD_CACHE", None)
+
+
+def test_store_and_lookup_round_trip():
+    globs.db_path = None
+    conf_path = _conf_dir()
+    key = build_cache_key("verify", conf_path, [("src/a.c", "int a;\n")])
+    assert lookup_build(conf_path, key) is None
+    store_build(conf_path, key, BuildOutput(std_err="src/a.c:1:1: error: x", std_out="", exit_code=2),
+                patched_files=["src/a.c"])
+    hit = lookup_build(conf_path, key)
+    assert hit is not None and hit.exit_code == 2 and hit.std_err == "src/a.c:1:1: error: x"
+
+
+def test_environment_failures_are_not_cached():
+    """工具链缺失、链接错误、其他文件的报错都可能与环境有关，不缓存"""
+    globs.db_path = None
+    conf_path = _conf_dir()
+    for i, std_err in enumerate([
+        "build.sh: line 3: west: command not found",
+        "ld: undefined reference to `HAL_Init'",
+        "src/other.c:10:5: error: unknown type name 'u8'",
+    ]):
+        key = build_cache_key("verify", conf_path, [("src/a.c", str(i))])
+        store_build(conf_path, key, BuildOutput(std_err=std_err, std_out="", exit_code=1), patched_files=["src/a.c"])
+        assert lookup_build(conf_path, key) is None, std_err
+    key = build_cache_key("build", conf_path, [("src/a.c", "x")])
+    store_build(conf_path, key, BuildOutput(std_err="src/a.c:1:1: error: x", std_out="", exit_code=2))
+    assert lookup_build(conf_path, key) is None, "failed build without patched_files was cached"
+
+
+def test_evicts_least_recently_used():
+    """上限只够两个条目：写入第三个时淘汰最久未使用的那个，刚被读取过的保留"""
+    globs.db_path = None
+    conf_path = _conf_dir()
+    os.environ["LCMHAL_BUILD_CACHE_MAX_MB"] = str(2.5 * 1024 / (1024 * 1024))
+    try:
+        keys = [build_cache_key("verify", conf_path, [("src/a.c", str(i))]) for i in range(3)]
+        output = BuildOutput(std_err="", std_out="x" * 1000, exit_code=0)
+        root = os.path.join(conf_path, "emulate", "build_cache")
+        now = time.time()
+        store_build(conf_path, keys[0], output)
+        store_build(conf_path, keys[1], output)
+        # keys[1] 写入更晚，但 keys[0] 最近被使用过
+        os.utime(os.path.join(root, keys[1], RESULT_FILE), (now - 100, now - 100))
+        os.utime(os.path.join(root, keys[0], RESULT_FILE), (now - 10, now - 10))
+        store_build(conf_path, keys[2], output)
+        assert sorted(os.listdir(root)) == sorted([keys[0], keys[2]])
+    finally:
+        os.environ.pop("LCMHAL_BUILD_CACHE_MAX_MB", None)
+
+
+if __name__ == "__main__":
+    test_key_depends_on_kind_and_contents_only()
+    test_disabled_cache_has_no_key()
+    test_store_and_lookup_round_trip()
+    test_environment_failures_are_not_cached()
+    test_evicts_least_recently_used()
+    print("all build_cache tests passed")
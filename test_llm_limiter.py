@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+测试 utils.llm_limiter 的 AIMD 并发控制（模拟提供商，不调用真实模型）
+"""
+import asyncio
+import os
+import sys
+
+# 将项目根目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.llm_limiter import AdaptiveLimiter
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class SimulatedProvider:
+    """同时在途的调用超过 capacity 时返回 429 的模拟提供商"""
+
+    def __init__(self, capacity: int, latency: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.active = 0
+        self.calls = 0
+        self.throttled = 0
+
+    async def ainvoke(self, _messages):
+        self.active += 1
+        try:
+            if self.active > self.capacity:
+                self.throttled += 1
+                raise RateLimitError("429 Too Many Requests")
+            await asyncio.sleep(self.latency)
+            self.calls += 1
+            return "ok"
+        finally:
+            self.active -= 1
+
+
+def _make_limiter(**env) -> AdaptiveLimiter:
+    defaults = {
+        "LCMHAL_LLM_CONCURRENCY_INIT": "8",
+        "LCMHAL_LLM_CONCURRENCY_MIN": "1",
+        "LCMHAL_LLM_CONCURRENCY_MAX": "64",
+        "LCMHAL_LLM_MAX_RETRIES": "50",
+        "LCMHAL_LLM_BACKOFF_BASE_S": "0.001",
+        "LCMHAL_LLM_BACKOFF_MAX_S": "0.01",
+    }
+    defaults.update(env)
+    saved = {name: os.environ.get(name) for name in defaults}
+    os.environ.update(defaults)
+    try:
+        return AdaptiveLimiter()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_simulated_provider_converges():
+    """提供商在并发超过 12 时限流：1500 次调用全部完成，上限在 12 附近锯齿振荡，限流次数远少于调用次数"""
+    limiter = _make_limiter()
+    provider = SimulatedProvider(capacity=12, latency=0.002)
+    limits = []
+
+    async def worker(n):
+        for _ in range(n):
+            await limiter.ainvoke(provider, [])
+            limits.append(int(limiter.limit))
+
+    async def run():
+        await asyncio.gather(*(worker(50) for _ in range(30)))
+
+    asyncio.run(run())
+    stats = limiter.stats()
+    print(f"limit range {min(limits)}-{max(limits)}, throttled {provider.throttled}, stats {stats}")
+    assert provider.calls == 1500
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert max(limits) > 8, "limit never grew past its initial value"
+    assert max(limits) <= 16, "limit overshot the provider capacity"
+    assert min(limits) >= 4
+    assert provider.throttled < 150
+
+
+def test_latency_does_not_decrease_limit():
+    """延迟变长（例如提示词变长）不应降低并发上限"""
+    limiter = _make_limiter()
+    for latency in [0.1] * 20 + [2.0] * 20:
+        limiter._on_success(latency, saturated=False)
+    assert int(limiter.limit) == 8
+
+
+def test_throttle_halves_once_per_cooldown():
+    """一波并发的 429 只减半一次，不低于下限"""
+    limiter = _make_limiter(LCMHAL_LLM_CONCURRENCY_INIT="16", LCMHAL_LLM_CONCURRENCY_MIN="2")
+    limiter._on_success(60.0, saturated=False)  # 冷却期约等于平均延迟
+    for _ in range(10):
+        limiter._on_error("throttle")
+    assert int(limiter.limit) == 8
+    limiter._last_decrease = 0.0
+    for _ in range(5):
+        limiter._on_error("throttle")
+        limiter._last_decrease = 0.0
+    assert int(limiter.limit) == 2
+
+
+def test_additive_increase_only_when_saturated():
+    limiter = _make_limiter()
+    for _ in range(8):
+        limiter._on_success(0.1, saturated=False)
+    assert int(limiter.limit) == 8
+    # 每次成功 +1/limit，约一轮（limit 次调用）+1
+    for _ in range(9):
+        limiter._on_success(0.1, saturated=True)
+    assert int(limiter.limit) == 9
+
+
+if __name__ == "__main__":
+    test_simulated_provider_converges()
+    test_latency_does_not_decrease_limit()
+    test_throttle_halves_once_per_cooldown()
+    test_additive_increase_only_when_saturated()
+    print("all llm_limiter tests passed")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+测试 tools.replacer.patch_planner：同一文件多个替换一次拼接，重叠的替换被放弃
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+# 将项目根目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from tools.replacer.patch_planner import plan_patches
+    from utils.src_ops import weak_funcdef
+except ImportError as e:
+    # 缺少 pydantic 等运行依赖时跳过，不影响其他测试的收集
+    import pytest
+    pytest.skip(f"missing dependency: {e}", allow_module_level=True)
+
+ORIGINAL = """#include "hal.h"
+
+int HAL_Init(void)
+{
+    return hw_init();
+}
+
+int HAL_Read(int reg)
+{
+    return REG(reg);
+}
+"""
+
+
+def _func(path: str, start_line: int, lines):
+    """与 FunctionInfo 相同的字段：file_path、location_line、function_content_in_lines（行号为字符串）"""
+    return SimpleNamespace(
+        file_path=path,
+        location_line=start_line,
+        function_content_in_lines={str(start_line + i): line for i, line in enumerate(lines)},
+    )
+
+
+INIT = _func("src/hal.c", 3, ["int HAL_Init(void)", "{", "    return hw_init();", "}"])
+READ = _func("src/hal.c", 8, ["int HAL_Read(int reg)", "{", "    return REG(reg);", "}"])
+# 与 HAL_Init 的范围重叠（例如同一段代码被两个函数信息覆盖）
+INIT_BODY = _func("src/hal.c", 4, ["{", "    return hw_init();", "}"])
+
+
+def _read(path):
+    return ORIGINAL if path == "src/hal.c" else None
+
+
+def test_patches_one_file_once():
+    patches, failed = plan_patches([
+        ("HAL_Read", READ, "int HAL_Read(int reg)\n{\n    return 0;\n}"),
+        ("HAL_Init", INIT, "int HAL_Init(void)\n{\n    return 0;\n}"),
+    ], _read)
+    assert failed == []
+    assert list(patches) == ["src/hal.c"]
+    patch = patches["src/hal.c"]
+    assert patch.patched.startswith(weak_funcdef)
+    assert "hw_init" not in patch.patched and "REG(reg)" not in patch.patched
+    assert patch.patched.endswith(ORIGINAL[ORIGINAL.index("int HAL_Read"):].replace("return REG(reg);", "return 0;"))
+    # spans 为替换后的行号
+    lines = patch.patched.splitlines()
+    start, end = patch.spans["HAL_Read"]
+    assert lines[start - 1] == "int HAL_Read(int reg)" and lines[end - 1] == "}"
+
+
+def test_overlapping_replacement_is_dropped():
+    patches, failed = plan_patches([
+        ("HAL_Init", INIT, "int HAL_Init(void)\n{\n    return 1;\n}"),
+        ("HAL_Init_body", INIT_BODY, "{\n    return 2;\n}"),
+    ], _read)
+    assert failed == ["HAL_Init_body"]
+    patched = patches["src/hal.c"].patched
+    assert "return 1;" in patched and "return 2;" not in patched
+    assert "HAL_Init_body" not in patches["src/hal.c"].spans
+
+
+def test_unknown_file_or_code_fails():
+    stale = _func("src/hal.c", 3, ["int HAL_Init(void)", "{", "    return old_init();", "}"])
+    missing = _func("src/missing.c", 1, ["void f(void) {}"])
+    patches, failed = plan_patches([
+        ("stale", stale, "int HAL_Init(void) { return 0; }"),
+        ("missing", missing, "void f(void) {}"),
+    ], _read)
+    assert patches == {}
+    assert sorted(failed) == ["missing", "stale"]
+
+
+if __name__ == "__main__":
+    test_patches_one_file_once()
+    test_overlapping_replacement_is_dropped()
+    test_unknown_file_or_code_fails()
+    print("all patch_planner tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+测试 utils.replacement_rubric 的缓存 key（只改空白不影响 key）与可缓存的判定（不调用模型）
+"""
+import os
+import sys
+
+# 将项目根目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from utils.replacement_rubric import _parse_rubric_result, rubric_cache_key
+except ImportError as e:
+    # 缺少 langchain_core 等运行依赖时跳过，不影响其他测试的收集
+    import pytest
+    pytest.skip(f"missing dependency: {e}", allow_module_level=True)
+
+ORIGINAL = "int HAL_Init(void)\n{\n    return hw_init();\n}\n"
+REPLACEMENT = "int HAL_Init(void)\n{\n    return 0;\n}\n"
+
+
+def test_key_ignores_whitespace_only_changes():
+    key = rubric_cache_key("HAL_Init", REPLACEMENT, ORIGINAL)
+    reformatted = "int  HAL_Init(void)   \n\n{\n\treturn 0;\n}"
+    assert rubric_cache_key("HAL_Init", reformatted, ORIGINAL) == key
+    assert rubric_cache_key("HAL_Init", REPLACEMENT, ORIGINAL.replace("    ", "  ")) == key
+
+
+def test_key_changes_with_code_name_or_original():
+    key = rubric_cache_key("HAL_Init", REPLACEMENT, ORIGINAL)
+    assert rubric_cache_key("HAL_Init", REPLACEMENT.replace("0", "1"), ORIGINAL) != key
+    assert rubric_cache_key("HAL_DeInit", REPLACEMENT, ORIGINAL) != key
+    assert rubric_cache_key("HAL_Init", REPLACEMENT, None) != key
+
+
+def test_only_explicit_verdicts_are_cacheable():
+    assert _parse_rubric_result({"passed": False, "reason": "drops hw_init"}) == (
+        {"pass": False, "reason": "drops hw_init"}, True)
+    assert _parse_rubric_result({"passed": True}) == ({"pass": True, "reason": ""}, True)
+    # 模型没有给出结论：放行但不缓存
+    assert _parse_rubric_result(None) == ({"pass": True, "reason": ""}, False)
+    assert _parse_rubric_result({"reason": "?"}) == ({"pass": True, "reason": ""}, False)
+
+
+if __name__ == "__main__":
+    test_key_ignores_whitespace_only_changes()
+    test_key_changes_with_code_name_or_original()
+    test_only_explicit_verdicts_are_cacheable()
+    print("all replacement_rubric tests passed")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试 utils.source_index.DefinitionIndex 的定义提取（extract）与按 CodeQL 范围切片（span）
+"""
+import os
+import sys
+
+# 将项目根目录添加到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.source_index import DefinitionIndex
+
+SOURCE = """/* UART 句柄 */
+typedef struct {
+    int baud; /* { 不计 */
+    char tag[4];
+} uart_t;
+
+int uart_init(uart_t *u);
+
+/**
+ * 初始化串口
+ */
+int uart_init(uart_t *u)
+{
+    if (u->baud == 0) {
+        puts("}");
+        return -1;
+    }
+    return 0;
+}
+"""
+
+LINES = SOURCE.splitlines()
+
+
+def test_extract_struct_with_comment():
+    content, in_lines = DefinitionIndex(LINES).extract(2, 10000)
+    assert content == "/* UART 句柄 */\n" + "\n".join(LINES[1:5]) + "\n"
+    assert sorted(in_lines) == [2, 3, 4, 5]
+
+
+def test_extract_function_ignores_braces_in_strings_and_comments():
+    content, in_lines = DefinitionIndex(LINES).extract(12, 10000)
+    assert sorted(in_lines) == list(range(12, 20))
+    assert content.startswith("/**\n* 初始化串口\n*/\nint uart_init(uart_t *u)\n")
+    assert content.endswith("    return 0;\n}\n")
+
+
+def test_prototype_is_not_a_definition():
+    assert DefinitionIndex(LINES).extract(7, 10000) == ("", {})
+
+
+def test_start_inside_another_definition():
+    # 第 17 行是 if 块的 '}'：起始行在别的定义内部
+    assert DefinitionIndex(LINES).extract(17, 10000) == ("", {})
+
+
+def test_extract_truncates_at_max_size():
+    _, in_lines = DefinitionIndex(LINES).extract(12, 60)
+    assert sorted(in_lines) == [12, 13, 14]
+
+
+def test_span_matches_extract():
+    index = DefinitionIndex(LINES)
+    assert index.span(12, 19, 1, 10000) == index.extract(12, 10000)
+    assert index.span(2, 5, 1, 10000) == index.extract(2, 10000)
+
+
+def test_span_falls_back_on_bad_range():
+    index = DefinitionIndex(LINES)
+    expected = index.extract(12, 10000)
+    # 结束列不是 '}'、范围内大括号不平衡、结束行越界
+    assert index.span(12, 19, 2, 10000) == expected
+    assert index.span(12, 17, 5, 10000) == expected
+    assert index.span(12, 99, None, 10000) == expected
+
+
+# 同一函数的两份定义（#ifdef 分支）：起止行来自不同定义时不能切出两份定义
+TWO_DEFS = """#ifdef USE_DMA
+int uart_send(const char *s)
+{
+    return dma_send(s);
+}
+#else
+int uart_send(const char *s)
+{
+    return poll_send(s);
+}
+#endif
+"""
+
+
+def test_span_rejects_range_across_two_definitions():
+    index = DefinitionIndex(TWO_DEFS.splitlines())
+    first = index.extract(2, 10000)
+    assert sorted(first[1]) == [2, 3, 4, 5]
+    # 第一份定义的起始行 + 第二份定义的结束位置
+    assert index.span(2, 10, 1, 10000) == first
+    assert index.span(7, 10, 1, 10000) == index.extract(7, 10000)
+    assert sorted(index.span(7, 10, 1, 10000)[1]) == [7, 8, 9, 10]
+
+
+if __name__ == "__main__":
+    test_extract_struct_with_comment()
+    test_extract_function_ignores_braces_in_strings_and_comments()
+    test_prototype_is_not_a_definition()
+    test_start_inside_another_definition()
+    test_extract_truncates_at_max_size()
+    test_span_matches_extract()
+    test_span_falls_back_on_bad_range()
+    test_span_rejects_range_across_two_definitions()
+    print("all source_index tests passed")
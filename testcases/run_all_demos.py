@@ -5,15 +5,23 @@
 - 某个demo异常退出时，跳过并继续运行下一个
 - 记录每个demo的运行结果
 - 将标准输出重定向到testcases_out文件夹中的文件
+- --collect-first：先用 main.py collect-batch 在一个 query-server 会话中为所有demo收集CodeQL信息
+- --dry-run：只列出将运行的demo，不执行
 """
 
+import argparse
 import os
+import sys
 import subprocess
 import concurrent.futures
 import time
 
 # 项目根目录
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from tools.collector.batch import run_collect_batch_command
+
 # 测试用例目录
 TESTCASES_DIR = os.path.join(PROJECT_ROOT, 'testcases', 'macbook')
 # 输出目录
@@ -156,6 +164,13 @@ def run_demo(demo_path):
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="运行testcases/macbook目录下所有demo")
+    parser.add_argument('--collect-first', action='store_true',
+                        help="运行demo前先用 main.py collect-batch 为所有demo收集CodeQL信息")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="只列出将运行的demo（以及 collect-batch 命令），不执行")
+    args = parser.parse_args()
+
     print("开始运行所有demo...")
     print(f"项目根目录: {PROJECT_ROOT}")
     print(f"测试用例目录: {TESTCASES_DIR}")
@@ -168,6 +183,15 @@ def main():
     for i, path in enumerate(demo_paths, 1):
         print(f"{i}. {os.path.basename(path)} - {path}")
     print()
+
+    if args.collect_first:
+        rc = run_collect_batch_command(PROJECT_ROOT, demo_paths, dry_run=args.dry_run)
+        if rc != 0:
+            print(f"[collect-batch] 返回码: {rc}，收集失败的demo会在各自运行时重新收集")
+        print()
+
+    if args.dry_run:
+        return
     
     # 运行结果
     results = []
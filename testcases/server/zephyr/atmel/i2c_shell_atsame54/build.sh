@@ -11,7 +11,10 @@ cd "$ZEPHYR_PROJECT" || exit 1
 command -v west >/dev/null 2>&1 || { echo "west not found"; exit 1; }
 test -f "$OVERLAY_CONF" || { echo "missing overlay: $OVERLAY_CONF"; exit 1; }
 
-west build -b "$BOARD" -p always "$SAMPLE" -d "$WEST_BUILD_DIR" -- -DEXTRA_CONF_FILE="$OVERLAY_CONF"
+# LCMHAL_BUILD_INCREMENTAL=1（LCMHal 增量编译）时保留构建目录，由 west 自行判断是否需要 pristine
+PRISTINE=always
+[ "${LCMHAL_BUILD_INCREMENTAL:-0}" = "1" ] && PRISTINE=auto
+west build -b "$BOARD" -p "$PRISTINE" "$SAMPLE" -d "$WEST_BUILD_DIR" -- -DEXTRA_CONF_FILE="$OVERLAY_CONF"
 
 mkdir -p "$SCRIPTDIR/emulate"
 cp -f "$ZEPHYR_PROJECT/$WEST_BUILD_DIR/zephyr/zephyr.elf" "$SCRIPTDIR/emulate/output.elf"
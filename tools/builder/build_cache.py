@@ -0,0 +1,169 @@
+# 编译结果缓存：<testcase>/emulate/build_cache/<key>/
+#
+# key 由以下内容的哈希组成：编译类型（build/raw/verify）、工具链指纹（testcase 脚本与配置，见 proj_builder.toolchain_fingerprint）、
+# 数据库 src.zip（未被替换的源码都以它为准）以及每个被替换文件替换后的完整内容。
+# 源码状态完全相同时直接返回保存的 BuildOutput；build/raw 命中时同时恢复 output.elf/output.bin/syms.yml。
+# 失败的结果只在编译器报错落在被替换的文件中时保存（由替换内容决定，重编也一样失败）；
+# 工具链缺失、磁盘满、编译被中断、链接错误等与环境有关的失败不缓存，下次照常编译。
+#
+# 环境变量：
+#   LCMHAL_BUILD_CACHE=0            关闭缓存
+#   LCMHAL_BUILD_CACHE_MAX_MB       缓存目录大小上限（默认 512），超出时按最近使用时间淘汰
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterable, Optional, Tuple
+
+import config.globs as globs
+from models.build_results.build_output import BuildOutput
+from tools.builder.proj_builder import compile_error_files, toolchain_fingerprint
+from utils.env import env_flag, env_float
+
+CACHE_DIR = "build_cache"
+RESULT_FILE = "result.json"
+ARTIFACTS = ("output.elf", "output.bin", "syms.yml")
+
+_evict_lock = threading.Lock()
+
+
+def build_cache_enabled() -> bool:
+    return env_flag("LCMHAL_BUILD_CACHE", True)
+
+
+def _max_bytes() -> int:
+    return int(max(env_float("LCMHAL_BUILD_CACHE_MAX_MB", 512), 0) * 1024 * 1024)
+
+
+def _cache_root(conf_path: str) -> str:
+    return os.path.join(conf_path, "emulate", CACHE_DIR)
+
+
+def _db_fingerprint() -> str:
+    db_path = getattr(globs, "db_path", None) or ""
+    try:
+        st = os.stat(os.path.join(db_path, "src.zip"))
+        return f"{os.path.abspath(db_path)}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return os.path.abspath(db_path) if db_path else ""
+
+
+def build_cache_key(kind: str, conf_path: str, patched: Iterable[Tuple[str, object]]) -> Optional[str]:
+    """patched 为 (文件路径, 替换后的内容 str/bytes)；缓存关闭时返回 None"""
+    if not build_cache_enabled():
+        return None
+    h = hashlib.sha256()
+    for part in (kind, toolchain_fingerprint(conf_path), _db_fingerprint()):
+        h.update(part.encode("utf-8") + b"\0")
+    for path, content in sorted(patched, key=lambda item: item[0]):
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        h.update(path.encode("utf-8") + b"\0" + hashlib.sha256(data).digest())
+    return h.hexdigest()
+
+
+def lookup_build(conf_path: str, key: Optional[str], restore_artifacts: bool = False) -> Optional[BuildOutput]:
+    """命中时返回 BuildOutput（restore_artifacts 时把保存的产物复制回 emulate/），未命中返回 None"""
+    if not key:
+        return None
+    entry = os.path.join(_cache_root(conf_path), key)
+    try:
+        with open(os.path.join(entry, RESULT_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        build_output = BuildOutput(**data)
+    except Exception:
+        return None
+    if restore_artifacts and build_output.exit_code == 0:
+        emulate_dir = os.path.join(conf_path, "emulate")
+        for name in ARTIFACTS:
+            src = os.path.join(entry, name)
+            if os.path.exists(src):
+                shutil.copy2(src, os.path.join(emulate_dir, name))
+    # 更新使用时间，淘汰时按它排序
+    try:
+        os.utime(os.path.join(entry, RESULT_FILE))
+    except OSError:
+        pass
+    print(f"[INFO] build cache hit ({key[:12]}), exit_code={build_output.exit_code}")
+    return build_output
+
+
+def store_build(conf_path: str, key: Optional[str], build_output: BuildOutput, save_artifacts: bool = False,
+                patched_files: Optional[Iterable[str]] = None) -> None:
+    """保存编译结果；只有成功的 build/raw 才保存产物（失败时 emulate/ 里的 ELF 是旧的）。
+    失败的结果只在 patched_files（被替换的文件）中有编译器报错时保存"""
+    if not key:
+        return
+    if build_output.exit_code != 0:
+        patched_names = {os.path.basename(path) for path in patched_files or ()}
+        if not compile_error_files(build_output) & patched_names:
+            return
+    root = _cache_root(conf_path)
+    entry = os.path.join(root, key)
+    if os.path.exists(entry):
+        return
+    try:
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+        with open(os.path.join(tmp, RESULT_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "std_err": build_output.std_err,
+                "std_out": build_output.std_out,
+                "exit_code": build_output.exit_code,
+            }, f, ensure_ascii=False)
+        if save_artifacts and build_output.exit_code == 0:
+            emulate_dir = os.path.join(conf_path, "emulate")
+            for name in ARTIFACTS:
+                src = os.path.join(emulate_dir, name)
+                if os.path.exists(src):
+                    shutil.copy2(src, os.path.join(tmp, name))
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # 并发写入同一 key，保留先完成的那份
+            shutil.rmtree(tmp, ignore_errors=True)
+    except OSError as e:
+        print(f"[WARNING] Failed to store build cache entry: {e}")
+        return
+    _evict(root, keep=entry)
+
+
+def _entry_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+def _evict(root: str, keep: str) -> None:
+    """超出大小上限时从最久未使用的条目开始删除（刚写入的 keep 除外）"""
+    limit = _max_bytes()
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                used = os.path.getmtime(os.path.join(path, RESULT_FILE))
+            except OSError:
+                used = 0.0
+            entries.append((used, _entry_size(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def clear_build_cache(conf_path: str) -> None:
+    shutil.rmtree(_cache_root(conf_path), ignore_errors=True)
+
@@ -0,0 +1,258 @@
+# 单个编译单元（TU）的快速验证
+#
+# 编译时在 PATH 前面放一组同名的编译器包装脚本（arm-none-eabi-gcc、gcc、clang 等），
+# 记录每次 "-c" 编译的 cwd 与参数后再执行真正的编译器，整理成标准的 <testcase>/emulate/compile_commands.json。
+# 全量编译（pristine）时整体重写；增量编译只重新编译了部分文件，记录到的命令合并进已有的文件。
+# 构建系统用绝对路径调用编译器（例如 CMake/Zephyr）时记录不到，可用 LCMHAL_COMPILE_COMMANDS 指定已有的 compile_commands.json。
+#
+# 验证替换时先把替换后的文件写到临时目录，用记录的命令加 -fsyntax-only 只编译这一个文件
+# （-iquote 原目录，保证 #include "xxx.h" 的查找顺序不变；去掉 -o/-MD 等会写构建目录的参数），
+# 语法/类型错误在一秒内返回；TU 通过后再做完整的链接编译。
+#
+# 环境变量：
+#   LCMHAL_TU_VERIFY=0          关闭 TU 验证与编译命令记录
+#   LCMHAL_TU_VERIFY_ONLY=1     TU 通过即认为验证通过，不再做完整编译
+#   LCMHAL_COMPILE_COMMANDS     已有的 compile_commands.json（优先于自动记录的）
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.env import env_flag
+
+COMPILE_DB_FILE = "compile_commands.json"
+CAPTURE_COMPILERS = (
+    "arm-none-eabi-gcc", "arm-none-eabi-g++", "arm-none-eabi-cc",
+    "gcc", "g++", "cc", "c++", "clang", "clang++",
+)
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx")
+TU_TIMEOUT_S = 120
+
+# 会写文件的参数：(参数, 是否带一个独立的值)
+_OUTPUT_FLAGS = {"-o": True, "-MF": True, "-MT": True, "-MQ": True, "-MD": False, "-MMD": False, "-M": False, "-MM": False, "-MP": False}
+
+_WRAPPER = """#!{python}
+import json, os, sys
+real = {real!r}
+try:
+    with open({log!r}, "a", encoding="utf-8") as f:
+        f.write(json.dumps({{"directory": os.getcwd(), "arguments": [real] + sys.argv[1:]}}) + "\\n")
+except OSError:
+    pass
+os.execv(real, [real] + sys.argv[1:])
+"""
+
+_db_cache: Dict[str, Tuple[float, Dict[str, dict]]] = {}
+_db_cache_lock = threading.Lock()
+
+
+def tu_verify_enabled() -> bool:
+    return env_flag("LCMHAL_TU_VERIFY", True)
+
+
+def tu_verify_only() -> bool:
+    return env_flag("LCMHAL_TU_VERIFY_ONLY", False)
+
+
+def compile_db_path(conf_path: str) -> str:
+    override = os.environ.get("LCMHAL_COMPILE_COMMANDS", "").strip()
+    return override or os.path.join(conf_path, "emulate", COMPILE_DB_FILE)
+
+
+def compile_db_missing(conf_path: str) -> bool:
+    """需要自动记录编译命令但还没有 compile_commands.json（需要一次全量编译才能记录完整）"""
+    if not tu_verify_enabled() or os.environ.get("LCMHAL_COMPILE_COMMANDS", "").strip():
+        return False
+    return not os.path.isfile(compile_db_path(conf_path))
+
+
+# ---- 记录编译命令 ----
+def start_capture(conf_path: str, base_env: Optional[dict] = None) -> Optional[Tuple[dict, str]]:
+    """生成包装脚本，返回 (传给 build.sh 的环境变量, 临时目录)；没有可包装的编译器时返回 None。
+    base_env 为 build.sh 原本的环境变量（例如 link_replace 已在 PATH 前面放了链接包装脚本）"""
+    if not tu_verify_enabled() or os.environ.get("LCMHAL_COMPILE_COMMANDS", "").strip():
+        return None
+    base_env = base_env if base_env is not None else dict(os.environ)
+    search_path = base_env.get("PATH", "")
+    tmp_dir = tempfile.mkdtemp(prefix="lcmhal-cc-capture-")
+    bin_dir = os.path.join(tmp_dir, "bin")
+    os.makedirs(bin_dir)
+    log_path = os.path.join(tmp_dir, "commands.jsonl")
+    wrapped = 0
+    for name in CAPTURE_COMPILERS:
+        real = shutil.which(name, path=search_path)
+        if not real:
+            continue
+        path = os.path.join(bin_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_WRAPPER.format(python=sys.executable, real=os.path.abspath(real), log=log_path))
+        os.chmod(path, 0o755)
+        wrapped += 1
+    if not wrapped:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    env = dict(base_env, PATH=bin_dir + os.pathsep + search_path)
+    return env, tmp_dir
+
+
+def _source_of(arguments: List[str], directory: str) -> Optional[str]:
+    if "-c" not in arguments:
+        return None
+    sources = [a for a in arguments[1:] if a.endswith(SOURCE_SUFFIXES) and not a.startswith("-")]
+    if len(sources) != 1:
+        return None
+    return os.path.normpath(os.path.join(directory, sources[0]))
+
+
+def finish_capture(conf_path: str, tmp_dir: str, build_ok: bool, merge: bool = False) -> None:
+    """把记录到的命令整理成 compile_commands.json（编译失败时记录不完整，不覆盖已有的）。
+    merge 时（增量编译）把记录到的命令合并进已有的 compile_commands.json"""
+    try:
+        if not build_ok:
+            return
+        entries: Dict[str, dict] = {}
+        if merge:
+            entries.update((src, dict(entry, file=src)) for src, entry in load_compile_db(conf_path).items())
+        captured = 0
+        try:
+            with open(os.path.join(tmp_dir, "commands.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        cmd = json.loads(line)
+                    except ValueError:
+                        continue
+                    src = _source_of(cmd["arguments"], cmd["directory"])
+                    if src:
+                        entries[src] = {"directory": cmd["directory"], "arguments": cmd["arguments"], "file": src}
+                        captured += 1
+        except OSError:
+            return
+        if not captured:
+            return
+        db_path = compile_db_path(conf_path)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        tmp = db_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(entries.values()), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, db_path)
+        print(f"[INFO] captured {captured} compile commands into {db_path} ({len(entries)} files)")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ---- 查询 ----
+def load_compile_db(conf_path: str) -> Dict[str, dict]:
+    """{源文件绝对路径: 编译命令}，按文件 mtime 缓存"""
+    db_path = compile_db_path(conf_path)
+    try:
+        mtime = os.path.getmtime(db_path)
+    except OSError:
+        return {}
+    with _db_cache_lock:
+        cached = _db_cache.get(db_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(db_path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    entries = {}
+    for entry in raw if isinstance(raw, list) else []:
+        directory = entry.get("directory", "")
+        arguments = entry.get("arguments")
+        if arguments is None and entry.get("command"):
+            import shlex
+            arguments = shlex.split(entry["command"])
+        if not arguments or not entry.get("file"):
+            continue
+        entries[os.path.normpath(os.path.join(directory, entry["file"]))] = {
+            "directory": directory, "arguments": arguments, "file": entry["file"],
+        }
+    with _db_cache_lock:
+        _db_cache[db_path] = (mtime, entries)
+    return entries
+
+
+def _retarget_args(arguments: List[str], source: str, tmp_source: str) -> List[str]:
+    """把记录的编译命令改为编译 tmp_source，并去掉会写构建目录的参数"""
+    args = [arguments[0]]
+    skip = False
+    for arg in arguments[1:]:
+        if skip:
+            skip = False
+            continue
+        if arg in _OUTPUT_FLAGS:
+            skip = _OUTPUT_FLAGS[arg]
+            continue
+        if arg.startswith(("-o", "-MF", "-MT", "-MQ", "-Wp,-M")):
+            continue
+        args.append(arg)
+    out = []
+    for arg in args:
+        if arg.endswith(SOURCE_SUFFIXES) and not arg.startswith("-") and os.path.basename(arg) == os.path.basename(source):
+            out.append(tmp_source)
+        else:
+            out.append(arg)
+    # 原目录放在所有 -iquote 之前，与编译原文件时 #include "..." 的查找顺序一致
+    return out[:1] + ["-iquote", os.path.dirname(source)] + out[1:]
+
+
+def _syntax_only_args(arguments: List[str], source: str, tmp_source: str) -> List[str]:
+    return _retarget_args(arguments, source, tmp_source) + ["-fsyntax-only"]
+
+
+def check_translation_unit(conf_path: str, source: str, content: str) -> Optional[Tuple[bool, str]]:
+    """用记录的编译命令只编译替换后的 source（不写任何构建产物）。
+
+    返回 (是否通过, stderr)；没有该文件的编译命令时返回 None（由调用方做完整编译）。
+    stderr 中的临时文件路径会换回 source，行号与替换后的文件一致。
+    """
+    if not tu_verify_enabled():
+        return None
+    entry = load_compile_db(conf_path).get(os.path.normpath(source))
+    if entry is None:
+        return None
+    tmp_dir = tempfile.mkdtemp(prefix="lcmhal-tu-")
+    try:
+        tmp_source = os.path.join(tmp_dir, os.path.basename(source))
+        with open(tmp_source, "w", encoding="utf-8") as f:
+            f.write(content)
+        args = _syntax_only_args(entry["arguments"], source, tmp_source)
+        try:
+            r = subprocess.run(args, cwd=entry["directory"] or None, capture_output=True, text=True, timeout=TU_TIMEOUT_S)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[WARNING] single-TU check for {source} could not run: {e}")
+            return None
+        return r.returncode == 0, (r.stderr or "").replace(tmp_source, source)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def compile_object(conf_path: str, source: str, content: str, obj_path: str) -> Optional[Tuple[bool, str]]:
+    """用 source 的编译命令把 content 编译成 obj_path（用于 link_replace 生成的替换单元）。
+
+    返回 (是否成功, stderr)；没有 source 的编译命令时返回 None。
+    """
+    entry = load_compile_db(conf_path).get(os.path.normpath(source))
+    if entry is None:
+        return None
+    tmp_dir = tempfile.mkdtemp(prefix="lcmhal-obj-")
+    try:
+        tmp_source = os.path.join(tmp_dir, os.path.basename(source))
+        with open(tmp_source, "w", encoding="utf-8") as f:
+            f.write(content)
+        args = _retarget_args(entry["arguments"], source, tmp_source) + ["-o", obj_path]
+        try:
+            r = subprocess.run(args, cwd=entry["directory"] or None, capture_output=True, text=True, timeout=TU_TIMEOUT_S)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[WARNING] compiling replacement unit for {source} could not run: {e}")
+            return None
+        return r.returncode == 0, (r.stderr or "").replace(tmp_source, source)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
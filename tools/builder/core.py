@@ -1,16 +1,31 @@
 # Builder工具的核心功能模块
 # 提供直接调用的函数接口，避免通过MCP客户端启动新进程
+import os
+import re
 import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple
 
 import config.globs as globs
-from tools.builder.proj_builder import build_proj, clear_proj
+from tools.builder.proj_builder import clear_proj, last_build_pristine, rebuild_proj
+from tools.builder.build_cache import build_cache_key, lookup_build, store_build
+from tools.builder.compile_db import check_translation_unit, tu_verify_only
+from tools.builder.link_replace import (
+    finish_link, link_supported, mark_link_unsupported, plan_link_replacements, replace_mode, start_link,
+)
+from models.build_results.build_output import BuildOutput
 from tools.collector.collector import get_function_info, get_function_source
-from tools.replacer.code_recover import function_recover
 from tools.replacer.code_replacer import function_replace
+from tools.replacer.patch_planner import plan_patches, write_patches
+from utils.db_file import read_file_from_db_zip
+from utils.src_ops import file_convert_proj2src, write_src_file
 from core.data_manager import data_manager
 from utils.replacement_rubric import check_replacement_rubric
+from utils.env import env_float
 
-# 串行化所有编译相关操作，避免多线程/多 Agent 并发编译同一项目
+# 串行化真实源码树上的编译相关操作，避免多线程/多 Agent 并发编译同一项目；
+# 启用构建工作区（LCMHAL_BUILD_WORKSPACES）后，编译验证在各自的副本中并发进行，只在克隆副本时持有该锁
 _build_lock = threading.Lock()
 
 
@@ -22,8 +37,14 @@ def _is_core_function(func_name: str, mmio_info_list: dict) -> bool:
     return getattr(classify_res, "function_type", None) == "CORE"
 
 
-def replace_funcs():
-    """替换需要替换的函数"""
+# replace_funcs 实际改写过的文件 {DB 中的文件路径: 原文}；None 表示本进程还没有替换过（recover_funcs 需全部检查）
+_patched_files: Optional[Dict[str, str]] = None
+# 写文件中途出错时置位：磁盘上的状态不确定，recover_funcs 除了恢复已记录的文件还要做一次全量检查
+_recover_scan = False
+
+
+def _replacement_items() -> list:
+    """当前需要替换的函数：[(func_name, func_info, replace_code)]（CORE 类函数除外）"""
     mmio_info_list = data_manager.get_mmio_info_list()
     replacement_updates = data_manager.get_replacement_updates()
     
@@ -47,44 +68,64 @@ def replace_funcs():
         print(f"  {i}. {func_name}")
     print(f"{'='*60}\n")
     
-    # 执行替换（跳过 CORE 类函数，保留原实现）
-    replaced_count = 0
+    # 收集替换（跳过 CORE 类函数，保留原实现）
+    items = []
     for func_name, replacement_update in replacement_updates.items():
         if _is_core_function(func_name, mmio_info_list):
             print(f"[REPLACE] Skipping CORE function (no replacement): {func_name}")
             continue
+        items.append((func_name, replacement_update.replacement_code))
+    
+    # 然后处理mmio_info_list中不在replacement_updates中的函数
+    for func_name, classify_res in mmio_info_list.items():
+        if func_name not in replacement_updates and classify_res and classify_res.has_replacement:
+            items.append((func_name, classify_res.function_replacement))
+    
+    plan_items = []
+    for func_name, replacement_code in items:
         func_info = get_function_info(globs.db_path, func_name)
         if func_info:
-            replace_res = function_replace(func_info, replacement_update.replacement_code)
-            if not replace_res:
-                print(f"Warning: Failed to replace function {func_name}")
-            else:
-                replaced_count += 1
+            plan_items.append((func_name, func_info, replacement_code))
         else:
             print(f"Warning: Function {func_name} not found in database")
+    return plan_items
+
+
+def replace_funcs(plan_items: Optional[list] = None) -> Dict[str, str]:
+    """替换需要替换的函数（默认 _replacement_items() 的全部函数）：按文件合并后每个文件只写一次。
+    返回 {DB 中的文件路径: 替换后内容}"""
+    global _patched_files, _recover_scan
+    if plan_items is None:
+        plan_items = _replacement_items()
     
-    # 然后处理mmio_info_list中不在replacement_updates中的函数
-    for func_name, classify_res in mmio_info_list.items():
-        if func_name not in replacement_updates and classify_res and classify_res.has_replacement:
-            func_info = get_function_info(globs.db_path, func_name)
-            if func_info:
-                replacement_code = classify_res.function_replacement
-                replace_res = function_replace(func_info, replacement_code)
-                if not replace_res:
-                    print(f"Warning: Failed to replace function {func_name}")
-                else:
-                    replaced_count += 1
-            else:
-                print(f"Warning: Function {func_name} not found in database")
+    # 所有替换都相对 src.zip 中的原文定位，一次拼接，每个文件写一次
+    files, failed = plan_patches(plan_items, _original_source)
+    # 写之前先记录原文：写到一半出错时已写的文件也能恢复
+    if _patched_files is None:
+        _patched_files = {}
+    for path, fp in files.items():
+        _patched_files.setdefault(path, fp.original)
+    try:
+        write_patches(files)
+    except Exception:
+        _recover_scan = True
+        raise
+    for func_name, func_info, replacement_code in plan_items:
+        if func_name in failed:
+            print(f"Warning: Failed to replace function {func_name}")
+            # 走一遍逐个替换，记录原函数与文件内容的差异（lcmhal_failcheck_logs），找不到时不会写文件
+            function_replace(func_info, replacement_code)
+    replaced_count = len(plan_items) - len(failed)
     
     # 替换后打印所有成功替换的函数
     print(f"\n{'='*60}")
-    print(f"[REPLACE] Successfully replaced functions: {replaced_count}/{len(all_funcs_to_replace)}")
+    print(f"[REPLACE] Successfully replaced functions: {replaced_count}/{len(plan_items)}")
     print(f"{'='*60}\n")
+    return {path: fp.patched for path, fp in files.items()}
 
 
-def recover_funcs():
-    """恢复被替换的函数"""
+def _replaced_files() -> set:
+    """replace_funcs 会改写的全部文件（DB 中的路径）"""
     mmio_info_list = data_manager.get_mmio_info_list()
     replacement_updates = data_manager.get_replacement_updates()
     
@@ -103,11 +144,21 @@ def recover_funcs():
         func_info = get_function_info(globs.db_path, func_name)
         if func_info:
             files_to_recover.add(func_info.file_path)
-    
-    # 复原所有收集到的文件
-    for file_path in files_to_recover:
+    return files_to_recover
+
+
+def recover_funcs():
+    """恢复被替换的函数：只恢复 replace_funcs 实际改写过的文件（内容未变化的文件不会重写）"""
+    global _patched_files, _recover_scan
+    for file_path, original in (_patched_files or {}).items():
+        write_src_file(file_convert_proj2src(file_path), original)
+    if _patched_files is None or _recover_scan:
+        # 本进程还没有替换过（上次运行可能中途退出）或上次写文件出错：检查所有可能被替换的文件
         from tools.replacer.code_recover import recover_code_file
-        recover_res = recover_code_file(file_path)
+        for file_path in _replaced_files():
+            recover_code_file(file_path)
+    _patched_files = {}
+    _recover_scan = False
 
 
 def elf_to_bin(elf_path: str, bin_path: str) -> bool:
@@ -188,11 +239,18 @@ def build_project() -> dict:
     with _build_lock:
         # 首先恢复原始文件，确保源文件是干净的原始状态
         recover_funcs()
-        # 替换文件
-        replace_funcs()
-        # 编译项目
-        clear_proj(globs.script_path)
-        build_info = build_proj(globs.script_path)
+        if replace_mode() == "link" and link_supported(globs.script_path):
+            build_info, cache_key, cache_hit = _build_project_linked()
+        else:
+            # 替换文件
+            patched = replace_funcs()
+            # 替换后的源码状态与之前某次编译完全相同时直接复用结果与产物
+            cache_key = build_cache_key("build", globs.script_path, patched.items())
+            build_info = lookup_build(globs.script_path, cache_key, restore_artifacts=True)
+            cache_hit = build_info is not None
+            if not cache_hit:
+                # 编译项目（默认增量，见 proj_builder.rebuild_proj）
+                build_info = rebuild_proj(globs.script_path, capture_commands=True, patched_files=patched)
         # 项目复原
         recover_funcs()
     
@@ -234,6 +292,8 @@ def build_project() -> dict:
             print(f"Error processing output files after build: {e}")
             import traceback
             traceback.print_exc()
+        if not cache_hit:
+            store_build(globs.script_path, cache_key, build_info, save_artifacts=True)
         
         # 结果输出，添加 stdout/stderr 长度限制，避免 Builder 对话上下文过长导致 API 400
         stdout_limit = 10000
@@ -256,6 +316,52 @@ def build_project() -> dict:
         }
 
 
+def _link_build(plan, patched):
+    """带链接包装脚本编译一次（patched 为退回源码替换的文件），返回 (BuildOutput, 是否拦截到链接命令)；
+    生成不了包装脚本时返回 (None, False)"""
+    link = start_link(plan)
+    if link is None:
+        return None, False
+    build_info = rebuild_proj(globs.script_path, capture_commands=True, env=link[0], patched_files=patched)
+    return build_info, finish_link(link[1])
+
+
+def _build_project_linked():
+    """链接级替换（见 link_replace）：能在链接时覆盖的函数编译进替换单元，其余退回源码替换。
+    调用方持有 _build_lock 且源码已恢复；返回 (BuildOutput, cache_key, 是否命中编译缓存)"""
+    items = _replacement_items()
+    plan = plan_link_replacements(globs.script_path, items, _original_source)
+    print(f"[REPLACE] Link-level replacements: {len(plan.symbols)}, source replacements: {len(plan.fallback)}")
+    for func_name, reason in plan.reasons.items():
+        print(f"[REPLACE]   {func_name}: source replacement ({reason})")
+    patched = replace_funcs(plan.fallback)
+    cache_key = build_cache_key("build-link", globs.script_path, list(patched.items()) + list(plan.units.items()))
+    build_info = lookup_build(globs.script_path, cache_key, restore_artifacts=True)
+    if build_info is not None:
+        return build_info, cache_key, True
+    if not plan.objects:
+        return rebuild_proj(globs.script_path, capture_commands=True, patched_files=patched), cache_key, False
+    build_info, linked = _link_build(plan, patched)
+    if build_info is not None and not linked and build_info.exit_code == 0 \
+            and not last_build_pristine(globs.script_path):
+        # 增量编译时若只有替换单元变化，make 不会重新链接（ELF 仍是旧的）：清除目标文件后全量编译，必定链接
+        print(f"[INFO] incremental build in {globs.script_path} did not relink, retrying with a pristine build")
+        clear_proj(globs.script_path)
+        build_info, linked = _link_build(plan, patched)
+    if build_info is not None and (linked or build_info.exit_code != 0):
+        return build_info, cache_key, False
+    if build_info is None:
+        print("[WARNING] no compiler/objcopy found for link-level replacement, falling back to source replacement")
+    else:
+        # 全量编译也没有拦截到链接命令：替换单元没有进入 ELF，记下后改用源码替换重新编译
+        print(f"[WARNING] build.sh in {globs.script_path} does not link through PATH, falling back to source replacement")
+        mark_link_unsupported(globs.script_path)
+    recover_funcs()
+    patched = replace_funcs(items)
+    cache_key = build_cache_key("build", globs.script_path, patched.items())
+    return rebuild_proj(globs.script_path, capture_commands=True, patched_files=patched), cache_key, False
+
+
 def get_replace_func_details_by_file(file_path: str) -> dict:
     """根据文件路径获取替换函数详情
     
@@ -268,6 +374,122 @@ def get_replace_func_details_by_file(file_path: str) -> dict:
     return data_manager.get_replace_func_details_by_file(file_path)
 
 
+def _original_source(code_path: str):
+    """未替换的文件内容：优先取 src.zip，读不到时取磁盘上的源文件"""
+    content, ok = read_file_from_db_zip(globs.db_path, code_path)
+    if ok and content:
+        return content
+    try:
+        with open(file_convert_proj2src(code_path), "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _patch_sources(items: list):
+    """在内存中把一组替换应用到各自的文件上（见 patch_planner，同一文件只拼接一次）。
+
+    items: [(key, func_info, replace_code)]
+    返回 (files, spans, failed)：
+      files  {DB 中的文件路径: FilePatch}，只包含内容有变化的文件
+      spans  {key: (文件路径, 起始行, 结束行)}，替换代码在替换后文件中的行范围，用于把编译诊断归到具体替换
+      failed [key]，原函数代码在文件中找不到等无法应用的替换
+    """
+    files, failed = plan_patches(items, _original_source)
+    spans = {key: (path, start, end) for path, fp in files.items() for key, (start, end) in fp.spans.items()}
+    return files, spans, failed
+
+
+def _build_in_workspace(files: dict):
+    """在隔离构建工作区中写入替换后的文件并编译（不持有 _build_lock，可并发）。
+
+    返回 BuildOutput；未启用工作区或工作区不可用时返回 None，由调用方退回在真实源码树上串行编译。
+    """
+    from tools.builder.workspace import get_workspace_pool
+
+    pool = get_workspace_pool()
+    if pool is None:
+        return None
+    try:
+        with pool.acquire(_build_lock) as ws:
+            targets = {}
+            for path in files:
+                target = ws.map_path(file_convert_proj2src(path))
+                if target is None or not os.path.isfile(target):
+                    print(f"[WARNING] {path} is outside the build workspace, falling back to in-tree verification")
+                    return None
+                targets[path] = target
+            ws.mark_dirty([(path, target) for path, target in targets.items()])
+            written = []
+            try:
+                written = write_patches(files, targets.get)
+                return rebuild_proj(ws.script_path, patched_files=targets.values())
+            finally:
+                for target, original in written:
+                    write_src_file(target, original)
+                ws.mark_clean()
+    except Exception as e:
+        print(f"[WARNING] build workspace unavailable, falling back to in-tree verification: {e}")
+        return None
+
+
+def _check_translation_units(files: dict) -> Optional[BuildOutput]:
+    """只编译被替换的文件（见 compile_db）：有文件失败时返回失败结果；
+    全部通过且 LCMHAL_TU_VERIFY_ONLY 时返回成功结果；其余情况返回 None，继续完整编译"""
+    checked, errors = 0, []
+    for fp in files.values():
+        res = check_translation_unit(globs.script_path, fp.src_file, fp.patched)
+        if res is None:
+            continue
+        checked += 1
+        if not res[0]:
+            errors.append(res[1])
+    if errors:
+        return BuildOutput(std_err="\n".join(errors), std_out="[single-TU check failed]", exit_code=1)
+    if checked == len(files) and tu_verify_only():
+        return BuildOutput(std_err="", std_out="[single-TU check passed]", exit_code=0)
+    return None
+
+
+def _build_patched(files: dict):
+    """编译一组替换后的文件（编译缓存 -> 单 TU 检查 -> 构建工作区 -> 持锁在真实源码树上编译），编译后恢复原文件。
+    单 TU 检查与完整编译的结果分别缓存：单 TU 的通过结果只在 LCMHAL_TU_VERIFY_ONLY 时被当作验证通过"""
+    sources = [(p, fp.patched) for p, fp in files.items()]
+    cache_key = build_cache_key("verify", globs.script_path, sources)
+    tu_key = build_cache_key("verify-tu", globs.script_path, sources)
+    build_output = lookup_build(globs.script_path, cache_key)
+    if build_output is not None:
+        return build_output
+    build_output = lookup_build(globs.script_path, tu_key)
+    if build_output is not None and (build_output.exit_code != 0 or tu_verify_only()):
+        return build_output
+    build_output = _check_translation_units(files)
+    if build_output is not None:
+        store_build(globs.script_path, tu_key, build_output, patched_files=files)
+        return build_output
+    build_output = _build_in_workspace(files)
+    if build_output is None:
+        # 这里不修改 replacement_updates，只在工作树里临时替换做验证；与 build_project/build_with_raw 串行
+        with _build_lock:
+            written = []
+            try:
+                written = write_patches(files)
+                build_output = rebuild_proj(globs.script_path, capture_commands=True, patched_files=files)
+            finally:
+                # 无论成败都恢复原始代码，避免污染后续流程
+                for target, original in written:
+                    write_src_file(target, original)
+    store_build(globs.script_path, cache_key, build_output, patched_files=files)
+    return build_output
+
+
+def _apply_failed(func_name: str) -> dict:
+    return {
+        "ok": False,
+        "reason": f"Failed to apply replacement into source file for {func_name} during compile verification."
+    }
+
+
 def _compile_verify_single_replacement(func_name: str, replace_code: str) -> dict | None:
     """对单个函数的替换做一次“临时落盘 + 全项目编译”验证。
     
@@ -283,24 +505,11 @@ def _compile_verify_single_replacement(func_name: str, replace_code: str) -> dic
         # 找不到函数信息时也不强制失败，而是跳过验证，让上层继续正常落盘
         return None
     
-    # 1) 在源文件中临时应用本次替换
-    applied = function_replace(func_info, replace_code)
-    if not applied:
-        return {
-            "ok": False,
-            "reason": f"Failed to apply replacement into source file for {func_name} during compile verification."
-        }
-    
-    # 2) 运行一次项目构建（使用现有 build.sh/clear.sh 工具链）
-    #    这里不修改 replacement_updates，只在工作树里替换这一处代码做验证；与 build_project/build_with_raw 串行
-    build_output = None
-    try:
-        with _build_lock:
-            clear_proj(globs.script_path)
-            build_output = build_proj(globs.script_path)
-    finally:
-        # 3) 无论成败都恢复该文件原始代码，避免污染后续流程
-        function_recover(func_info)
+    files, _, failed = _patch_sources([(func_name, func_info, replace_code)])
+    if failed or not files:
+        return _apply_failed(func_name)
+    # 同一份替换（替换后的文件内容相同）已经验证过时直接返回之前的结果（见 build_cache）
+    build_output = _build_patched(files)
     
     if build_output is None or build_output.exit_code != 0:
         # 编译失败，携带 stderr 返回给上层 Agent，用于驱动重新生成函数体
@@ -313,6 +522,221 @@ def _compile_verify_single_replacement(func_name: str, replace_code: str) -> dic
     return None
 
 
+# ---- 批量编译验证 ----
+# 多个替换一起编译一次；失败时按编译诊断的 文件:行号 归到对应替换，
+# 无法归属的部分（链接错误、其他文件中的错误等）二分后分别重编，总编译次数约为 1 + log N。
+
+_DIAG_RE = re.compile(r"^(?P<file>[^\s:][^:]*):(?P<line>\d+)(?::\d+)?:\s*(?P<msg>.*)$")
+_DIAG_ERROR_WORDS = ("error", "undefined reference", "multiple definition")
+_BATCH_STDERR_LIMIT = 8000
+
+
+def _error_diagnostics(std_err: str) -> list:
+    """提取 stderr 中的错误诊断：[(文件路径, 行号, 原始行)]"""
+    diags = []
+    for line in (std_err or "").splitlines():
+        m = _DIAG_RE.match(line.strip())
+        if m and any(w in m.group("msg").lower() for w in _DIAG_ERROR_WORDS):
+            diags.append((m.group("file"), int(m.group("line")), line))
+    return diags
+
+
+def _same_file(diag_path: str, code_path: str) -> bool:
+    """诊断中的路径可能是相对路径或工作区副本中的路径，按最长公共后缀判断"""
+    a = os.path.normpath(diag_path).split(os.sep)
+    b = os.path.normpath(code_path).split(os.sep)
+    if a[-1] != b[-1]:
+        return False
+    # 文件名相同时至少再比较一级目录（诊断只有文件名时直接认为相同）
+    return len(a) == 1 or len(b) == 1 or a[-2] == b[-2]
+
+
+def _attribute_errors(std_err: str, spans: dict) -> Tuple[Dict[str, list], bool]:
+    """把错误诊断归到替换上：返回 ({key: [诊断行]}, 是否存在无法归属的错误)"""
+    blamed: Dict[str, list] = {}
+    unattributed = False
+    diags = _error_diagnostics(std_err)
+    for diag_file, line_no, text in diags:
+        owner = None
+        for key, (path, start, end) in spans.items():
+            if start <= line_no <= end and _same_file(diag_file, path):
+                owner = key
+                break
+        if owner is None:
+            unattributed = True
+        else:
+            blamed.setdefault(owner, []).append(text)
+    # 没有可解析的诊断（例如脚本本身失败）也视为无法归属
+    return blamed, unattributed or not diags
+
+
+def _truncate_stderr(std_err: str) -> str:
+    if std_err and len(std_err) > _BATCH_STDERR_LIMIT:
+        return std_err[:_BATCH_STDERR_LIMIT] + f"\n[TRUNCATED] stderr exceeded {_BATCH_STDERR_LIMIT} chars."
+    return std_err or ""
+
+
+def _verify_batch(items: list, results: dict, known_fail: bool = False) -> None:
+    """items: [(key, func_info, replace_code)]；结果写入 results[key] = None（通过）或错误 dict。
+    known_fail 表示已知这一组一起编译会失败（二分时另一半通过），多于一个时直接继续二分"""
+    if not items:
+        return
+    if known_fail and len(items) > 1:
+        _bisect(items, results)
+        return
+    files, spans, failed = _patch_sources(items)
+    # 与单个验证一致：无法应用或替换后文件没有变化（不在 files 中）都视为替换失败
+    failed = set(failed) | {key for key, _, _ in items if key not in spans}
+    for key, func_info, _ in items:
+        if key in failed:
+            results[key] = _apply_failed(key)
+    items = [it for it in items if it[0] not in failed]
+    if not items or not files:
+        return
+    build_output = _build_patched(files)
+    if build_output is not None and build_output.exit_code == 0:
+        for key, _, _ in items:
+            results[key] = None
+        return
+    std_err = build_output.std_err if build_output else ""
+    if len(items) == 1:
+        results[items[0][0]] = {
+            "ok": False,
+            "reason": "Compile verification failed for replacement.",
+            "build_stderr": std_err,
+        }
+        return
+    blamed, unattributed = _attribute_errors(std_err, spans)
+    for key, lines in blamed.items():
+        results[key] = {
+            "ok": False,
+            "reason": "Compile verification failed for replacement (batched build; diagnostics inside this replacement).",
+            "build_stderr": "\n".join(lines) + "\n\n[batch build stderr]\n" + _truncate_stderr(std_err),
+        }
+    rest = [it for it in items if it[0] not in blamed]
+    if not rest:
+        return
+    if unattributed:
+        _bisect(rest, results)
+    else:
+        # 出错的 TU 可能掩盖了同一次编译里其他替换的错误，剩余部分重编一次确认
+        _verify_batch(rest, results)
+
+
+def _bisect(items: list, results: dict) -> None:
+    mid = len(items) // 2
+    left, right = items[:mid], items[mid:]
+    _verify_batch(left, results)
+    left_passed = all(results.get(key) is None for key, _, _ in left)
+    # 左半全部通过时，失败一定来自右半（或两半之间的相互影响，此时继续二分到单个也能得到正确结果）
+    _verify_batch(right, results, known_fail=left_passed)
+
+
+def verify_replacements_batch(replacements: Dict[str, str]) -> Dict[str, dict]:
+    """批量验证多个函数的替换代码（Rubric + 可选的合并编译），不落盘。
+
+    Args:
+        replacements: {函数名: 替换代码}
+
+    Returns:
+        {函数名: verify_replacement 格式的结果}
+    """
+    results: Dict[str, dict] = {}
+    pending = []
+    for func_name, replace_code in replacements.items():
+        original_code = get_function_source(globs.db_path, func_name) if getattr(globs, "db_path", None) else None
+        check_result = check_replacement_rubric(func_name, replace_code, original_code=original_code)
+        if not check_result["pass"]:
+            results[func_name] = {"pass": False, "reason": check_result["reason"], "build_stderr": None, "function_name": func_name}
+            continue
+        func_info = get_function_info(globs.db_path, func_name) if getattr(globs, "db_path", None) else None
+        if func_info and getattr(globs, "enable_compile_verify", False):
+            pending.append((func_name, func_info, replace_code))
+        else:
+            # 与单个验证一致：不做编译验证或找不到函数信息时只看 Rubric
+            results[func_name] = {"pass": True, "function_name": func_name}
+
+    errors: Dict[str, Optional[dict]] = {}
+    _verify_batch(pending, errors)
+    for func_name, _, _ in pending:
+        err = errors.get(func_name)
+        if err is None:
+            results[func_name] = {"pass": True, "function_name": func_name}
+        else:
+            results[func_name] = {
+                "pass": False,
+                "reason": err.get("reason", "Compile verification failed."),
+                "build_stderr": err.get("build_stderr"),
+                "function_name": func_name,
+            }
+    return results
+
+
+class _VerifyBatcher:
+    """合并并发的单个编译验证（多个分类任务同时调用 VerifyReplacement 时）：
+    先到的调用等待 LCMHAL_VERIFY_BATCH_WINDOW_MS 收集其他请求，然后一起做一次批量验证。
+    同时进行的批次数不超过构建工作区数量（未启用工作区时为 1）。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = []
+        self._leaders = 0
+
+    @staticmethod
+    def window_s() -> float:
+        return max(env_float("LCMHAL_VERIFY_BATCH_WINDOW_MS", 0.0), 0.0) / 1000.0
+
+    def submit(self, func_name: str, replace_code: str) -> Optional[dict]:
+        from tools.builder.workspace import workspace_count
+
+        fut = Future()
+        with self._cond:
+            self._pending.append((fut, func_name, replace_code))
+            while not fut.done() and self._leaders >= max(workspace_count(), 1):
+                self._cond.wait()
+            if fut.done():
+                return fut.result()
+            self._leaders += 1
+        try:
+            time.sleep(self.window_s())
+            with self._cond:
+                batch, self._pending = self._pending, []
+            self._run(batch)
+        finally:
+            with self._cond:
+                self._leaders -= 1
+                self._cond.notify_all()
+        return fut.result()
+
+    @staticmethod
+    def _run(batch: list) -> None:
+        # 同一函数在一个批次里只能出现一次（第二次替换时原函数代码已经不在文件里），重复的放到下一轮
+        while batch:
+            round_items, rest, seen = [], [], set()
+            for entry in batch:
+                (rest if entry[1] in seen else round_items).append(entry)
+                seen.add(entry[1])
+            batch = rest
+            try:
+                items, errors = [], {}
+                for i, (fut, func_name, replace_code) in enumerate(round_items):
+                    func_info = get_function_info(globs.db_path, func_name)
+                    if func_info:
+                        items.append((str(i), func_info, replace_code))
+                    else:
+                        errors[str(i)] = None
+                _verify_batch(items, errors)
+                for i, (fut, _, _) in enumerate(round_items):
+                    fut.set_result(errors.get(str(i)))
+            except Exception as e:
+                for fut, _, _ in round_items:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+
+_verify_batcher = _VerifyBatcher()
+
+
 def verify_replacement(func_name: str, replace_code: str) -> dict:
     """仅验证替换代码（Rubric + 可选编译），不落盘。供 FunctionClassifier 等在图内调用。
 
@@ -325,7 +749,10 @@ def verify_replacement(func_name: str, replace_code: str) -> dict:
         return {"pass": False, "reason": check_result["reason"], "build_stderr": None, "function_name": func_name}
 
     if getattr(globs, "enable_compile_verify", False):
-        err = _compile_verify_single_replacement(func_name, replace_code)
+        if _VerifyBatcher.window_s() > 0 and globs.db_path:
+            err = _verify_batcher.submit(func_name, replace_code)
+        else:
+            err = _compile_verify_single_replacement(func_name, replace_code)
         if err is not None:
             return {
                 "pass": False,
@@ -462,10 +889,12 @@ def build_with_raw() -> dict:
         dict: 构建结果，包含std_err、std_out和exit_code
     """
     with _build_lock:
-        # 清理项目
-        clear_proj(globs.script_path)
-        # 编译项目
-        build_info = build_proj(globs.script_path)
+        cache_key = build_cache_key("raw", globs.script_path, ())
+        build_info = lookup_build(globs.script_path, cache_key, restore_artifacts=True)
+        cache_hit = build_info is not None
+        if not cache_hit:
+            # 编译项目（默认增量，工具链配置变化或增量失败时才清理后全量编译）
+            build_info = rebuild_proj(globs.script_path, capture_commands=True)
         
         # 构建完成后处理输出文件
         try:
@@ -505,6 +934,8 @@ def build_with_raw() -> dict:
             print(f"Error processing output files after build: {e}")
             import traceback
             traceback.print_exc()
+        if not cache_hit:
+            store_build(globs.script_path, cache_key, build_info, save_artifacts=True)
         
         # 结果输出
         # 编译完成后dump全量信息
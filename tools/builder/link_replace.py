@@ -0,0 +1,308 @@
+# 链接级替换：不修改原始源码，把替换函数编译进单独生成的编译单元，链接时让它们覆盖原函数
+#
+# 按原文件分组：每个被替换函数所在的 .c 文件生成一个替换单元（原文件的预处理指令与类型定义 + weak_funcdef + 替换函数），
+# 用该文件记录的编译命令（compile_db）编译成 <testcase>/emulate/link_replace/<hash>.o，内容不变时直接复用。
+# 编译期间 PATH 前面放一组编译器包装脚本：识别到链接命令时，把定义了被替换符号的 .o/.a 复制一份并
+# objcopy --weaken-symbols 弱化这些符号，再把替换单元的目标文件加到链接命令中，强符号覆盖弱化后的原函数。
+# 构建目录里的目标文件不会被修改，之后的源码替换模式编译不受影响。
+#
+# 以下情况退回源码替换（utils.src_ops / patch_planner）：
+#   - static/inline 函数（链接时无法覆盖）、头文件中的函数
+#   - 原文件没有记录的编译命令，或替换单元编译失败（例如替换代码引用了原文件中的 static 变量/函数；
+#     替换单元会带上原文件的预处理指令和顶层 typedef/struct/union/enum 定义，文件内的类型可以直接使用）
+#   - build.sh 没有通过 PATH 调用编译器链接（例如 CMake 使用绝对路径），此时记下该 testcase 不支持，之后直接用源码替换
+# 同一编译单元内对原函数的调用若已被编译器内联，弱化符号后仍会执行原实现。
+#
+# 环境变量：
+#   LCMHAL_REPLACE_MODE=link    启用链接级替换（默认 source：直接改写原始源码）
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tools.builder.compile_db import CAPTURE_COMPILERS, compile_object
+from tools.builder.proj_builder import toolchain_fingerprint
+from tools.replacer.code_replacer import get_func_content
+from utils.env import env_choice
+from utils.src_ops import decode_replacement_code, file_convert_proj2src, weak_funcdef
+
+LINK_DIR = "link_replace"
+UNSUPPORTED_FILE = "unsupported.json"
+
+# 原函数的声明说明符中出现这些关键字时无法在链接时覆盖（CMSIS 的 __STATIC_INLINE 等宏同样处理）
+_NOT_LINKABLE_RE = re.compile(
+    r"\b(static|inline|__inline|__inline__|__forceinline|__STATIC_INLINE|__STATIC_FORCEINLINE|__INLINE)\b")
+# 注释与字符串/字符字面量（扫描顶层声明时屏蔽其中的括号和分号）
+_COMMENT_OR_LITERAL_RE = re.compile(r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'", re.S)
+# 可以复制到替换单元中的文件顶层声明：typedef 与不带声明符的 struct/union/enum 定义
+_TYPE_DECL_RE = re.compile(r"\s*(typedef\b.*|(struct|union|enum)\b[^{;=()]*\{.*\}\s*;)\s*", re.S)
+
+_LINK_WRAPPER = """#!{python}
+import json, os, shlex, shutil, subprocess, sys
+conf = json.load(open({conf!r}, encoding="utf-8"))
+real = conf["real"]
+args = sys.argv[1:]
+
+
+def expand(args):
+    out = []
+    for a in args:
+        if a.startswith("@") and os.path.isfile(a[1:]):
+            with open(a[1:], encoding="utf-8", errors="replace") as f:
+                out.extend(shlex.split(f.read()))
+        else:
+            out.append(a)
+    return out
+
+
+def defines(path):
+    r = subprocess.run([conf["nm"], "-g", "--defined-only", path], capture_output=True, text=True)
+    names = set(line.split()[-1] for line in r.stdout.splitlines() if len(line.split()) >= 3)
+    return bool(names & set(conf["symbols"]))
+
+
+def is_input(a):
+    return not a.startswith("-") and a.endswith((".o", ".obj", ".a")) and os.path.isfile(a)
+
+
+if not any(a in ("-c", "-S", "-E", "-M", "-MM") for a in args):
+    expanded = expand(args)
+    inputs = [i for i, a in enumerate(expanded) if is_input(a)]
+    if inputs:
+        weakened = []
+        for i in inputs:
+            if defines(expanded[i]):
+                copy = os.path.join(conf["work"], "%d_%d_%s" % (os.getpid(), i, os.path.basename(expanded[i])))
+                shutil.copyfile(expanded[i], copy)
+                subprocess.run([conf["objcopy"], "--weaken-symbols=" + conf["symbols_file"], copy], check=True)
+                weakened.append(expanded[i])
+                expanded[i] = copy
+        # 替换单元放在第一个输入之前，其未定义符号仍可从后面的库中解析
+        expanded[inputs[0]:inputs[0]] = conf["objects"]
+        rsp = os.path.join(conf["work"], "link_%d.rsp" % os.getpid())
+        with open(rsp, "w", encoding="utf-8") as f:
+            f.write(" ".join(shlex.quote(a) for a in expanded))
+        args = ["@" + rsp]
+        with open(conf["log"], "a", encoding="utf-8") as f:
+            f.write(json.dumps({{"cwd": os.getcwd(), "weakened": weakened}}) + "\\n")
+os.execv(real, [real] + args)
+"""
+
+
+def replace_mode() -> str:
+    return env_choice("LCMHAL_REPLACE_MODE", ("source", "link"), "source")
+
+
+def _link_dir(conf_path: str) -> str:
+    return os.path.join(conf_path, "emulate", LINK_DIR)
+
+
+def link_supported(conf_path: str) -> bool:
+    """之前的链接级编译没有拦截到链接命令时记为不支持（工具链配置变化后重新尝试）"""
+    try:
+        with open(os.path.join(_link_dir(conf_path), UNSUPPORTED_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint") != toolchain_fingerprint(conf_path)
+    except (OSError, ValueError, AttributeError):
+        return True
+
+
+def mark_link_unsupported(conf_path: str) -> None:
+    try:
+        os.makedirs(_link_dir(conf_path), exist_ok=True)
+        with open(os.path.join(_link_dir(conf_path), UNSUPPORTED_FILE), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": toolchain_fingerprint(conf_path)}, f)
+    except OSError:
+        pass
+
+
+class LinkPlan:
+    """objects: 替换单元的目标文件；symbols: 被覆盖的函数名；units: {替换单元标识: 内容}（用于编译缓存 key）；
+    fallback: 需要退回源码替换的 [(key, func_info, replace_code)]；reasons: {函数名: 退回源码替换的原因}"""
+
+    def __init__(self):
+        self.objects: List[str] = []
+        self.symbols: List[str] = []
+        self.units: Dict[str, str] = {}
+        self.fallback: List[tuple] = []
+        self.reasons: Dict[str, str] = {}
+
+    def fall_back(self, items: List[tuple], reason: str) -> None:
+        self.fallback.extend(items)
+        for func_name, _, _ in items:
+            self.reasons[func_name] = reason
+
+
+def _mask(match) -> str:
+    """注释整体、字面量的内容替换为空格（保留换行，行号不变）"""
+    text = match.group(0)
+    if text.startswith("/"):
+        return re.sub(r"[^\n]", " ", text)
+    return text[0] + re.sub(r"[^\n]", " ", text[1:-1]) + text[-1]
+
+
+def _preamble(original: str) -> str:
+    """替换单元需要的原文件内容，按原顺序保留：
+      - 预处理指令（#include/#define/#if 等，保留续行），条件编译的嵌套保持平衡；
+      - 文件顶层的 typedef 与 struct/union/enum 定义（替换代码常用到文件内定义的类型）。
+    函数、变量定义不保留；跨越条件编译的声明也不保留（只保留指令本身）"""
+    # 去掉注释后的文本用于输出，再屏蔽字面量内容的文本用于扫描括号和分号，两者逐字符对齐
+    stripped = _COMMENT_OR_LITERAL_RE.sub(lambda m: _mask(m) if m.group(0).startswith("/") else m.group(0), original)
+    masked = _COMMENT_OR_LITERAL_RE.sub(_mask, stripped)
+    out = []
+    text, scan = "", ""  # 当前顶层语句（不含预处理指令）
+    has_directive = False
+    depth = 0
+    continued = False
+    for line, line_scan in zip(stripped.splitlines(), masked.splitlines()):
+        if continued or line_scan.lstrip().startswith("#"):
+            out.append(line.rstrip())
+            continued = line.rstrip().endswith("\\")
+            has_directive = has_directive or bool(scan.strip())
+            continue
+        for ch, ch_scan in zip(line + "\n", line_scan + "\n"):
+            text += ch
+            scan += ch_scan
+            if ch_scan == "{":
+                depth += 1
+            elif ch_scan == "}":
+                depth = max(depth - 1, 0)
+            if depth or ch_scan not in ";}":
+                continue
+            # 顶层语句在 ';' 处结束；函数定义（第一个 '{' 之前有参数列表）在对应的 '}' 处结束
+            head = scan.split("{", 1)[0]
+            if ch_scan == "}" and ("(" not in head or "=" in head):
+                continue
+            if ch_scan == ";" and not has_directive and _TYPE_DECL_RE.fullmatch(scan):
+                out.append(text.strip())
+            text, scan, has_directive = "", "", False
+    return "\n".join(out)
+
+
+def _linkable(func_name: str, func_info) -> Tuple[bool, str]:
+    """返回 (能否在链接时覆盖, 不能时的原因)"""
+    if func_info.file_path.endswith((".h", ".hpp", ".hh", ".inc")):
+        return False, "defined in a header"
+    old_code = get_func_content(func_info)
+    if not old_code:
+        return False, "original definition not found"
+    # 只检查函数名之前的声明说明符（去掉注释），函数体和参数中的 static/inline 不影响
+    code = _COMMENT_OR_LITERAL_RE.sub(_mask, old_code)
+    head = code.split(func_name + "(", 1)[0] if func_name + "(" in code else code.split("(", 1)[0]
+    match = _NOT_LINKABLE_RE.search(head)
+    if match:
+        return False, f"declared {match.group(1)}"
+    return True, ""
+
+
+def plan_link_replacements(conf_path: str, items: List[tuple],
+                           read_original: Callable[[str], Optional[str]]) -> LinkPlan:
+    """items: [(func_name, func_info, replace_code)]；编译各文件的替换单元，返回 LinkPlan"""
+    plan = LinkPlan()
+    by_file: Dict[str, List[tuple]] = {}
+    for item in items:
+        func_name, func_info, _ = item
+        linkable, reason = _linkable(func_name, func_info)
+        if linkable:
+            by_file.setdefault(func_info.file_path, []).append(item)
+        else:
+            plan.fall_back([item], reason)
+
+    out_dir = _link_dir(conf_path)
+    os.makedirs(out_dir, exist_ok=True)
+    used = set()
+    for path, file_items in by_file.items():
+        original = read_original(path)
+        if original is None:
+            plan.fall_back(file_items, "original source not readable")
+            continue
+        try:
+            bodies = [decode_replacement_code(code) for _, _, code in file_items]
+        except Exception as e:
+            plan.fall_back(file_items, f"replacement code not decodable: {e}")
+            continue
+        unit = "\n".join([_preamble(original), weak_funcdef] + bodies) + "\n"
+        source = file_convert_proj2src(path)
+        obj_path = os.path.join(out_dir, hashlib.sha1((source + "\0" + unit).encode("utf-8")).hexdigest() + ".o")
+        if not os.path.exists(obj_path):
+            res = compile_object(conf_path, source, unit, obj_path + ".tmp")
+            if res is None or not res[0]:
+                reason = "no compile command" if res is None else (res[1].strip().splitlines() or ["compile failed"])[0]
+                print(f"[INFO] link-level replacement unavailable for {path} ({reason}), using source replacement")
+                plan.fall_back(file_items, f"replacement unit failed to compile: {reason}")
+                continue
+            os.replace(obj_path + ".tmp", obj_path)
+        used.add(os.path.basename(obj_path))
+        plan.objects.append(obj_path)
+        plan.symbols.extend(name for name, _, _ in file_items)
+        plan.units[f"link:{path}"] = unit
+
+    # 只保留本次用到的替换单元
+    for name in os.listdir(out_dir):
+        if name.endswith((".o", ".tmp")) and name not in used:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+    return plan
+
+
+def _binutil(real: str, tool: str) -> Optional[str]:
+    """与编译器同一前缀/目录的 binutils（arm-none-eabi-gcc -> arm-none-eabi-objcopy）"""
+    prefix = re.sub(r"(gcc|g\+\+|cc|c\+\+|clang|clang\+\+)(-[\d.]+)?$", "", os.path.basename(real))
+    candidate = os.path.join(os.path.dirname(real), prefix + tool)
+    if os.path.isfile(candidate):
+        return candidate
+    return shutil.which(prefix + tool) or shutil.which(tool) or shutil.which("llvm-" + tool)
+
+
+def start_link(plan: LinkPlan, base_env: Optional[dict] = None) -> Optional[Tuple[dict, str]]:
+    """生成链接包装脚本，返回 (传给 build.sh 的环境变量, 临时目录)；找不到编译器或 objcopy/nm 时返回 None"""
+    base_env = base_env if base_env is not None else dict(os.environ)
+    search_path = base_env.get("PATH", "")
+    tmp_dir = tempfile.mkdtemp(prefix="lcmhal-link-")
+    bin_dir = os.path.join(tmp_dir, "bin")
+    os.makedirs(bin_dir)
+    symbols_file = os.path.join(tmp_dir, "symbols.txt")
+    with open(symbols_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(plan.symbols) + "\n")
+    wrapped = 0
+    for name in CAPTURE_COMPILERS:
+        real = shutil.which(name, path=search_path)
+        if not real:
+            continue
+        objcopy, nm = _binutil(real, "objcopy"), _binutil(real, "nm")
+        if not objcopy or not nm:
+            continue
+        conf = os.path.join(tmp_dir, name + ".json")
+        with open(conf, "w", encoding="utf-8") as f:
+            json.dump({
+                "real": os.path.abspath(real), "objcopy": objcopy, "nm": nm,
+                "symbols": plan.symbols, "symbols_file": symbols_file, "objects": plan.objects,
+                "work": tmp_dir, "log": os.path.join(tmp_dir, "links.jsonl"),
+            }, f)
+        path = os.path.join(bin_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_LINK_WRAPPER.format(python=sys.executable, conf=conf))
+        os.chmod(path, 0o755)
+        wrapped += 1
+    if not wrapped:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    env = dict(base_env, PATH=bin_dir + os.pathsep + search_path)
+    return env, tmp_dir
+
+
+def finish_link(tmp_dir: str) -> bool:
+    """返回本次编译是否拦截到了链接命令（没有时替换单元没有进入 ELF）"""
+    try:
+        with open(os.path.join(tmp_dir, "links.jsonl"), "r", encoding="utf-8") as f:
+            return any(line.strip() for line in f)
+    except OSError:
+        return False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,7 +1,31 @@
 import os
 import subprocess
 import shutil  # 添加shutil模块用于删除目录
+import hashlib
+import json
+import re
+import time
+from typing import Iterable, Optional, Set
 from models.build_results.build_output import BuildOutput
+from utils.env import env_choice
+
+# 增量编译：保留目标文件，只在工具链配置（testcase 目录下的脚本/配置文件）变化时运行 clear.sh；
+# 增量编译失败且像是陈旧的构建状态导致时（缺少目标文件/依赖、没有规则生成目标等）自动 clear.sh + 全量重编一次；
+# 被替换的文件本身有编译错误时不重编，全量编译只会得到同样的错误。
+# LCMHAL_BUILD_MODE=pristine 恢复每次都 clear.sh + 全量编译。
+# build.sh 通过环境变量 LCMHAL_BUILD_INCREMENTAL=1/0 得知本次是否为增量编译（例如 west build 据此选择 -p auto）。
+BUILD_STAMP_FILE = ".lcmhal_build_stamp.json"
+_TOOLCHAIN_CONFIG_SUFFIXES = (".sh", ".yml", ".yaml", ".conf", ".overlay", ".cmake")
+
+# 构建系统状态问题（陈旧/缺失的目标文件或依赖），全量编译可以修复
+_STALE_STATE_RE = re.compile(
+    r"No rule to make target|missing and no known rule to make it|"
+    r"\.(?:o|obj|d|a)\b[^\n]*No such file or directory|"
+    r"file truncated|file format not recognized|dependency cycle|"
+    r"is newer than|has modification time .* in the future|manifest '[^']*' still dirty"
+)
+# 编译器诊断 file:line[:col]: [fatal ]error:
+_COMPILER_ERROR_RE = re.compile(r"^(?P<file>[^\s:][^:\n]*):\d+(?::\d+)?: (?:fatal )?error:", re.M)
 
 # TODO: 项目编译（暂定运行指令人工指定）
 
@@ -13,11 +37,129 @@ def build_result_to_info(build_result: subprocess.CompletedProcess) -> BuildOutp
         exit_code=build_result.returncode,
     )
 
+def build_mode() -> str:
+    mode = env_choice("LCMHAL_BUILD_MODE", ("incremental", "pristine", "full", "clean"), "incremental")
+    return "incremental" if mode == "incremental" else "pristine"
+
+
+def toolchain_fingerprint(conf_path: str) -> str:
+    """testcase 目录下脚本与配置文件的内容摘要，变化时需要 clear.sh 后全量编译"""
+    h = hashlib.sha1()
+    try:
+        names = sorted(os.listdir(conf_path))
+    except OSError:
+        return ""
+    for name in names:
+        path = os.path.join(conf_path, name)
+        if name.endswith(_TOOLCHAIN_CONFIG_SUFFIXES) and os.path.isfile(path):
+            with open(path, "rb") as f:
+                h.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+    return h.hexdigest()
+
+
+def _stamp_path(conf_path: str) -> str:
+    return os.path.join(conf_path, "emulate", BUILD_STAMP_FILE)
+
+
+def _read_build_stamp(conf_path: str) -> dict:
+    try:
+        with open(_stamp_path(conf_path), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        return stamp if isinstance(stamp, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_build_stamp(conf_path: str, fingerprint: str, build_output: BuildOutput, pristine: bool,
+                       captured: bool = False) -> None:
+    try:
+        os.makedirs(os.path.dirname(_stamp_path(conf_path)), exist_ok=True)
+        with open(_stamp_path(conf_path), "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "exit_code": build_output.exit_code,
+                "pristine": pristine,
+                "captured": captured,
+                "time": time.time(),
+            }, f, ensure_ascii=False, indent=2)
+    except OSError:
+        pass
+
+
+def last_build_pristine(conf_path: str) -> bool:
+    """最近一次 rebuild_proj 是否为 clear.sh 后的全量编译"""
+    return bool(_read_build_stamp(conf_path).get("pristine"))
+
+
+def compile_error_files(build_output: BuildOutput) -> Set[str]:
+    """编译器报错（file:line[:col]: error:）所在文件的文件名"""
+    output = f"{build_output.std_out or ''}\n{build_output.std_err or ''}"
+    return {os.path.basename(m.group("file").strip()) for m in _COMPILER_ERROR_RE.finditer(output)}
+
+
+def _needs_pristine_retry(build_output: BuildOutput, patched_files: Optional[Iterable[str]] = None) -> bool:
+    """增量编译失败后是否值得 clear.sh + 全量重编：构建状态问题时重编；
+    被替换的文件（未给出时为任意文件）有编译器报错时不重编；其余（如链接错误）仍重编一次排除陈旧目标文件"""
+    output = f"{build_output.std_out or ''}\n{build_output.std_err or ''}"
+    if _STALE_STATE_RE.search(output):
+        return True
+    error_files = compile_error_files(build_output)
+    if not error_files:
+        return True
+    if patched_files is None:
+        return False
+    return not error_files & {os.path.basename(path) for path in patched_files}
+
+
+def rebuild_proj(conf_path: str, capture_commands: bool = False, env: dict = None,
+                 patched_files: Optional[Iterable[str]] = None) -> BuildOutput:
+    """clear + build 的替代：默认增量编译（必要时 clear.sh），失败且像是构建状态问题时退回一次全量编译。
+    capture_commands 时记录每个文件的编译命令（见 compile_db，用于单 TU 验证）：全量编译重写 compile_commands.json，
+    增量编译合并进已有的；还没有 compile_commands.json 且之前没有记录过时做一次全量编译；
+    env 为传给 build.sh 的环境变量（默认当前进程的环境变量）；
+    patched_files 为本次被替换的文件，这些文件中的编译错误不会触发全量重编"""
+    from tools.builder.compile_db import compile_db_missing
+    fingerprint = toolchain_fingerprint(conf_path)
+    stamp = _read_build_stamp(conf_path)
+    pristine = build_mode() == "pristine" or not stamp or stamp.get("fingerprint") != fingerprint
+    captured = bool(stamp.get("captured"))
+    if not pristine and capture_commands and not captured and compile_db_missing(conf_path):
+        # 已有的目标文件是在不记录编译命令时编译的：全量编译一次以记录完整的 compile_commands.json
+        print(f"[INFO] no compile commands recorded for {conf_path}, running a pristine build to capture them")
+        pristine = True
+    if pristine:
+        clear_proj(conf_path)
+        build_output = _build(conf_path, capture_commands, env, incremental=False)
+        captured = capture_commands
+    else:
+        build_output = _build(conf_path, capture_commands, env, incremental=True)
+    if build_output.exit_code != 0 and not pristine and _needs_pristine_retry(build_output, patched_files):
+        print(f"[INFO] incremental build failed in {conf_path}, retrying with a pristine build")
+        pristine = True
+        clear_proj(conf_path)
+        build_output = _build(conf_path, capture_commands, env, incremental=False)
+        captured = capture_commands
+    _write_build_stamp(conf_path, fingerprint, build_output, pristine, captured)
+    return build_output
+
+
+def _build(conf_path: str, capture_commands: bool, env: dict = None, incremental: bool = False) -> BuildOutput:
+    from tools.builder.compile_db import start_capture, finish_capture
+    capture = start_capture(conf_path, env) if capture_commands else None
+    if capture is None:
+        return build_proj(conf_path, incremental=incremental, env=env)
+    env, tmp_dir = capture
+    build_output = build_proj(conf_path, incremental=incremental, env=env)
+    finish_capture(conf_path, tmp_dir, build_output.exit_code == 0, merge=incremental)
+    return build_output
+
+
 # @mcp
-def build_proj(conf_path: str):
+def build_proj(conf_path: str, incremental: bool = False, env: dict = None):
     """build project, return build result"""
     # 执行conf_path下的build.sh脚本
-    build_result = subprocess.run(["bash", "build.sh"], cwd=conf_path, capture_output=True, text=True)
+    env = dict(env or os.environ, LCMHAL_BUILD_INCREMENTAL="1" if incremental else "0")
+    build_result = subprocess.run(["bash", "build.sh"], cwd=conf_path, capture_output=True, text=True, env=env)
     # 全量保存 build 的 stdout/stderr 到 testcase 的 emulate/debug_output，便于排查
     try:
         debug_dir = os.path.join(conf_path, "emulate", "debug_output")
@@ -36,6 +178,11 @@ def clear_proj(conf_path: str):
     """clear project, return clear result"""
     # 执行conf_path下的clear.sh脚本
     clear_result = subprocess.run(["bash", "clear.sh"], cwd=conf_path, capture_output=True, text=True)
+    # 目标文件已清除，下一次编译需要按全量处理
+    try:
+        os.remove(_stamp_path(conf_path))
+    except OSError:
+        pass
     # 注释掉print语句，避免干扰JSON-RPC通信
     # print(clear_result.stdout)
     # print(clear_result.stderr)
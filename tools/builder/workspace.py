@@ -0,0 +1,342 @@
+# 编译验证用的隔离构建工作区（每个 testcase 一个进程池，可复用）
+#
+# 原来的 _compile_verify_single_replacement 直接改写真实源码树再从 src.zip 恢复，只能在 _build_lock 下串行；
+# 这里为每个验证分配一份项目副本（ws-N/tree）和一份改写过路径的 build.sh/clear.sh（ws-N/script），
+# 替换、编译、恢复都只发生在副本里，N 个验证可以同时编译，规范源码树不受影响。
+#
+# 副本的创建方式（LCMHAL_BUILD_WORKSPACE_CLONE）：
+#   auto（默认）  先尝试 cp -a --reflink=always（btrfs/xfs 等支持写时复制的文件系统），失败则 hardlink
+#   reflink       只用 reflink
+#   hardlink      源码类文件（.c/.h/.s/.ld 等）硬链接，其余文件复制；写源码时先断开硬链接（见 utils.src_ops.write_src_file）
+#   copy          cp -a 完整复制
+# overlayfs 需要 mount 权限，这里不使用。
+#
+# 环境变量：
+#   LCMHAL_BUILD_WORKSPACES         工作区数量（默认 0：不启用，仍在真实源码树上串行验证）
+#   LCMHAL_BUILD_WORKSPACE_SOURCE   要克隆的目录（默认 src_path 与 proj_path 的公共父目录）；
+#                                   build.sh 依赖上层目录时（例如 RT-Thread bsp 引用内核源码）需设为更上层的目录
+#   LCMHAL_BUILD_WORKSPACE_DIR      工作区存放目录（默认与克隆目录同级的 .lcmhal_workspaces/<名字>，同一文件系统才能 reflink/hardlink）
+#
+# build.sh/clear.sh 里对克隆目录的绝对路径引用（如 PWDDIR=...）会被替换为副本路径；
+# 脚本中找不到该路径（无法保证在副本中编译）时不启用工作区，退回串行验证。
+# 工作区的就绪指纹包含脚本、工具链配置（proj_builder.toolchain_fingerprint）与数据库 src.zip，
+# 任一变化后旧副本不再视为就绪，下次取用时重新克隆。
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config.globs as globs
+from utils.env import env_choice, env_int
+
+READY_FILE = ".lcmhal_ready.json"
+LOCK_FILE = ".lcmhal_lock"
+DIRTY_FILE = ".lcmhal_dirty.json"
+CLONE_MODES = ("auto", "reflink", "hardlink", "copy")
+# hardlink 模式下共享 inode 的文件：只会被整体重写（src_replace/recover 已改为写新文件后替换），不会被编译器原地截断
+HARDLINK_SUFFIXES = {
+    ".c", ".h", ".s", ".S", ".cpp", ".cc", ".cxx", ".hpp", ".hh", ".inc",
+    ".ld", ".lds", ".icf", ".sct",
+}
+
+
+def workspace_count() -> int:
+    return max(env_int("LCMHAL_BUILD_WORKSPACES", 0), 0)
+
+
+def workspaces_enabled() -> bool:
+    return workspace_count() > 0 and bool(getattr(globs, "script_path", None)) and bool(getattr(globs, "src_path", None))
+
+
+def _clone_mode() -> str:
+    return env_choice("LCMHAL_BUILD_WORKSPACE_CLONE", CLONE_MODES, "auto")
+
+
+def _clone_source() -> str:
+    override = os.environ.get("LCMHAL_BUILD_WORKSPACE_SOURCE", "").strip()
+    if override:
+        return os.path.normpath(override)
+    paths = [os.path.normpath(p) for p in (globs.src_path, globs.proj_path) if p]
+    return os.path.commonpath(paths) if len(paths) > 1 else paths[0]
+
+
+def _pool_dir(source: str) -> str:
+    override = os.environ.get("LCMHAL_BUILD_WORKSPACE_DIR", "").strip()
+    key = hashlib.sha1(f"{source}\0{globs.script_path}".encode("utf-8")).hexdigest()[:10]
+    name = f"{os.path.basename(source.rstrip('/')) or 'root'}-{key}"
+    if override:
+        return os.path.join(override, name)
+    return os.path.join(os.path.dirname(source.rstrip("/")), ".lcmhal_workspaces", name)
+
+
+def _script_files(script_path: str) -> List[str]:
+    """testcase 目录下需要随工作区复制的顶层文件（build.sh/clear.sh/配置等）"""
+    try:
+        names = sorted(os.listdir(script_path))
+    except OSError:
+        return []
+    return [n for n in names if os.path.isfile(os.path.join(script_path, n))]
+
+
+def _script_fingerprint(script_path: str, source: str) -> str:
+    """工作区的就绪指纹：克隆目录、脚本、工具链配置与数据库 src.zip 任一变化都要重新克隆"""
+    from tools.builder.build_cache import _db_fingerprint
+    from tools.builder.proj_builder import toolchain_fingerprint
+    h = hashlib.sha1(source.encode("utf-8"))
+    for part in (toolchain_fingerprint(script_path), _db_fingerprint()):
+        h.update(part.encode("utf-8") + b"\0")
+    for name in _script_files(script_path):
+        if name.endswith(".sh"):
+            with open(os.path.join(script_path, name), "rb") as f:
+                h.update(name.encode("utf-8") + b"\0" + f.read())
+    return h.hexdigest()
+
+
+def _hardlink_tree(src: str, dst: str) -> None:
+    for root, dirs, files in os.walk(src):
+        rel = os.path.relpath(root, src)
+        target_root = dst if rel == "." else os.path.join(dst, rel)
+        os.makedirs(target_root, exist_ok=True)
+        for d in dirs:
+            s = os.path.join(root, d)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), os.path.join(target_root, d))
+        # 软链接目录不会被 os.walk 展开，上面已经原样复制
+        dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(root, d))]
+        for name in files:
+            s = os.path.join(root, name)
+            t = os.path.join(target_root, name)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), t)
+            elif os.path.splitext(name)[1] in HARDLINK_SUFFIXES:
+                os.link(s, t)
+            else:
+                shutil.copy2(s, t)
+        shutil.copystat(root, target_root)
+
+
+def _clone_tree(src: str, dst: str) -> str:
+    """克隆 src 到 dst（dst 不存在），返回实际使用的方式"""
+    mode = _clone_mode()
+    if mode in ("auto", "reflink"):
+        r = subprocess.run(["cp", "-a", "--reflink=always", src, dst], capture_output=True, text=True)
+        if r.returncode == 0:
+            return "reflink"
+        shutil.rmtree(dst, ignore_errors=True)
+        if mode == "reflink":
+            raise RuntimeError(f"reflink clone failed: {r.stderr.strip()}")
+    if mode in ("auto", "hardlink"):
+        try:
+            _hardlink_tree(src, dst)
+            return "hardlink"
+        except OSError as e:
+            shutil.rmtree(dst, ignore_errors=True)
+            if mode == "hardlink":
+                raise RuntimeError(f"hardlink clone failed: {e}")
+    r = subprocess.run(["cp", "-a", src, dst], capture_output=True, text=True)
+    if r.returncode != 0:
+        shutil.rmtree(dst, ignore_errors=True)
+        raise RuntimeError(f"copy clone failed: {r.stderr.strip()}")
+    return "copy"
+
+
+class BuildWorkspace:
+    """一个隔离的构建工作区：tree 为项目副本，script 为指向副本的 testcase 脚本目录"""
+
+    def __init__(self, root: str, source: str):
+        self.root = root
+        self.source = source
+        self.tree = os.path.join(root, "tree")
+        self.script_path = os.path.join(root, "script")
+        self.index = -1
+        self._lock_fp = None
+
+    # ---- 路径映射 ----
+    def map_path(self, path: str) -> Optional[str]:
+        """规范源码树中的路径 -> 工作区中的路径；不在克隆范围内时返回 None"""
+        path = os.path.normpath(path)
+        if path == self.source:
+            return self.tree
+        prefix = self.source.rstrip("/") + "/"
+        if not path.startswith(prefix):
+            return None
+        return os.path.join(self.tree, path[len(prefix):])
+
+    # ---- 进程间互斥（多个 MCP/agent 进程共用同一批工作区）----
+    def try_lock(self) -> bool:
+        os.makedirs(self.root, exist_ok=True)
+        fp = open(os.path.join(self.root, LOCK_FILE), "w")
+        try:
+            fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fp.close()
+            return False
+        self._lock_fp = fp
+        return True
+
+    def unlock(self) -> None:
+        if self._lock_fp is not None:
+            fcntl.flock(self._lock_fp, fcntl.LOCK_UN)
+            self._lock_fp.close()
+            self._lock_fp = None
+
+    # ---- 修改记录：进程在验证中途退出时，下次取用该工作区先恢复被改过的文件 ----
+    def mark_dirty(self, files: List[tuple]) -> None:
+        """files: [(DB 中的文件路径, 工作区中的文件路径)]"""
+        with open(os.path.join(self.root, DIRTY_FILE), "w", encoding="utf-8") as f:
+            json.dump({"files": [list(item) for item in files]}, f, ensure_ascii=False)
+
+    def mark_clean(self) -> None:
+        Path(self.root, DIRTY_FILE).unlink(missing_ok=True)
+
+    def restore_dirty(self) -> None:
+        try:
+            with open(os.path.join(self.root, DIRTY_FILE), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return
+        from tools.replacer.code_recover import recover_code_file
+        if all(recover_code_file(code_path, src_file) for code_path, src_file in info.get("files", [])):
+            self.mark_clean()
+
+    # ---- 创建 / 校验 ----
+    def is_ready(self, fingerprint: str) -> bool:
+        try:
+            with open(os.path.join(self.root, READY_FILE), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return info.get("fingerprint") == fingerprint and os.path.isdir(self.tree)
+
+    def create(self, script_path: str, fingerprint: str) -> None:
+        """克隆源码树并生成改写后的脚本目录；调用方需保证此时规范源码树处于干净状态"""
+        Path(self.root, READY_FILE).unlink(missing_ok=True)
+        self.mark_clean()
+        for d in (self.tree, self.script_path):
+            if os.path.lexists(d):
+                shutil.rmtree(d)
+        start = time.monotonic()
+        method = _clone_tree(self.source, self.tree)
+        os.makedirs(os.path.join(self.script_path, "emulate"), exist_ok=True)
+        referenced = False
+        for name in _script_files(script_path):
+            src = os.path.join(script_path, name)
+            dst = os.path.join(self.script_path, name)
+            if not name.endswith(".sh"):
+                shutil.copy2(src, dst)
+                continue
+            with open(src, "r", encoding="utf-8", errors="surrogateescape") as f:
+                text = f.read()
+            if self.source in text:
+                referenced = referenced or name == "build.sh"
+                text = text.replace(self.source, self.tree)
+            with open(dst, "w", encoding="utf-8", errors="surrogateescape") as f:
+                f.write(text)
+            shutil.copymode(src, dst)
+        if not referenced:
+            raise RuntimeError(f"build.sh in {script_path} does not reference {self.source}; cannot redirect the build into a workspace")
+        with open(os.path.join(self.root, READY_FILE), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "source": self.source, "clone": method,
+                       "created_at": time.time()}, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] build workspace ready: {self.root} ({method}, {time.monotonic() - start:.1f}s)")
+
+
+class WorkspacePool:
+    """同一 testcase 的工作区池：最多 size 个，acquire 时优先复用空闲且已就绪的工作区"""
+
+    def __init__(self, script_path: str, source: str, size: int):
+        self.script_path = script_path
+        self.source = source
+        self.size = size
+        self.dir = _pool_dir(source)
+        self._cond = threading.Condition()
+        self._busy: set = set()
+        self._broken: Optional[str] = None
+
+    def _try_acquire(self, fingerprint: str) -> Optional[BuildWorkspace]:
+        # 先找已就绪的，再创建新的，避免每次都克隆
+        candidates = []
+        for i in range(self.size):
+            if i in self._busy:
+                continue
+            ws = BuildWorkspace(os.path.join(self.dir, f"ws-{i}"), self.source)
+            candidates.append((not ws.is_ready(fingerprint), i, ws))
+        for _, i, ws in sorted(candidates, key=lambda c: (c[0], c[1])):
+            if not ws.try_lock():
+                continue
+            self._busy.add(i)
+            ws.index = i
+            return ws
+        return None
+
+    @contextmanager
+    def acquire(self, create_lock, timeout: Optional[float] = None):
+        """取得一个工作区（必要时创建）；create_lock 在克隆期间持有，保证克隆到的是干净源码树"""
+        fingerprint = _script_fingerprint(self.script_path, self.source)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._broken:
+                    raise RuntimeError(self._broken)
+                ws = self._try_acquire(fingerprint)
+                if ws is not None:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("no build workspace available")
+                # 其他进程持有的工作区释放时不会通知本进程，定期重试
+                self._cond.wait(1.0)
+        try:
+            if not ws.is_ready(fingerprint):
+                try:
+                    with create_lock:
+                        ws.create(self.script_path, fingerprint)
+                except Exception as e:
+                    # 克隆/改写脚本失败通常与环境有关，之后不再重试
+                    with self._cond:
+                        self._broken = f"build workspace unavailable: {e}"
+                    raise
+            else:
+                ws.restore_dirty()
+            yield ws
+        finally:
+            ws.unlock()
+            with self._cond:
+                self._busy.discard(ws.index)
+                self._cond.notify()
+
+
+_pools: Dict[tuple, WorkspacePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_workspace_pool() -> Optional[WorkspacePool]:
+    """当前 testcase 的工作区池；未启用（LCMHAL_BUILD_WORKSPACES=0）时返回 None"""
+    if not workspaces_enabled():
+        return None
+    source = _clone_source()
+    key = (os.path.normpath(globs.script_path), source)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.size != workspace_count():
+            pool = WorkspacePool(globs.script_path, source, workspace_count())
+            _pools[key] = pool
+        return pool
+
+
+def remove_workspaces() -> None:
+    """删除当前 testcase 的全部工作区（例如源码树有更新之后）"""
+    if not getattr(globs, "script_path", None) or not getattr(globs, "src_path", None):
+        return
+    pool_dir = _pool_dir(_clone_source())
+    with _pools_lock:
+        _pools.clear()
+    if os.path.isdir(pool_dir):
+        shutil.rmtree(pool_dir)
@@ -12,11 +12,33 @@ class CodebaseInfoBase(ABC):
         if db_path:
             self.init_from_cache(db_path)
 
-    @abstractmethod
+    # SQLite 缓存中的类别名（common/driver/mmio）
+    cache_category = ""
+
     def init_from_cache(self, db_path: str) -> bool:
-        """从缓存初始化数据"""
+        """
+        从缓存初始化数据，默认使用 SQLite（按需加载单条记录）
+        SQLite 中没有有效数据时读取 JSON 缓存并迁移到 SQLite
+        """
+        from .sqlite_store import sqlite_cache_enabled
+        if not sqlite_cache_enabled():
+            return self._init_from_json(db_path)
+        if self._init_from_sqlite(db_path):
+            return True
+        if self._init_from_json(db_path):
+            self._save_to_sqlite()
+            return True
+        return False
+
+    @abstractmethod
+    def _init_from_json(self, db_path: str) -> bool:
+        """从 JSON 缓存初始化数据"""
         pass
 
+    def _record_decoders(self) -> Dict[str, Any]:
+        """各字典字段单条记录的反序列化函数 {attr: decoder}"""
+        return {}
+
     @abstractmethod
     def _validate_cache_data(self, data: Dict) -> bool:
         """验证缓存数据的完整性"""
@@ -32,20 +54,94 @@ class CodebaseInfoBase(ABC):
         """转换为字典格式用于JSON序列化"""
         pass
 
-    @abstractmethod
     def save_to_cache(self) -> bool:
-        """保存数据到缓存"""
+        """保存数据到缓存（SQLite 或 JSON，见 LCMHAL_CODEBASE_CACHE_FORMAT）"""
+        from .sqlite_store import sqlite_cache_enabled
+        if sqlite_cache_enabled():
+            return self._save_to_sqlite()
+        return self._save_to_json()
+
+    @abstractmethod
+    def _save_to_json(self) -> bool:
+        """保存数据到 JSON 缓存"""
         pass
 
+    def _init_from_sqlite(self, db_path: str) -> bool:
+        """缓存键有效时把各字典字段替换为按需加载的 LazyRecordDict"""
+        from utils.collector_cache import CACHE_KEYS_FIELD
+        from .sqlite_store import get_codebase_store, LazyRecordDict
+        try:
+            store = get_codebase_store(db_path)
+            recorded = store.get_cache_keys(self.cache_category)
+        except Exception:
+            return False
+        if recorded is None:
+            return False
+        self.db_path = db_path
+        if not self._cache_is_current({CACHE_KEYS_FIELD: recorded}):
+            return False
+        for attr, decoder in self._record_decoders().items():
+            setattr(self, attr, LazyRecordDict(store, self.cache_category, attr, decoder))
+        return True
+
+    def _save_to_sqlite(self) -> bool:
+        if not self.db_path:
+            return False
+        from utils.collector_cache import CACHE_KEYS_FIELD
+        from .sqlite_store import get_codebase_store
+        try:
+            data = self._with_cache_keys(self.to_dict())
+            cache_keys = data.pop(CACHE_KEYS_FIELD, None)
+            get_codebase_store(self.db_path).replace_category(self.cache_category, data, cache_keys)
+            return True
+        except Exception as e:
+            print(f"[WARNING] 保存 SQLite 缓存失败: {e}")
+            return False
+
     @abstractmethod
     def collect_infos(self, db_path: str, force_refresh: bool = False) -> None:
         """收集所有信息，支持缓存机制"""
         pass
 
+    # 本类收集时需要运行的全部 query 文件，供并行调度器预先提交
+    query_files = ()
+    # 并行组装时需要先完成的其他信息类别（见 tools.collector.scheduler）
+    depends_on = ()
+
+    def set_prefetched_results(self, results: Dict[str, Any]) -> None:
+        """注入调度器已并行跑完的 query 结果（query_file -> tuples）"""
+        self._prefetched_results = dict(results)
+
+    # 结果还依赖的其他类别的查询（例如 driver 会读取 common 的函数信息），参与缓存键计算
+    extra_cache_query_files = ()
+
+    def cache_query_files(self) -> tuple:
+        return tuple(self.query_files) + tuple(self.extra_cache_query_files)
+
+    def _cache_is_current(self, data: Dict) -> bool:
+        """缓存 JSON 记录的数据库指纹/查询哈希与当前一致时才可信"""
+        from utils.collector_cache import cache_keys_match
+        return cache_keys_match(self.db_path or "", self.cache_query_files(), data)
+
+    def _with_cache_keys(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """保存缓存前附上当前的缓存键"""
+        from utils.collector_cache import info_cache_keys, CACHE_KEYS_FIELD
+        try:
+            data[CACHE_KEYS_FIELD] = info_cache_keys(self.db_path, self.cache_query_files())
+        except OSError:
+            pass
+        return data
+
     def _run_query_and_return_json(self, query_file: str) -> Any:
         """运行query并返回结果"""
-        from utils.db_query import run_query_and_return_json
-        result = run_query_and_return_json(self.db_path, query_file)
-        if result:
-            return json.loads(result)["#select"]["tuples"]
-        return None
\ No newline at end of file
+        prefetched = getattr(self, "_prefetched_results", None)
+        if prefetched is not None and query_file in prefetched:
+            return prefetched.pop(query_file)
+        from utils.db_query import iter_query_tuples
+        from utils.collector_cache import run_cached_query
+        # 结果逐页解码并落盘，返回可迭代的 QueryResult（不在内存中保留整份结果）
+        tuples, _ = run_cached_query(
+            self.db_path, query_file,
+            lambda: iter_query_tuples(self.db_path, query_file),
+        )
+        return tuples
\ No newline at end of file
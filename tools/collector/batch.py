@@ -0,0 +1,181 @@
+# 多数据库批量收集：在同一个 query-server 会话中为多个数据库收集 common/driver/mmio 信息
+#
+# 批量脚本原来对每个 demo 单独运行 main.py，每次都启动一个 query-server JVM、注册一个数据库、
+# 编译并评估同一批 collector 查询。collect_batch 在一个进程（同一个 query-server 进程池）里处理所有数据库：
+#   - 所有数据库的查询共用一个 workers 大小的线程池，同时在途的评估再由 LCMHAL_QUERY_SERVER_MAX_INFLIGHT 限制；
+#   - 每条查询只编译一次（query-server 内的编译结果 + utils.query_compile_cache 的共享编译缓存）；
+#   - 最多 db_parallel 个数据库同时收集（组装出的信息较占内存），完成后注销数据库并释放源码缓存；
+#   - 结果照常写入各数据库的 lcmhal_tmp（query_results + info 缓存），之后各 demo 的 main.py 直接命中缓存。
+#
+# 入口：python main.py collect-batch <目录 | 列表文件> [--workers N] [--db-parallel N] [--disk-cache-mb MB] [--force]
+#   批量分析脚本的 --collect-first 通过 run_collect_batch_command 写出 demo 列表并调用该入口。
+#   目录：单个数据库（含 codeql-database.yml）、单个 testcase（含 lcmhal_config.yml），或递归查找两者；
+#   列表文件：每行一个数据库或 testcase 路径（# 开头为注释）。
+#
+# 环境变量：
+#   LCMHAL_COLLECT_BATCH_DBS        同时收集的数据库数（默认 2）
+#   LCMHAL_COLLECT_WORKERS          同时在途的查询数（默认 8）
+#   LCMHAL_QUERY_SERVER_DISK_CACHE_MB  query-server 中间结果磁盘缓存上限（见 codeql_mcp）
+
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from utils.env import env_int
+
+DB_MARKER = "codeql-database.yml"
+CONFIG_FILE = "lcmhal_config.yml"
+DEMO_LIST_FILE = os.path.join("run", "collect_batch_demos.txt")
+
+
+@dataclass
+class BatchResult:
+    """单个数据库的收集结果"""
+    db_path: str
+    wall_s: float = 0.0
+    queries: int = 0
+    cached: int = 0
+    from_cache: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+def _db_path_from_config(testcase_dir: str) -> Optional[str]:
+    import yaml
+    try:
+        with open(os.path.join(testcase_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"[WARNING] 读取 {testcase_dir}/{CONFIG_FILE} 失败: {e}")
+        return None
+    return config.get("db_path") if isinstance(config, dict) else None
+
+
+def _resolve(path: str) -> List[str]:
+    """路径 -> 数据库列表（数据库本身、testcase 目录，或递归查找）"""
+    if os.path.isfile(os.path.join(path, DB_MARKER)):
+        return [path]
+    if os.path.isfile(os.path.join(path, CONFIG_FILE)):
+        db_path = _db_path_from_config(path)
+        return [db_path] if db_path else []
+    found = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        if DB_MARKER in files:
+            found.append(root)
+            dirs[:] = []  # 不进入数据库内部
+        elif CONFIG_FILE in files:
+            db_path = _db_path_from_config(root)
+            if db_path:
+                found.append(db_path)
+    return found
+
+
+def discover_databases(path: str) -> List[str]:
+    """目录或列表文件中的全部数据库（去重并保持顺序）；不存在的数据库会打印警告并跳过"""
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    else:
+        entries = [path]
+    databases: List[str] = []
+    for entry in entries:
+        if not os.path.exists(entry):
+            print(f"[WARNING] 路径不存在，跳过: {entry}")
+            continue
+        for db_path in _resolve(entry):
+            db_path = os.path.abspath(db_path)
+            if db_path in databases:
+                continue
+            if not os.path.isfile(os.path.join(db_path, DB_MARKER)):
+                print(f"[WARNING] 数据库不存在，跳过: {db_path}")
+                continue
+            databases.append(db_path)
+    return databases
+
+
+def run_collect_batch_command(repo_root: str, demo_dirs: List[str], dry_run: bool = False) -> int:
+    """把 demo 列表写入 <repo_root>/run/collect_batch_demos.txt，并在子进程中运行 main.py collect-batch，返回退出码；
+    dry_run 时只打印命令，不写文件"""
+    if not demo_dirs:
+        print("[collect-batch] no demos found, skipped")
+        return 0
+    list_path = os.path.join(str(repo_root), DEMO_LIST_FILE)
+    cmd = [sys.executable, os.path.join(str(repo_root), "main.py"), "collect-batch", list_path]
+    print(f"[collect-batch] {len(demo_dirs)} demos: {' '.join(cmd)}", flush=True)
+    if dry_run:
+        return 0
+    os.makedirs(os.path.dirname(list_path), exist_ok=True)
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{d}\n" for d in demo_dirs))
+    return subprocess.run(cmd, cwd=str(repo_root)).returncode
+
+
+def _collect_one(db_path: str, query_pool: ThreadPoolExecutor, force_refresh: bool) -> BatchResult:
+    from .scheduler import CollectorScheduler
+    from utils.db_query import release_database
+    from utils.db_source import drop_source_store
+
+    result = BatchResult(db_path=db_path)
+    start = time.perf_counter()
+    print(f"[INFO] collect-batch: 开始 {db_path}")
+    scheduler = CollectorScheduler(db_path, query_pool=query_pool)
+    try:
+        scheduler.run(force_refresh)
+    except Exception as e:
+        result.errors.append(str(e))
+    finally:
+        release_database(db_path)
+        drop_source_store(db_path, flush=True)
+    result.wall_s = time.perf_counter() - start
+    result.queries = len(scheduler.query_timings)
+    result.cached = sum(1 for t in scheduler.query_timings.values() if t.cached)
+    result.from_cache = [t.info_name for t in scheduler.assemble_timings.values() if t.from_cache]
+    result.errors += [f"{t.query_file}: {t.error}" for t in scheduler.query_timings.values() if t.error]
+    result.errors += [f"{t.info_name}: {t.error}" for t in scheduler.assemble_timings.values() if t.error]
+    return result
+
+
+def collect_batch(db_paths: List[str], max_workers: Optional[int] = None, db_parallel: Optional[int] = None,
+                  disk_cache_mb: Optional[int] = None, force_refresh: bool = False) -> List[BatchResult]:
+    """依次（最多 db_parallel 个并行）为每个数据库收集信息，返回每个数据库的 BatchResult（顺序与 db_paths 一致）"""
+    if disk_cache_mb:
+        # query-server 在第一次真正执行查询时才启动，启动参数从环境变量读取
+        os.environ["LCMHAL_QUERY_SERVER_DISK_CACHE_MB"] = str(int(disk_cache_mb))
+    workers = max(max_workers or env_int("LCMHAL_COLLECT_WORKERS", 0) or 8, 1)
+    db_parallel = max(db_parallel or env_int("LCMHAL_COLLECT_BATCH_DBS", 2), 1)
+
+    t0 = time.perf_counter()
+    query_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lcmhal-batch-query")
+    db_pool = ThreadPoolExecutor(max_workers=min(db_parallel, max(len(db_paths), 1)), thread_name_prefix="lcmhal-batch-db")
+    try:
+        futures = [db_pool.submit(_collect_one, db_path, query_pool, force_refresh) for db_path in db_paths]
+        results = [future.result() for future in futures]
+    finally:
+        db_pool.shutdown(wait=True)
+        query_pool.shutdown(wait=True)
+    print(format_batch_report(results, time.perf_counter() - t0, workers, db_parallel))
+    return results
+
+
+def format_batch_report(results: List[BatchResult], wall_s: float, workers: int, db_parallel: int) -> str:
+    from .scheduler import INFO_CLASSES
+    queries = sum(r.queries for r in results)
+    cached = sum(r.cached for r in results)
+    failed = sum(1 for r in results if r.errors)
+    lines = [
+        f"[INFO] collect-batch 完成: {len(results)} 个数据库 (失败 {failed}), {queries} 条查询 (缓存命中 {cached}), "
+        f"墙钟 {wall_s:.1f}s, workers={workers}, db_parallel={db_parallel}"
+    ]
+    for r in results:
+        if r.queries == 0 and len(r.from_cache) == len(INFO_CLASSES) and not r.errors:
+            status = "(cache)"
+        else:
+            status = f"{r.queries} queries, {r.cached} cached"
+        lines.append(f"    {r.wall_s:8.1f}s  {status:<28} {r.db_path}")
+        for error in r.errors:
+            lines.append(f"        ERROR: {error}")
+    return "\n".join(lines)
@@ -0,0 +1,239 @@
+# 函数调用图：由 info_function_call_collector 的结果一次性构建邻接数组，
+# 支持 N 跳调用者/被调用者、从 main/Reset_Handler 的可达性、最短调用路径与强连通分量（递归环）。
+
+from array import array
+from collections import deque
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# 默认的程序入口
+DEFAULT_ENTRY_POINTS = ("main", "Reset_Handler")
+# 单次查询返回的函数数上限，避免一次工具调用把整张图塞给大模型
+DEFAULT_MAX_RESULTS = 200
+
+
+class CallGraph:
+    """函数名编号后用 array 保存出边/入边（去重），所有遍历均为迭代实现"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.out_adj: List[array] = []
+        self.in_adj: List[array] = []
+        self._scc_id: Optional[List[int]] = None
+        self._sccs: Optional[List[List[int]]] = None
+
+    # ---- 构建 ----
+    def _node(self, name: str) -> int:
+        idx = self.index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.index[name] = idx
+            self.names.append(name)
+            self.out_adj.append(array("i"))
+            self.in_adj.append(array("i"))
+        return idx
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[str, str]]) -> "CallGraph":
+        graph = cls()
+        seen = set()
+        for caller, callee in edges:
+            if not caller or not callee:
+                continue
+            u, v = graph._node(caller), graph._node(callee)
+            if (u, v) in seen:
+                continue
+            seen.add((u, v))
+            graph.out_adj[u].append(v)
+            graph.in_adj[v].append(u)
+        return graph
+
+    @classmethod
+    def from_call_dict(cls, func_calltos: Mapping[str, Any]) -> "CallGraph":
+        """由 CommonCodebaseInfo.func_calltos 构建；SQLite 懒加载字典走原始记录，不反序列化对象"""
+        def edges():
+            iter_raw = getattr(func_calltos, "iter_raw", None)
+            if iter_raw is not None:
+                for caller, calls in iter_raw():
+                    for call in calls:
+                        yield caller, call.get("callee_name")
+            else:
+                for caller, calls in func_calltos.items():
+                    for call in calls:
+                        yield caller, call.callee_name
+        return cls.from_edges(edges())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(adj) for adj in self.out_adj)
+
+    # ---- N 跳遍历 ----
+    def _bfs(self, start: int, adj: List[array], depth: Optional[int], limit: int) -> Tuple[Dict[int, int], bool]:
+        dist = {start: 0}
+        queue = deque([start])
+        truncated = False
+        while queue:
+            u = queue.popleft()
+            d = dist[u]
+            if depth is not None and d >= depth:
+                continue
+            for v in adj[u]:
+                if v in dist:
+                    continue
+                if len(dist) - 1 >= limit:
+                    truncated = True
+                    queue.clear()
+                    break
+                dist[v] = d + 1
+                queue.append(v)
+        del dist[start]
+        return dist, truncated
+
+    def _by_depth(self, dist: Dict[int, int]) -> Dict[int, List[str]]:
+        layers: Dict[int, List[str]] = {}
+        for node, d in dist.items():
+            layers.setdefault(d, []).append(self.names[node])
+        return {d: sorted(layers[d]) for d in sorted(layers)}
+
+    def callees(self, name: str, depth: Optional[int] = 1, limit: int = DEFAULT_MAX_RESULTS) -> Tuple[Dict[int, List[str]], bool]:
+        """depth 跳以内的被调用函数，按跳数分组；返回 (分组, 是否被截断)"""
+        if name not in self.index:
+            return {}, False
+        dist, truncated = self._bfs(self.index[name], self.out_adj, depth, limit)
+        return self._by_depth(dist), truncated
+
+    def callers(self, name: str, depth: Optional[int] = 1, limit: int = DEFAULT_MAX_RESULTS) -> Tuple[Dict[int, List[str]], bool]:
+        """depth 跳以内的调用者，按跳数分组；返回 (分组, 是否被截断)"""
+        if name not in self.index:
+            return {}, False
+        dist, truncated = self._bfs(self.index[name], self.in_adj, depth, limit)
+        return self._by_depth(dist), truncated
+
+    # ---- 最短路径 / 可达性 ----
+    def shortest_path(self, src: str, dst: str) -> Optional[List[str]]:
+        """src 到 dst 的最短调用链（函数名列表），不可达返回 None"""
+        if src not in self.index or dst not in self.index:
+            return None
+        s, t = self.index[src], self.index[dst]
+        if s == t:
+            return [src]
+        parent = {s: -1}
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for v in self.out_adj[u]:
+                if v in parent:
+                    continue
+                parent[v] = u
+                if v == t:
+                    path = [v]
+                    while parent[path[-1]] != -1:
+                        path.append(parent[path[-1]])
+                    return [self.names[n] for n in reversed(path)]
+                queue.append(v)
+        return None
+
+    def entry_points(self, candidates: Iterable[str] = DEFAULT_ENTRY_POINTS) -> List[str]:
+        return [name for name in candidates if name in self.index]
+
+    def reachability(self, name: str, entries: Iterable[str] = DEFAULT_ENTRY_POINTS) -> Dict[str, Any]:
+        """name 是否能从任一入口函数到达，给出最短的一条调用链"""
+        best: Optional[List[str]] = None
+        for entry in self.entry_points(entries):
+            path = self.shortest_path(entry, name)
+            if path is not None and (best is None or len(path) < len(best)):
+                best = path
+        return {
+            "function": name,
+            "entry_points": self.entry_points(entries),
+            "reachable": best is not None,
+            "path": best or [],
+        }
+
+    def reachable_set(self, entries: Iterable[str] = DEFAULT_ENTRY_POINTS) -> List[str]:
+        """从入口函数出发可达的全部函数"""
+        seen = set()
+        stack = [self.index[e] for e in self.entry_points(entries)]
+        seen.update(stack)
+        while stack:
+            u = stack.pop()
+            for v in self.out_adj[u]:
+                if v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+        return sorted(self.names[n] for n in seen)
+
+    # ---- 强连通分量（Tarjan，迭代版） ----
+    def _compute_sccs(self) -> None:
+        n = len(self.names)
+        index_of = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack: List[int] = []
+        scc_id = [-1] * n
+        sccs: List[List[int]] = []
+        counter = 0
+        for root in range(n):
+            if index_of[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                u, i = work.pop()
+                if i == 0:
+                    index_of[u] = low[u] = counter
+                    counter += 1
+                    stack.append(u)
+                    on_stack[u] = True
+                recurse = False
+                adj = self.out_adj[u]
+                while i < len(adj):
+                    v = adj[i]
+                    i += 1
+                    if index_of[v] == -1:
+                        work.append((u, i))
+                        work.append((v, 0))
+                        recurse = True
+                        break
+                    if on_stack[v]:
+                        low[u] = min(low[u], index_of[v])
+                if recurse:
+                    continue
+                if low[u] == index_of[u]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        scc_id[w] = len(sccs)
+                        comp.append(w)
+                        if w == u:
+                            break
+                    sccs.append(comp)
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[u])
+        self._scc_id = scc_id
+        self._sccs = sccs
+
+    def _is_cycle(self, comp: List[int]) -> bool:
+        # 单个函数只有自递归时才算环
+        return len(comp) > 1 or comp[0] in self.out_adj[comp[0]]
+
+    def cycles(self, limit: int = DEFAULT_MAX_RESULTS) -> Tuple[List[List[str]], bool]:
+        """全部递归环（大小 >1 的 SCC 或自递归），按大小降序；返回 (环列表, 是否被截断)"""
+        if self._sccs is None:
+            self._compute_sccs()
+        comps = [c for c in self._sccs if self._is_cycle(c)]
+        comps.sort(key=len, reverse=True)
+        return [sorted(self.names[n] for n in c) for c in comps[:limit]], len(comps) > limit
+
+    def cycle_of(self, name: str) -> List[str]:
+        """name 所在的递归环；不在环中返回空列表"""
+        if name not in self.index:
+            return []
+        if self._sccs is None:
+            self._compute_sccs()
+        comp = self._sccs[self._scc_id[self.index[name]]]
+        return sorted(self.names[n] for n in comp) if self._is_cycle(comp) else []
@@ -1,10 +1,16 @@
+import os
+import threading
+from collections import deque
 from pathlib import Path
 from typing import Dict, List, Set, Optional, Any
 from tools.collector.common import *
 from tools.collector.driver import *
 from tools.collector.mmio import *
-from utils.db_file import list_files_in_db_zip
+from tools.collector.scheduler import collect_codebase_infos
+from tools.collector.call_graph import CallGraph, DEFAULT_ENTRY_POINTS, DEFAULT_MAX_RESULTS
+from utils.db_file import list_files_in_db_zip, tree_file_from_db_zip
 from models.query_results.common import FunctionCallInfo
+from utils.env import env_int
 import config.globs as globs
 
 # 存储全部三类代码信息
@@ -13,9 +19,17 @@ class CodebaseInfos:
         self.db_path = db_path
         if not db_path:
             return
-        self.common_infos = create_commoncodebase_info(db_path, force_refresh=False)
-        self.driver_infos = create_drivercodebase_info(db_path, force_refresh=False)
-        self.mmio_infos = create_mmiocodebase_info(db_path, force_refresh=False)
+        # 三类信息的查询并行提交给 query-server（见 tools.collector.scheduler）
+        self.common_infos, self.driver_infos, self.mmio_infos = collect_codebase_infos(db_path, force_refresh=False)
+        self._call_graph: Optional[CallGraph] = None
+        self._call_graph_lock = threading.Lock()
+
+    def get_call_graph(self) -> CallGraph:
+        """首次使用时由 func_calltos 构建调用图，之后复用"""
+        with self._call_graph_lock:
+            if self._call_graph is None:
+                self._call_graph = CallGraph.from_call_dict(self.common_infos.func_calltos)
+            return self._call_graph
 
 # 全局codebase_infos_dict只留一份
 codebase_infos_dict: Dict[str, CodebaseInfos] = {}
@@ -52,7 +66,7 @@ def get_files_in_db_zip(db_path: str) -> List[str]:
 def get_tree_in_db_zip(db_path: str) -> str:
     """获取数据库zip文件中的目录树"""
     try:
-        return list_tree_in_db_zip(db_path)
+        return tree_file_from_db_zip(db_path)
     except Exception as e:
         print(f"Error listing tree in src.zip: {e}")
         return ""
@@ -194,34 +208,123 @@ def get_struct_or_enum_info(db_path: str, struct_name: str) -> Dict[str, Any]:
         print(f"Error getting struct or enum info: {e}")
         return {"error": str(e)}
 
+def _call_graph_max_results() -> int:
+    max_results = env_int("LCMHAL_CALLGRAPH_MAX_RESULTS", DEFAULT_MAX_RESULTS)
+    return max_results if max_results > 0 else DEFAULT_MAX_RESULTS
+
+def _collect_call_records(call_dict: Dict[str, List[FunctionCallInfo]], func_name: str,
+                          layer_cnt: int, next_name, max_results: int) -> tuple:
+    """按层展开调用记录（BFS），每个函数只展开一次；返回 (记录列表, 是否被截断)"""
+    records: List[FunctionCallInfo] = []
+    visited = {func_name}
+    queue = deque([(func_name, 1)])
+    while queue:
+        name, layer = queue.popleft()
+        for call in call_dict.get(name, []):
+            if len(records) >= max_results:
+                return records, True
+            records.append(call)
+            nxt = next_name(call)
+            if layer < layer_cnt and nxt and nxt not in visited:
+                visited.add(nxt)
+                queue.append((nxt, layer + 1))
+    return records, False
+
+def _resolve_call_stack(call_to_dict: Dict[str, List[FunctionCallInfo]],
+                        call_from_dict: Dict[str, List[FunctionCallInfo]],
+                        func_name: str, layer_cnt: int, max_results: int) -> tuple:
+    if layer_cnt <= 0:
+        return [], [], False
+    call_to_info, to_truncated = _collect_call_records(
+        call_to_dict, func_name, layer_cnt, lambda c: c.callee_name, max_results)
+    call_from_info, from_truncated = _collect_call_records(
+        call_from_dict, func_name, layer_cnt, lambda c: c.caller_name, max_results)
+    return call_to_info, call_from_info, to_truncated or from_truncated
+
 def resolve_call_stack(call_to_dict: Dict[str, List[FunctionCallInfo]], 
                       call_from_dict: Dict[str, List[FunctionCallInfo]], 
                       func_name: str, layer_cnt: int) -> tuple:
-    """递归解析函数调用栈"""
-    if layer_cnt <= 0:
-        return [], []
-    call_to_info = call_to_dict.get(func_name, [])
-    call_from_info = call_from_dict.get(func_name, [])
+    """解析 layer_cnt 层以内的函数调用栈；layer_cnt=1 时即直接调用/被调用记录"""
+    call_to_info, call_from_info, _ = _resolve_call_stack(
+        call_to_dict, call_from_dict, func_name, layer_cnt, _call_graph_max_results())
     return call_to_info, call_from_info
 
 def get_func_call_stack(db_path: str, func_name: str, layer_cnt: int = 1) -> Dict[str, Any]:
-    """获取函数调用栈"""
+    """获取函数调用栈；layer_cnt > 1 时额外按跳数给出 N 层以内的被调用者/调用者"""
     try:
         codebase_infos = get_global_codebase_infos(db_path)
         call_to_dict, call_from_dict = codebase_infos.common_infos.func_calltos, codebase_infos.common_infos.func_callfroms
-        call_to_stack, call_from_stack = resolve_call_stack(call_to_dict, call_from_dict, func_name, layer_cnt)
+        max_results = _call_graph_max_results()
+        call_to_stack, call_from_stack, truncated = _resolve_call_stack(
+            call_to_dict, call_from_dict, func_name, layer_cnt, max_results)
         
         if not call_to_stack and not call_from_stack:
             return {"error": f"Function call not found: {func_name}"}
         
-        return {
+        result = {
             "call_to_info": call_to_stack,
             "call_from_info": call_from_stack
         }
+        if layer_cnt > 1:
+            graph = codebase_infos.get_call_graph()
+            callees, callees_truncated = graph.callees(func_name, layer_cnt, max_results)
+            callers, callers_truncated = graph.callers(func_name, layer_cnt, max_results)
+            result["callees_by_layer"] = callees
+            result["callers_by_layer"] = callers
+            truncated = truncated or callees_truncated or callers_truncated
+        if truncated:
+            result["truncated"] = True
+        return result
     except Exception as e:
         print(f"Error getting function call stack: {e}")
         return {"error": str(e)}
 
+def get_call_path(db_path: str, src_func: str, dst_func: str) -> Dict[str, Any]:
+    """src_func 到 dst_func 的最短调用链"""
+    try:
+        graph = get_global_codebase_infos(db_path).get_call_graph()
+        for name in (src_func, dst_func):
+            if name not in graph:
+                return {"error": f"Function not found in call graph: {name}"}
+        path = graph.shortest_path(src_func, dst_func)
+        if path is None:
+            return {"error": f"No call path from {src_func} to {dst_func}"}
+        return {"path": path}
+    except Exception as e:
+        print(f"Error getting call path: {e}")
+        return {"error": str(e)}
+
+def get_func_reachability(db_path: str, func_name: str, entry_points: Optional[List[str]] = None) -> Dict[str, Any]:
+    """函数是否能从入口函数（默认 main / Reset_Handler）到达，并给出最短调用链"""
+    try:
+        graph = get_global_codebase_infos(db_path).get_call_graph()
+        if func_name not in graph:
+            return {"error": f"Function not found in call graph: {func_name}"}
+        entries = entry_points or list(DEFAULT_ENTRY_POINTS)
+        if not graph.entry_points(entries):
+            return {"error": f"No entry point found in call graph: {entries}"}
+        return graph.reachability(func_name, entries)
+    except Exception as e:
+        print(f"Error getting function reachability: {e}")
+        return {"error": str(e)}
+
+def get_call_cycles(db_path: str, func_name: str = "") -> Dict[str, Any]:
+    """递归调用环（强连通分量）；给定 func_name 时只返回它所在的环"""
+    try:
+        graph = get_global_codebase_infos(db_path).get_call_graph()
+        if func_name:
+            if func_name not in graph:
+                return {"error": f"Function not found in call graph: {func_name}"}
+            return {"cycles": [c for c in [graph.cycle_of(func_name)] if c]}
+        cycles, truncated = graph.cycles(_call_graph_max_results())
+        result = {"cycles": cycles}
+        if truncated:
+            result["truncated"] = True
+        return result
+    except Exception as e:
+        print(f"Error getting call cycles: {e}")
+        return {"error": str(e)}
+
 # 驱动相关接口
 def get_driver_info(db_path: str, driver_name: str) -> Optional[Any]:
     """获取驱动信息"""
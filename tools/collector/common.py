@@ -23,6 +23,14 @@ class CommonCodebaseInfo(CodebaseInfoBase):
     func_calltos: Dict[str, List[FunctionCallInfo]] = field(default_factory=dict)
     func_callfroms: Dict[str, List[FunctionCallInfo]] = field(default_factory=dict)
 
+    cache_category = "common"
+    query_files = (
+        function_collector_query_file,
+        struct_collector_query_file,
+        enum_collector_query_file,
+        function_call_collector_query_file,
+    )
+
     def __init__(self, db_path: str = ""):
         """初始化方法，支持从缓存加载"""
         self.db_path = db_path
@@ -32,12 +40,14 @@ class CommonCodebaseInfo(CodebaseInfoBase):
         self.mmio_functions = {}
         self.driver_functions = {}
         self.buffer_functions = {}
+        self.func_calltos = {}
+        self.func_callfroms = {}
         if db_path:
             self.init_from_cache(db_path)
 
-    def init_from_cache(self, db_path: str) -> bool:
+    def _init_from_json(self, db_path: str) -> bool:
         """
-        从缓存初始化数据
+        从 JSON 缓存初始化数据
         返回是否成功从缓存加载
         """
         self.cache_dir = Path(db_path) / "lcmhal_tmp"
@@ -55,6 +65,11 @@ class CommonCodebaseInfo(CodebaseInfoBase):
             if not self._validate_cache_data(data):
                 # print("[WARN] 缓存数据不完整或格式错误，将重新收集")
                 return False
+
+            # 数据库或相关查询(.ql/.qll)变化后缓存失效
+            self.db_path = db_path
+            if not self._cache_is_current(data):
+                return False
             
             # 从缓存数据恢复
             self._load_from_dict(data)
@@ -65,6 +80,20 @@ class CommonCodebaseInfo(CodebaseInfoBase):
             # print(f"[ERROR] 加载缓存失败: {e}")
             return False
 
+    def _record_decoders(self) -> Dict[str, Any]:
+        """各字典字段单条记录的反序列化函数"""
+        calls = lambda calls_data: [FunctionCallInfo.from_dict(call_data) for call_data in calls_data]
+        return {
+            "functions": FunctionInfo.from_dict,
+            "structs": StructInfo.from_dict,
+            "enums": EnumInfo.from_dict,
+            "func_calltos": calls,
+            "func_callfroms": calls,
+            "mmio_functions": FunctionInfo.from_dict,
+            "driver_functions": FunctionInfo.from_dict,
+            "buffer_functions": FunctionInfo.from_dict,
+        }
+
     def _validate_cache_data(self, data: Dict) -> bool:
         """验证缓存数据的完整性"""
         required_keys = ["functions", "structs", "enums"]
@@ -148,8 +177,8 @@ class CommonCodebaseInfo(CodebaseInfoBase):
         
         return result
 
-    def save_to_cache(self) -> bool:
-        """保存数据到缓存"""
+    def _save_to_json(self) -> bool:
+        """保存数据到 JSON 缓存"""
         if not self.db_path:
             # print("[ERROR] 未设置数据库路径，无法保存缓存")
             return False
@@ -163,7 +192,7 @@ class CommonCodebaseInfo(CodebaseInfoBase):
             
             # 保存数据
             with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+                json.dump(self._with_cache_keys(self.to_dict()), f, indent=4, ensure_ascii=False)
             
             # print(f"[INFO] 数据已保存到缓存: {self.cache_file}")
             return True
@@ -13,6 +13,9 @@ from tools.collector.collector import (
     get_struct_or_enum_info,
     resolve_call_stack,
     get_func_call_stack,
+    get_call_path,
+    get_func_reachability,
+    get_call_cycles,
     get_driver_info,
     validate_database
 )
@@ -32,6 +35,9 @@ __all__ = [
     "get_struct_or_enum_info",
     "resolve_call_stack",
     "get_func_call_stack",
+    "get_call_path",
+    "get_func_reachability",
+    "get_call_cycles",
     "get_driver_info",
     "validate_database"
 ]
\ No newline at end of file
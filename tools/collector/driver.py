@@ -21,6 +21,17 @@ class DriverCodebaseInfo(CodebaseInfoBase):
     driverfrom_function_contains_dict: Dict[str, List[DriverFunctionContainsInfo]] = field(default_factory=dict)
     driverto_functioncall_dict: Dict[str, List[DriverFunctionCallInfo]] = field(default_factory=dict)
 
+    cache_category = "driver"
+    query_files = (
+        driverfrom_expr_query_file,
+        driverfrom_function_query_file,
+        driverfrom_function_contains_query_file,
+        driverto_functioncall_query_file,
+    )
+    # _collect_driverfrom_function 需要读取 common_info.json
+    depends_on = ("common",)
+    extra_cache_query_files = (function_collector_query_file,)
+
     def __init__(self, db_path: str = ""):
         """初始化方法，支持从缓存加载"""
         self.db_path = db_path
@@ -31,9 +42,9 @@ class DriverCodebaseInfo(CodebaseInfoBase):
         if db_path:
             self.init_from_cache(db_path)
 
-    def init_from_cache(self, db_path: str) -> bool:
+    def _init_from_json(self, db_path: str) -> bool:
         """
-        从缓存初始化数据
+        从 JSON 缓存初始化数据
         返回是否成功从缓存加载
         """
         cache_dir = Path(db_path) / "lcmhal_tmp"
@@ -51,6 +62,11 @@ class DriverCodebaseInfo(CodebaseInfoBase):
             if not self._validate_cache_data(data):
                 # print("[WARN] 缓存数据不完整或格式错误，将重新收集")
                 return False
+
+            # 数据库或相关查询(.ql/.qll)变化后缓存失效
+            self.db_path = db_path
+            if not self._cache_is_current(data):
+                return False
             
             # 从缓存数据恢复
             self._load_from_dict(data)
@@ -61,6 +77,15 @@ class DriverCodebaseInfo(CodebaseInfoBase):
             # print(f"[ERROR] 加载缓存失败: {e}")
             return False
 
+    def _record_decoders(self) -> Dict[str, Any]:
+        """各字典字段单条记录的反序列化函数"""
+        return {
+            "driverfrom_expr_dict": lambda expr_list: [DriverExprInfo.from_dict(e) for e in expr_list],
+            "driverfrom_function_dict": lambda func_data: func_data,
+            "driverfrom_function_contains_dict": lambda contains_list: [DriverFunctionContainsInfo.from_dict(c) for c in contains_list],
+            "driverto_functioncall_dict": lambda call_list: [DriverFunctionCallInfo.from_dict(c) for c in call_list],
+        }
+
     def _validate_cache_data(self, data: Dict) -> bool:
         """验证缓存数据的完整性"""
         required_keys = ["driverfrom_expr_dict", "driverfrom_function_dict", 
@@ -108,8 +133,8 @@ class DriverCodebaseInfo(CodebaseInfoBase):
             }
         }
 
-    def save_to_cache(self) -> bool:
-        """保存数据到缓存"""
+    def _save_to_json(self) -> bool:
+        """保存数据到 JSON 缓存"""
         if not self.db_path:
             # print("未设置数据库路径，无法保存缓存")
             return False
@@ -123,7 +148,7 @@ class DriverCodebaseInfo(CodebaseInfoBase):
             
             # 保存数据
             with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+                json.dump(self._with_cache_keys(self.to_dict()), f, indent=4, ensure_ascii=False)
             
             # print(f"[INFO] 数据已保存到缓存: {cache_file}")
             return True
@@ -180,8 +205,8 @@ class DriverCodebaseInfo(CodebaseInfoBase):
     def _collect_driverfrom_function(self) -> None:
         """收集驱动函数信息"""
         # 需要先收集函数信息
-        from .common import create_codebase_info
-        common_info = create_codebase_info(self.db_path, force_refresh=False)
+        from .common import create_commoncodebase_info
+        common_info = create_commoncodebase_info(self.db_path, force_refresh=False)
         
         result = self._run_query_and_return_json(driverfrom_function_query_file)
         if result:
@@ -6,9 +6,10 @@ import sys
 
 # 导入collector核心模块
 from tools.collector.core import (
-    register_db, get_files_in_db_zip, get_tree_in_db_zip,
+    register_db, get_global_codebase_infos, get_files_in_db_zip, get_tree_in_db_zip,
     get_mmio_func_list, get_mmio_files, get_mmio_func_info,
     get_function_info, get_struct_or_enum_info, get_func_call_stack,
+    get_call_path, get_func_reachability, get_call_cycles,
     get_driver_info, validate_database
 )
 
@@ -125,17 +126,62 @@ async def collect_struct_or_enum_info(struct_name: str) -> str:
     except Exception as e:
         return f"Error collecting struct or enum info: {e}"
 
-@mcp.tool(name="GetFunctionCallStack", description="Get function call stack from database")
-async def collect_func_call_stack(func_name: str) -> str:
+@mcp.tool(name="GetFunctionCallStack", description="Get function call stack from database; layer_cnt > 1 follows callers/callees up to that many hops")
+async def collect_func_call_stack(func_name: str, layer_cnt: int = 1) -> str:
     """This tool collects the function call stack given a function name"""
     try:
-        result = get_func_call_stack(globs.db_path, func_name)
+        result = get_func_call_stack(globs.db_path, func_name, layer_cnt)
         if "error" in result:
             return result["error"]
-        return f"Function call to info: {result['call_to_info']}\nFunction call from info: {result['call_from_info']}"
+        text = f"Function call to info: {result['call_to_info']}\nFunction call from info: {result['call_from_info']}"
+        if "callees_by_layer" in result:
+            text += f"\nCallees by layer: {result['callees_by_layer']}\nCallers by layer: {result['callers_by_layer']}"
+        if result.get("truncated"):
+            text += "\n(Result truncated, reduce layer_cnt for a complete view)"
+        return text
     except Exception as e:
         return f"Error collecting function call stack: {e}"
 
+@mcp.tool(name="GetCallPath", description="Get the shortest call chain from one function to another")
+async def collect_call_path(src_func: str, dst_func: str) -> str:
+    """This tool finds the shortest call chain between two functions"""
+    try:
+        result = get_call_path(globs.db_path, src_func, dst_func)
+        if "error" in result:
+            return result["error"]
+        return f"Call path: {' -> '.join(result['path'])}"
+    except Exception as e:
+        return f"Error collecting call path: {e}"
+
+@mcp.tool(name="GetFunctionReachability", description="Check whether a function is reachable from main/Reset_Handler")
+async def collect_func_reachability(func_name: str) -> str:
+    """This tool checks whether the function can be reached from the program entry points"""
+    try:
+        result = get_func_reachability(globs.db_path, func_name)
+        if "error" in result:
+            return result["error"]
+        if not result["reachable"]:
+            return f"{func_name} is not reachable from {result['entry_points']}"
+        return f"{func_name} is reachable: {' -> '.join(result['path'])}"
+    except Exception as e:
+        return f"Error collecting function reachability: {e}"
+
+@mcp.tool(name="GetRecursiveCallCycles", description="Get recursive call cycles, or the cycle containing the given function")
+async def collect_call_cycles(func_name: str = "") -> str:
+    """This tool lists recursive call cycles (strongly connected components of the call graph)"""
+    try:
+        result = get_call_cycles(globs.db_path, func_name)
+        if "error" in result:
+            return result["error"]
+        if not result["cycles"]:
+            return f"No recursive call cycle found{f' for {func_name}' if func_name else ''}"
+        text = f"Recursive call cycles: {result['cycles']}"
+        if result.get("truncated"):
+            text += "\n(Result truncated)"
+        return text
+    except Exception as e:
+        return f"Error collecting call cycles: {e}"
+
 # driver相关工具
 @mcp.tool(name="GetDriverInfo", description="Get driver information from database")
 async def collect_driver_info(driver_name: str) -> str:
@@ -155,6 +201,10 @@ def parse_args():
     parser.add_argument("--transport", type=str, default="streamable-http", 
                        choices=["streamable-http", "sse", "stdio"],
                        help="Transport method (default: streamable-http)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind host for http/sse transports")
+    parser.add_argument("--port", type=int, default=8112, help="Bind port for http/sse transports (default: 8112)")
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="Exit when no registered client process is alive (shared collector service)")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -180,4 +230,12 @@ if __name__ == "__main__":
         sys.exit(1)
     
     # 启动MCP服务器
-    mcp.run(transport=transport)
\ No newline at end of file
+    if transport == "stdio":
+        mcp.run(transport=transport)
+    else:
+        # 作为共享服务（见 tools.collector.service）时预先构建调用图，首个请求不再付构建开销
+        get_global_codebase_infos(globs.db_path).get_call_graph()
+        if args.exit_when_idle:
+            from tools.collector.service import start_idle_watchdog
+            start_idle_watchdog(globs.db_path)
+        mcp.run(transport=transport, host=args.host, port=args.port)
\ No newline at end of file
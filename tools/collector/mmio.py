@@ -22,6 +22,16 @@ class MmioCodebaseInfo(CodebaseInfoBase):
     mmioinfo_mmioexpr_dict: Dict[str, List[MmioExprInfo]] = field(default_factory=dict)
     mmioinfo_interestingmmiofunc_contains_dict: Dict[str, List[MmioFunctionContainsInfo]] = field(default_factory=dict)
 
+    cache_category = "mmio"
+    query_files = (
+        mmio_function_query_file,
+        driver_function_query_file,
+        buffer_function_query_file,
+        mmioinfo_interestingmmioexpr_query_file,
+        mmioinfo_mmioexpr_query_file,
+        mmioinfo_interestingmmiofunccontains_query_file,
+    )
+
     def __init__(self, db_path: str = ""):
         """初始化方法，支持从缓存加载"""
         self.db_path = db_path
@@ -34,9 +44,9 @@ class MmioCodebaseInfo(CodebaseInfoBase):
         if db_path:
             self.init_from_cache(db_path)
 
-    def init_from_cache(self, db_path: str) -> bool:
+    def _init_from_json(self, db_path: str) -> bool:
         """
-        从缓存初始化数据
+        从 JSON 缓存初始化数据
         返回是否成功从缓存加载
         """
         cache_dir = Path(db_path) / "lcmhal_tmp"
@@ -54,6 +64,11 @@ class MmioCodebaseInfo(CodebaseInfoBase):
             if not self._validate_cache_data(data):
                 # print("[WARN] 缓存数据不完整或格式错误，将重新收集")
                 return False
+
+            # 数据库或相关查询(.ql/.qll)变化后缓存失效
+            self.db_path = db_path
+            if not self._cache_is_current(data):
+                return False
             
             # 从缓存数据恢复
             self._load_from_dict(data)
@@ -64,6 +79,18 @@ class MmioCodebaseInfo(CodebaseInfoBase):
             # print(f"[ERROR] 加载缓存失败: {e}")
             return False
 
+    def _record_decoders(self) -> Dict[str, Any]:
+        """各字典字段单条记录的反序列化函数"""
+        exprs = lambda expr_list: [MmioExprInfo.from_dict(e) for e in expr_list]
+        return {
+            "mmio_functions": FunctionInfo.from_dict,
+            "driver_functions": FunctionInfo.from_dict,
+            "buffer_functions": FunctionInfo.from_dict,
+            "mmioinfo_interestingmmioexpr_dict": exprs,
+            "mmioinfo_mmioexpr_dict": exprs,
+            "mmioinfo_interestingmmiofunc_contains_dict": lambda contains_list: [MmioFunctionContainsInfo.from_dict(c) for c in contains_list],
+        }
+
     def _validate_cache_data(self, data: Dict) -> bool:
         """验证缓存数据的完整性"""
         required_keys = ["mmio_functions", "driver_functions", "buffer_functions",
@@ -123,8 +150,8 @@ class MmioCodebaseInfo(CodebaseInfoBase):
             }
         }
 
-    def save_to_cache(self) -> bool:
-        """保存数据到缓存"""
+    def _save_to_json(self) -> bool:
+        """保存数据到 JSON 缓存"""
         if not self.db_path:
             # print("[ERROR] 未设置数据库路径，无法保存缓存")
             return False
@@ -138,7 +165,7 @@ class MmioCodebaseInfo(CodebaseInfoBase):
             
             # 保存数据
             with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+                json.dump(self._with_cache_keys(self.to_dict()), f, indent=4, ensure_ascii=False)
             
             # print(f"[INFO] 数据已保存到缓存: {cache_file}")
             return True
@@ -194,14 +221,17 @@ class MmioCodebaseInfo(CodebaseInfoBase):
         if result:
             for item in result:
                 func_name, file_path, location_line = item[0], item[1], item[2]
-                function_content = read_struct_with_start_line_from_db(self.db_path, file_path[1:], location_line, func_name)
+                end_line, end_column = (item[3], item[4]) if len(item) > 4 else (None, None)
+                function_content, function_content_in_lines = read_struct_with_start_line_from_db(
+                    self.db_path, file_path[1:], location_line, func_name, end_line=end_line, end_column=end_column)
                 if function_content == "":
                     continue
                 self.mmio_functions[func_name] = FunctionInfo(
                     name=func_name,
                     file_path=file_path,
                     location_line=location_line,
-                    function_content=function_content
+                    function_content=function_content,
+                    function_content_in_lines=function_content_in_lines
                 )
             # print("[INFO] MMIO函数信息收集完成")
 
@@ -213,14 +243,17 @@ class MmioCodebaseInfo(CodebaseInfoBase):
         if result:
             for item in result:
                 func_name, file_path, location_line = item[0], item[1], item[2]
-                function_content = read_struct_with_start_line_from_db(self.db_path, file_path[1:], location_line, func_name)
+                end_line, end_column = (item[3], item[4]) if len(item) > 4 else (None, None)
+                function_content, function_content_in_lines = read_struct_with_start_line_from_db(
+                    self.db_path, file_path[1:], location_line, func_name, end_line=end_line, end_column=end_column)
                 if function_content == "":
                     continue
                 self.driver_functions[func_name] = FunctionInfo(
                     name=func_name,
                     file_path=file_path,
                     location_line=location_line,
-                    function_content=function_content
+                    function_content=function_content,
+                    function_content_in_lines=function_content_in_lines
                 )
             # print("[INFO] 驱动函数信息收集完成")
 
@@ -232,14 +265,17 @@ class MmioCodebaseInfo(CodebaseInfoBase):
         if result:
             for item in result:
                 func_name, file_path, location_line = item[0], item[1], item[2]
-                function_content = read_struct_with_start_line_from_db(self.db_path, file_path[1:], location_line, func_name)
+                end_line, end_column = (item[3], item[4]) if len(item) > 4 else (None, None)
+                function_content, function_content_in_lines = read_struct_with_start_line_from_db(
+                    self.db_path, file_path[1:], location_line, func_name, end_line=end_line, end_column=end_column)
                 if function_content == "":
                     continue
                 self.buffer_functions[func_name] = FunctionInfo(
                     name=func_name,
                     file_path=file_path,
                     location_line=location_line,
-                    function_content=function_content
+                    function_content=function_content,
+                    function_content_in_lines=function_content_in_lines
                 )
             # print("[INFO] 缓冲函数信息收集完成")
 
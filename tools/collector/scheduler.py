@@ -0,0 +1,245 @@
+# 收集器并行调度：一次性把 common/driver/mmio 三类信息需要的全部 .ql 提交给 query-server，
+# 某一类信息依赖的查询（以及它依赖的其他信息类别）全部完成后立即组装该类信息。
+#
+# 环境变量：
+#   LCMHAL_COLLECT_PARALLEL=0      关闭并行调度，退回逐个 collect_infos
+#   LCMHAL_COLLECT_WORKERS         同时在途的查询数（默认 = 需要运行的查询数）
+#   LCMHAL_QUERY_SERVER_POOL       使用的 query-server 进程数（默认 1；每个进程都是 --threads=0）
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.env import env_flag, env_int
+
+from .base import CodebaseInfoBase
+from .common import CommonCodebaseInfo
+from .driver import DriverCodebaseInfo
+from .mmio import MmioCodebaseInfo
+
+# 信息类别 -> 信息类；组装顺序按依赖关系决定
+INFO_CLASSES = {
+    "common": CommonCodebaseInfo,
+    "driver": DriverCodebaseInfo,
+    "mmio": MmioCodebaseInfo,
+}
+
+
+def parallel_collect_enabled() -> bool:
+    return env_flag("LCMHAL_COLLECT_PARALLEL", True)
+
+
+@dataclass
+class QueryTiming:
+    """单条查询的耗时记录"""
+    query_file: str
+    queued_s: float = 0.0     # 提交到开始执行的等待时间
+    run_s: float = 0.0        # 执行 + 解码耗时
+    rows: int = 0
+    cached: bool = False      # 命中 lcmhal_tmp/query_results 缓存
+    error: str = ""
+
+
+@dataclass
+class AssembleTiming:
+    """单类信息的组装耗时记录"""
+    info_name: str
+    ready_at_s: float = 0.0   # 依赖就绪时距调度开始的时间
+    run_s: float = 0.0
+    from_cache: bool = False
+    error: str = ""
+
+
+class CollectorScheduler:
+    """并行执行 collector 查询并组装 CommonCodebaseInfo / DriverCodebaseInfo / MmioCodebaseInfo"""
+
+    def __init__(self, db_path: str, max_workers: Optional[int] = None, pool_size: Optional[int] = None,
+                 query_pool: Optional[ThreadPoolExecutor] = None):
+        self.db_path = db_path
+        self.max_workers = max_workers or env_int("LCMHAL_COLLECT_WORKERS", 0)
+        self.pool_size = max(pool_size or env_int("LCMHAL_QUERY_SERVER_POOL", 1), 1)
+        # 多个数据库共用的查询线程池（见 batch.collect_batch）；为 None 时每次 run 自建
+        self.query_pool = query_pool
+        self.query_timings: Dict[str, QueryTiming] = {}
+        self.assemble_timings: Dict[str, AssembleTiming] = {}
+        self.wall_s = 0.0
+        self._t0 = 0.0
+        self._server_rr = 0
+        self._rr_lock = threading.Lock()
+
+    # ---- 查询执行 ----
+    def _next_server(self):
+        # 只有缓存未命中、真正需要执行查询时才启动 query-server
+        from utils.db_query import get_query_server_pool
+        servers = get_query_server_pool(self.pool_size)
+        with self._rr_lock:
+            server = servers[self._server_rr % len(servers)]
+            self._server_rr += 1
+            return server
+
+    def _run_one_query(self, query_file: str, submitted_at: float) -> Any:
+        from utils.db_query import iter_query_tuples
+        from utils.collector_cache import run_cached_query
+        timing = self.query_timings[query_file]
+        start = time.perf_counter()
+        timing.queued_s = start - submitted_at
+        try:
+            tuples, timing.cached = run_cached_query(
+                self.db_path, query_file,
+                lambda: iter_query_tuples(self.db_path, query_file, self._next_server()),
+            )
+            timing.rows = len(tuples) if tuples else 0
+            return tuples
+        except Exception as e:
+            timing.error = str(e)
+            raise
+        finally:
+            timing.run_s = time.perf_counter() - start
+            source = "cache" if timing.cached else f"{timing.run_s:.1f}s"
+            print(f"[INFO] 查询完成 ({source}, {timing.rows} rows): {query_file}")
+
+    # ---- 组装 ----
+    def _assemble(self, name: str, info: CodebaseInfoBase, query_futures: Dict[str, Future],
+                  dep_futures: List[Future], force_refresh: bool) -> CodebaseInfoBase:
+        timing = self.assemble_timings[name]
+        wait(list(query_futures.values()) + dep_futures)
+        timing.ready_at_s = time.perf_counter() - self._t0
+        start = time.perf_counter()
+        try:
+            results = {}
+            for query_file, future in query_futures.items():
+                # 失败的查询不注入，collect_infos 内部会按原有方式处理（重试一次或跳过）
+                if future.exception() is None:
+                    results[query_file] = future.result()
+            info.set_prefetched_results(results)
+            info.collect_infos(self.db_path, force_refresh=True)
+            return info
+        except Exception as e:
+            timing.error = str(e)
+            raise
+        finally:
+            info.set_prefetched_results({})
+            timing.run_s = time.perf_counter() - start
+
+    def run(self, force_refresh: bool = False) -> Dict[str, CodebaseInfoBase]:
+        """收集三类信息，返回 {"common": ..., "driver": ..., "mmio": ...}"""
+        self._t0 = time.perf_counter()
+        infos: Dict[str, CodebaseInfoBase] = {}
+        pending: List[str] = []
+        for name, cls in INFO_CLASSES.items():
+            info = cls()
+            info.db_path = self.db_path
+            infos[name] = info
+            self.assemble_timings[name] = AssembleTiming(info_name=name)
+            if not force_refresh and info.init_from_cache(self.db_path):
+                self.assemble_timings[name].from_cache = True
+            else:
+                pending.append(name)
+
+        if not pending:
+            self.wall_s = time.perf_counter() - self._t0
+            return infos
+
+        # 去重后的全部查询
+        query_files: List[str] = []
+        for name in pending:
+            for query_file in INFO_CLASSES[name].query_files:
+                if query_file and query_file not in query_files:
+                    query_files.append(query_file)
+        for query_file in query_files:
+            self.query_timings[query_file] = QueryTiming(query_file=query_file)
+
+        workers = self.max_workers if self.max_workers > 0 else len(query_files)
+
+        own_pool = self.query_pool is None
+        query_pool = self.query_pool or ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="lcmhal-query")
+        assemble_pool = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="lcmhal-assemble")
+        query_futures: Dict[str, Future] = {}
+        try:
+            submitted_at = time.perf_counter()
+            query_futures = {
+                query_file: query_pool.submit(self._run_one_query, query_file, submitted_at)
+                for query_file in query_files
+            }
+            assemble_futures: Dict[str, Future] = {}
+            for name in self._assemble_order(pending):
+                cls = INFO_CLASSES[name]
+                deps = [assemble_futures[d] for d in cls.depends_on if d in assemble_futures]
+                own = {q: query_futures[q] for q in cls.query_files if q in query_futures}
+                assemble_futures[name] = assemble_pool.submit(
+                    self._assemble, name, infos[name], own, deps, force_refresh
+                )
+            for name, future in assemble_futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[ERROR] 组装{name}信息失败: {e}")
+        finally:
+            if own_pool:
+                query_pool.shutdown(wait=True)
+            else:
+                wait(list(query_futures.values()))
+            assemble_pool.shutdown(wait=True)
+
+        self.wall_s = time.perf_counter() - self._t0
+        print(self.format_report())
+        return infos
+
+    @staticmethod
+    def _assemble_order(names: List[str]) -> List[str]:
+        """按 depends_on 拓扑排序，保证依赖的组装任务先提交"""
+        ordered: List[str] = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered or name in visiting:
+                return
+            visiting.add(name)
+            for dep in INFO_CLASSES[name].depends_on:
+                if dep in names:
+                    visit(dep)
+            ordered.append(name)
+
+        for name in names:
+            visit(name)
+        return ordered
+
+    def format_report(self) -> str:
+        """墙钟时间与每条查询/每类组装的耗时汇总"""
+        serial = sum(t.run_s for t in self.query_timings.values())
+        cached = sum(1 for t in self.query_timings.values() if t.cached)
+        lines = [
+            f"[INFO] 收集器调度完成: {len(self.query_timings)} 条查询 (缓存命中 {cached}), "
+            f"墙钟 {self.wall_s:.1f}s, 查询累计 {serial:.1f}s, "
+            f"query-server x{self.pool_size}"
+        ]
+        for t in sorted(self.query_timings.values(), key=lambda t: -t.run_s):
+            status = f" ERROR: {t.error}" if t.error else (" (cache)" if t.cached else "")
+            lines.append(f"    query  {t.run_s:8.1f}s  wait {t.queued_s:6.1f}s  {t.rows:8d} rows  {t.query_file}{status}")
+        for t in self.assemble_timings.values():
+            if t.from_cache:
+                lines.append(f"    build  {t.info_name:<8} (cache)")
+            else:
+                status = f" ERROR: {t.error}" if t.error else ""
+                lines.append(f"    build  {t.info_name:<8} {t.run_s:8.1f}s  ready@{t.ready_at_s:.1f}s{status}")
+        return "\n".join(lines)
+
+
+def collect_codebase_infos(db_path: str, force_refresh: bool = False) -> Tuple[CommonCodebaseInfo, DriverCodebaseInfo, MmioCodebaseInfo]:
+    """
+    收集（或从缓存加载）三类代码库信息
+    LCMHAL_COLLECT_PARALLEL=0 时退回原来的逐个串行收集
+    """
+    if not parallel_collect_enabled():
+        from .common import create_commoncodebase_info
+        from .driver import create_drivercodebase_info
+        from .mmio import create_mmiocodebase_info
+        return (
+            create_commoncodebase_info(db_path, force_refresh),
+            create_drivercodebase_info(db_path, force_refresh),
+            create_mmiocodebase_info(db_path, force_refresh),
+        )
+    infos = CollectorScheduler(db_path).run(force_refresh)
+    return infos["common"], infos["driver"], infos["mmio"]
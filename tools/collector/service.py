@@ -0,0 +1,302 @@
+# 共享的 collector MCP 服务：每个数据库只启动一个常驻的 streamable-http 服务，
+# analyzer / fixer / builder / driver_locator 以及并发的多个分类任务都连到同一个进程，
+# 不再各自 spawn 一个 stdio 子进程（每个子进程都要重新 import、启动 query-server、加载缓存）。
+#
+# 环境变量：
+#   LCMHAL_COLLECTOR_SERVICE=shared   启用共享服务（默认 stdio，保持原来的每个 client 一个子进程）
+#   LCMHAL_COLLECTOR_URL              直接连接已启动的服务（如 http://127.0.0.1:8112/mcp/），不负责启动
+#   LCMHAL_COLLECTOR_START_TIMEOUT    等待服务就绪的秒数（默认 600，首次加载大数据库较慢）
+#   LCMHAL_COLLECTOR_IDLE_S           没有存活的客户端进程多少秒后服务自行退出（默认 300，<=0 不自动退出）
+#
+# 服务信息记录在 <db>/lcmhal_tmp/collector_service.json，其他进程据此复用；
+# 使用服务的进程在 <db>/lcmhal_tmp/collector_service.clients/<pid> 登记，正常退出时注销，
+# 最后一个客户端注销时停止服务；客户端被强制结束时由服务自己的看门狗在空闲超时后退出（连同 query-server）。
+# 手动管理：python -m tools.collector.service {start,stop,status} --db-path <db>
+
+import asyncio
+import atexit
+import fcntl
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.env import env_choice, env_float
+
+SERVICE_FILE = "collector_service.json"
+SERVICE_CLIENTS_DIR = "collector_service.clients"
+SERVICE_HOST = "127.0.0.1"
+# LCMHAL_COLLECTOR_SERVICE 的取值：shared/http/1/true/on 为共享服务，其余为每个进程自己的 stdio 子进程
+SERVICE_MODES = ("stdio", "0", "false", "off", "shared", "http", "1", "true", "on")
+
+# 本进程已登记为客户端的数据库（退出时注销）
+_leased_dbs = set()
+_leased_lock = threading.Lock()
+
+
+def collector_service_mode() -> str:
+    if os.environ.get("LCMHAL_COLLECTOR_URL", "").strip():
+        return "url"
+    mode = env_choice("LCMHAL_COLLECTOR_SERVICE", SERVICE_MODES, "stdio")
+    return "shared" if mode in ("shared", "http", "1", "true", "on") else "stdio"
+
+
+def _service_file(db_path: str) -> Path:
+    return Path(db_path).resolve() / "lcmhal_tmp" / SERVICE_FILE
+
+
+def _clients_dir(db_path: str) -> Path:
+    return Path(db_path).resolve() / "lcmhal_tmp" / SERVICE_CLIENTS_DIR
+
+
+def collector_idle_timeout() -> float:
+    return env_float("LCMHAL_COLLECTOR_IDLE_S", 300.0)
+
+
+@contextmanager
+def _service_lock(db_path: str):
+    """启动/停止服务与客户端登记互斥（跨进程）"""
+    lock_path = _service_file(db_path).with_suffix(".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def live_clients(db_path: str) -> List[int]:
+    """登记过且仍存活的客户端 pid；已退出进程的登记顺便删除"""
+    alive = []
+    try:
+        entries = list(_clients_dir(db_path).iterdir())
+    except OSError:
+        return alive
+    for entry in entries:
+        try:
+            pid = int(entry.name)
+        except ValueError:
+            continue
+        if _pid_alive(pid):
+            alive.append(pid)
+        else:
+            entry.unlink(missing_ok=True)
+    return alive
+
+
+def _register_client(db_path: str) -> None:
+    """调用方持有 _service_lock：登记本进程，并在退出时注销"""
+    clients_dir = _clients_dir(db_path)
+    clients_dir.mkdir(parents=True, exist_ok=True)
+    (clients_dir / str(os.getpid())).touch()
+    with _leased_lock:
+        if not _leased_dbs:
+            atexit.register(_release_all_clients)
+        _leased_dbs.add(str(Path(db_path).resolve()))
+
+
+def release_collector_service(db_path: str) -> None:
+    """注销本进程；没有其他存活的客户端时停止服务"""
+    with _leased_lock:
+        _leased_dbs.discard(str(Path(db_path).resolve()))
+    try:
+        with _service_lock(db_path):
+            (_clients_dir(db_path) / str(os.getpid())).unlink(missing_ok=True)
+            if not live_clients(db_path):
+                stop_collector_service(db_path)
+    except OSError as e:
+        print(f"[WARNING] failed to release collector service for {db_path}: {e}")
+
+
+def _release_all_clients() -> None:
+    with _leased_lock:
+        leased = list(_leased_dbs)
+    for db_path in leased:
+        release_collector_service(db_path)
+
+
+def start_idle_watchdog(db_path: str) -> Optional[threading.Thread]:
+    """服务进程内：没有存活的客户端超过 LCMHAL_COLLECTOR_IDLE_S 秒时向自己发送 SIGTERM（atexit 随后停止 query-server）"""
+    timeout = collector_idle_timeout()
+    if timeout <= 0:
+        return None
+
+    def watch():
+        last_seen = time.monotonic()
+        while True:
+            time.sleep(min(30.0, timeout))
+            if live_clients(db_path):
+                last_seen = time.monotonic()
+            elif time.monotonic() - last_seen >= timeout:
+                print(f"[INFO] collector service idle for {timeout:.0f}s with no clients, exiting")
+                _service_file(db_path).unlink(missing_ok=True)
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    thread = threading.Thread(target=watch, daemon=True, name="lcmhal-collector-idle")
+    thread.start()
+    return thread
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _port_open(port: int, timeout: float = 0.5) -> bool:
+    try:
+        with socket.create_connection((SERVICE_HOST, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((SERVICE_HOST, 0))
+        return s.getsockname()[1]
+
+
+def _read_service(db_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_service_file(db_path), "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return info if isinstance(info, dict) else None
+
+
+def service_status(db_path: str) -> Optional[Dict[str, Any]]:
+    """返回正在运行的服务信息（pid/port/url），没有可用服务时返回 None"""
+    info = _read_service(db_path)
+    if not info:
+        return None
+    pid, port = info.get("pid"), info.get("port")
+    if not isinstance(pid, int) or not isinstance(port, int) or not _pid_alive(pid):
+        return None
+    return info if _port_open(port) else None
+
+
+def _start_service(db_path: str, timeout: float) -> Dict[str, Any]:
+    db_dir = Path(db_path).resolve()
+    log_path = db_dir / "lcmhal_tmp" / "collector_service.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "tools.collector.mcp_server",
+        "--db-path", str(db_dir),
+        "--transport", "streamable-http",
+        "--host", SERVICE_HOST,
+        "--port", str(port),
+        "--exit-when-idle",
+    ]
+    repo_root = Path(__file__).resolve().parents[2]
+    with open(log_path, "ab") as log:
+        # 独立会话：调用方（某个 agent 进程）退出后服务继续供其他已登记的客户端使用，见 release_collector_service
+        proc = subprocess.Popen(cmd, cwd=str(repo_root), stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"collector service exited with code {proc.returncode}, see {log_path}")
+        if _port_open(port):
+            break
+        time.sleep(0.5)
+    else:
+        proc.terminate()
+        raise RuntimeError(f"collector service did not start within {timeout:.0f}s, see {log_path}")
+    info = {
+        "pid": proc.pid,
+        "port": port,
+        "url": f"http://{SERVICE_HOST}:{port}/mcp/",
+        "db_path": str(db_dir),
+        "started_at": time.time(),
+    }
+    tmp = _service_file(db_path).with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _service_file(db_path))
+    print(f"[INFO] collector service started: {info['url']} (pid {proc.pid}, db {db_dir})")
+    return info
+
+
+def ensure_collector_service(db_path: str, register: bool = True) -> Dict[str, Any]:
+    """获取（必要时启动）该数据库的共享 collector 服务；多进程并发调用时只会启动一个。
+    register 时把本进程登记为客户端，进程退出时注销（最后一个客户端退出时停止服务）"""
+    timeout = env_float("LCMHAL_COLLECTOR_START_TIMEOUT", 600.0)
+    with _service_lock(db_path):
+        # 登记与启动在同一把锁内：其他进程注销最后一个客户端时不会停掉刚取得的服务
+        info = service_status(db_path) or _start_service(db_path, timeout)
+        if register:
+            _register_client(db_path)
+        return info
+
+
+def stop_collector_service(db_path: str) -> bool:
+    info = service_status(db_path)
+    _service_file(db_path).unlink(missing_ok=True)
+    if not info:
+        return False
+    try:
+        os.killpg(info["pid"], signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def collector_mcp_connection(db_path: str) -> Dict[str, Any]:
+    """MultiServerMCPClient 中 "lcmhal_collector" 的连接配置，按 collector_service_mode 选择 stdio 或共享服务"""
+    mode = collector_service_mode()
+    if mode == "url":
+        return {"url": os.environ["LCMHAL_COLLECTOR_URL"].strip(), "transport": "streamable_http"}
+    if mode == "shared":
+        try:
+            return {"url": ensure_collector_service(db_path)["url"], "transport": "streamable_http"}
+        except Exception as e:
+            print(f"[WARNING] 共享 collector 服务不可用，退回 stdio 子进程: {e}")
+    return {
+        "command": "python",
+        "args": [
+            "-m",
+            "tools.collector.mcp_server",
+            "--db-path",
+            db_path,
+            "--transport",
+            "stdio"
+        ],
+        "transport": "stdio"
+    }
+
+
+async def acollector_mcp_connection(db_path: str) -> Dict[str, Any]:
+    """collector_mcp_connection 的异步版本：共享模式下启动服务可能要几分钟，放到线程中执行，不阻塞事件循环"""
+    return await asyncio.to_thread(collector_mcp_connection, db_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage the shared collector MCP service")
+    parser.add_argument("action", choices=["start", "stop", "status"])
+    parser.add_argument("--db-path", required=True)
+    args = parser.parse_args()
+    if args.action == "start":
+        # 手动启动的服务不登记客户端，由看门狗在空闲超时后退出，或用 stop 停止
+        print(json.dumps(ensure_collector_service(args.db_path, register=False), indent=2))
+    elif args.action == "stop":
+        print("stopped" if stop_collector_service(args.db_path) else "not running")
+    else:
+        status = service_status(args.db_path)
+        print(json.dumps(status, indent=2) if status else "not running")
@@ -0,0 +1,258 @@
+# CodebaseInfos 的 SQLite 缓存：<db>/lcmhal_tmp/codebase_info.sqlite
+#
+# 三类信息（common/driver/mmio）的每个字典字段按 (category, attr, name) 一行存储，
+# 读取时字段被替换为 LazyRecordDict，只有真正被访问的记录才会反序列化成对象，
+# 避免每个 mcp_server 子进程都把整份 JSON 读进内存。
+#
+# LCMHAL_CODEBASE_CACHE_FORMAT=json 时退回原来的 *_info.json；
+# 默认 sqlite，若只存在 *_info.json（且缓存键有效）则首次加载时自动迁移。
+
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.env import env_choice
+
+SQLITE_CACHE_FILE = "codebase_info.sqlite"
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    category TEXT NOT NULL,
+    attr TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (category, attr, name)
+) WITHOUT ROWID;
+"""
+
+
+def sqlite_cache_enabled() -> bool:
+    return env_choice("LCMHAL_CODEBASE_CACHE_FORMAT", ("sqlite", "json"), "sqlite") == "sqlite"
+
+
+class CodebaseStore:
+    """一个数据库对应一个 SQLite 文件；连接在进程内共享，所有访问串行化"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.sqlite_path = Path(db_path) / "lcmhal_tmp" / SQLITE_CACHE_FILE
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        if not create and not self.sqlite_path.exists():
+            return None
+        self.sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.sqlite_path), check_same_thread=False, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+        if row is None:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            conn.commit()
+        elif row[0] != SCHEMA_VERSION:
+            # 格式升级：旧数据全部丢弃，由调用方重新收集
+            conn.execute("DELETE FROM records")
+            conn.execute("DELETE FROM meta")
+            conn.execute("INSERT INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            conn.commit()
+        self._conn = conn
+        return conn
+
+    # ---- 元数据 ----
+    def get_cache_keys(self, category: str) -> Optional[Dict[str, Any]]:
+        """返回某类信息保存时记录的缓存键；该类信息不存在时返回 None"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT value FROM meta WHERE key=?", (f"keys:{category}",)).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    # ---- 写入 ----
+    def replace_category(self, category: str, data: Dict[str, Dict[str, Any]], cache_keys: Optional[Dict[str, Any]]) -> None:
+        """整体替换一类信息：data 为 {attr: {name: 可 JSON 序列化的值}}"""
+        with self._lock:
+            conn = self._connect(create=True)
+            with conn:
+                conn.execute("DELETE FROM records WHERE category=?", (category,))
+                for attr, mapping in data.items():
+                    if not isinstance(mapping, Mapping):
+                        continue
+                    conn.executemany(
+                        "INSERT INTO records (category, attr, name, data) VALUES (?, ?, ?, ?)",
+                        ((category, attr, name, json.dumps(value, ensure_ascii=False))
+                         for name, value in mapping.items()),
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    (f"keys:{category}", json.dumps(cache_keys, ensure_ascii=False)),
+                )
+
+    # ---- 读取 ----
+    def get_record(self, category: str, attr: str, name: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT data FROM records WHERE category=? AND attr=? AND name=?",
+                (category, attr, name),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has_record(self, category: str, attr: str, name: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return False
+            row = conn.execute(
+                "SELECT 1 FROM records WHERE category=? AND attr=? AND name=?",
+                (category, attr, name),
+            ).fetchone()
+        return row is not None
+
+    def names(self, category: str, attr: str) -> list:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            rows = conn.execute(
+                "SELECT name FROM records WHERE category=? AND attr=? ORDER BY name",
+                (category, attr),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def iter_records(self, category: str, attr: str) -> list:
+        """一次取出某字段的全部 (name, 原始数据)，不经过 decoder（例如构建调用图）"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            rows = conn.execute(
+                "SELECT name, data FROM records WHERE category=? AND attr=?",
+                (category, attr),
+            ).fetchall()
+        return [(name, json.loads(data)) for name, data in rows]
+
+    def count(self, category: str, attr: str) -> int:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            row = conn.execute(
+                "SELECT COUNT(*) FROM records WHERE category=? AND attr=?",
+                (category, attr),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LazyRecordDict(Mapping):
+    """只读字典视图：按名字从 SQLite 取单条记录并反序列化，结果在进程内缓存"""
+
+    def __init__(self, store: CodebaseStore, category: str, attr: str, decoder: Callable[[Any], Any]):
+        self._store = store
+        self._category = category
+        self._attr = attr
+        self._decoder = decoder
+        self._loaded: Dict[str, Any] = {}
+        self._names: Optional[list] = None
+
+    def __getitem__(self, name: str) -> Any:
+        if name in self._loaded:
+            return self._loaded[name]
+        data = self._store.get_record(self._category, self._attr, name) if isinstance(name, str) else None
+        if data is None:
+            raise KeyError(name)
+        value = self._decoder(data)
+        self._loaded[name] = value
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        if name in self._loaded:
+            return True
+        return isinstance(name, str) and self._store.has_record(self._category, self._attr, name)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._names is None:
+            self._names = self._store.names(self._category, self._attr)
+        return iter(self._names)
+
+    def iter_raw(self) -> Iterator:
+        """遍历全部 (name, 原始 JSON 数据)，不反序列化也不进入 _loaded"""
+        return iter(self._store.iter_records(self._category, self._attr))
+
+    def __len__(self) -> int:
+        if self._names is None:
+            return self._store.count(self._category, self._attr)
+        return len(self._names)
+
+    def __repr__(self) -> str:
+        return f"LazyRecordDict({self._category}.{self._attr}, {len(self)} records)"
+
+
+_stores: Dict[str, CodebaseStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_codebase_store(db_path: str) -> CodebaseStore:
+    """按数据库路径获取（或创建）进程内唯一的 CodebaseStore"""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = CodebaseStore(db_path)
+            _stores[key] = store
+        return store
+
+
+def drop_codebase_store(db_path: str) -> None:
+    """关闭连接（例如 clear_cache 删除 lcmhal_tmp 之前）"""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.pop(key, None)
+    if store is not None:
+        store.close()
+
+
+def migrate_json_caches(db_path: str) -> Dict[str, bool]:
+    """把现有的 common/driver/mmio_info.json 迁移到 SQLite，返回每类是否迁移成功"""
+    from tools.collector.common import CommonCodebaseInfo
+    from tools.collector.driver import DriverCodebaseInfo
+    from tools.collector.mmio import MmioCodebaseInfo
+
+    migrated = {}
+    for cls in (CommonCodebaseInfo, DriverCodebaseInfo, MmioCodebaseInfo):
+        info = cls()
+        info.db_path = db_path
+        migrated[info.cache_category] = info._init_from_json(db_path) and info._save_to_sqlite()
+    return migrated
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrate *_info.json caches to codebase_info.sqlite")
+    parser.add_argument("--db-path", required=True)
+    args = parser.parse_args()
+    print(migrate_json_caches(args.db_path))
@@ -13,6 +13,9 @@ from tools.collector.core import (
     get_function_info,
     get_struct_or_enum_info,
     get_func_call_stack,
+    get_call_path,
+    get_func_reachability,
+    get_call_cycles,
     get_driver_info,
     validate_database
 )
@@ -101,13 +104,40 @@ async def get_struct_or_enum_info_tool(db_path: str, struct_name: str) -> Dict[s
 
 @tool(
     "GetFunctionCallStack",
-    description="Get function call stack from database"
+    description="Get function call stack from database, layer_cnt > 1 follows callers/callees up to that many hops"
 )
 async def get_func_call_stack_tool(db_path: str, func_name: str, layer_cnt: int = 1) -> Dict[str, Any]:
     """获取函数调用栈"""
     return get_func_call_stack(db_path, func_name, layer_cnt)
 
 
+@tool(
+    "GetCallPath",
+    description="Get the shortest call chain from one function to another"
+)
+async def get_call_path_tool(db_path: str, src_func: str, dst_func: str) -> Dict[str, Any]:
+    """获取最短调用链"""
+    return get_call_path(db_path, src_func, dst_func)
+
+
+@tool(
+    "GetFunctionReachability",
+    description="Check whether a function is reachable from main/Reset_Handler and return the call chain"
+)
+async def get_func_reachability_tool(db_path: str, func_name: str) -> Dict[str, Any]:
+    """获取函数从入口的可达性"""
+    return get_func_reachability(db_path, func_name)
+
+
+@tool(
+    "GetRecursiveCallCycles",
+    description="Get recursive call cycles, or the cycle containing the given function"
+)
+async def get_call_cycles_tool(db_path: str, func_name: str = "") -> Dict[str, Any]:
+    """获取递归调用环"""
+    return get_call_cycles(db_path, func_name)
+
+
 @tool(
     "GetDriverInfo",
     description="Get driver information from database"
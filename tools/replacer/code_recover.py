@@ -1,27 +1,26 @@
 import config.globs as globs
 from utils.db_file import read_file_from_db_zip
-from utils.src_ops import file_convert_proj2src
+from utils.src_ops import file_convert_proj2src, write_src_file
 from models.query_results.common import FunctionInfo
 
 
-def recover_code_file(code_path: str) -> bool:
+def recover_code_file(code_path: str, target_path: str = None) -> bool:
     """
     搜索对应的源文件路径，根据codeql的DB中的对应文件恢复原始代码
     :param code_path: 代码文件路径
-    :param proj_path: 项目目录路径 (可能存在项目目录被移动到其他位置), 元组中的第一个元素为项目DB存储的路径, 第二个元素为项目实际路径
+    :param target_path: 写入位置（例如构建工作区中的副本），默认为 code_path 对应的源文件路径
     :return: 恢复后的代码字符串
     """
     # 搜索对应的源文件路径
     db_path = globs.db_path
     file_content, ok = read_file_from_db_zip(db_path, code_path)
     # 替换项目DB存储路径为项目实际路径
-    code_file_path = file_convert_proj2src(code_path)
+    code_file_path = target_path or file_convert_proj2src(code_path)
     if not ok or file_content is None or len(file_content) == 0:
         return False
     # 恢复原始代码
     # print(file_content)
-    with open(code_file_path, 'wb') as f:
-        f.write(file_content.encode('utf-8'))
+    write_src_file(code_file_path, file_content)
     return True
 
 def batch_recover_code_files(code_paths: list[str], proj_path: tuple[str, str] = None) -> bool:
@@ -0,0 +1,99 @@
+# 按文件合并的替换计划：同一文件的所有替换在未修改的原文（src.zip）上定位一次，
+# 一次拼接得到替换后的内容，每个文件只写一次（内容不变时不写，见 utils.src_ops.write_src_file）。
+# replace_funcs、批量编译验证共用。
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tools.replacer.code_replacer import get_func_content
+from utils.src_ops import decode_replacement_code, file_convert_proj2src, weak_funcdef, write_src_file
+
+
+class FilePatch:
+    """一个文件的替换结果：original 为原文，patched 为替换后内容，spans 为 {key: (起始行, 结束行)}"""
+
+    __slots__ = ("path", "original", "patched", "spans")
+
+    def __init__(self, path: str, original: str):
+        self.path = path
+        self.original = original
+        self.patched = original
+        self.spans: Dict[str, Tuple[int, int]] = {}
+
+    @property
+    def src_file(self) -> str:
+        return file_convert_proj2src(self.path)
+
+    @property
+    def changed(self) -> bool:
+        return self.patched != self.original
+
+
+def _apply_file(patch: FilePatch, edits: List[Tuple[int, int, str, str]]) -> List[str]:
+    """edits: [(起点, 终点, key, 新代码)]，位置都相对原文；返回因与其他替换重叠而放弃的 key"""
+    dropped = []
+    pieces = []
+    line = 1
+    # 与 src_replace 一致：.c 文件开头补充弱函数定义（头文件不加）
+    if weak_funcdef not in patch.original and not patch.path.endswith(".h"):
+        pieces.append(weak_funcdef)
+        line += weak_funcdef.count("\n")
+    pos = 0
+    for start, end, key, code in sorted(edits):
+        if start < pos:
+            dropped.append(key)
+            continue
+        gap = patch.original[pos:start]
+        pieces.append(gap)
+        line += gap.count("\n")
+        pieces.append(code)
+        patch.spans[key] = (line, line + code.count("\n"))
+        line += code.count("\n")
+        pos = end
+    pieces.append(patch.original[pos:])
+    patch.patched = "".join(pieces)
+    return dropped
+
+
+def plan_patches(items: Iterable[Tuple[str, object, str]],
+                 read_original: Callable[[str], Optional[str]]) -> Tuple[Dict[str, FilePatch], List[str]]:
+    """items: [(key, func_info, replace_code)]；read_original(DB 中的文件路径) 返回未修改的原文。
+
+    返回 ({文件路径: FilePatch}, 无法应用的 key 列表)
+    """
+    patches: Dict[str, FilePatch] = {}
+    edits: Dict[str, List[Tuple[int, int, str, str]]] = {}
+    failed: List[str] = []
+    for key, func_info, replace_code in items:
+        path = func_info.file_path
+        if path not in patches:
+            original = read_original(path)
+            if original is None:
+                failed.append(key)
+                continue
+            patches[path] = FilePatch(path, original)
+            edits[path] = []
+        old_code = get_func_content(func_info)
+        start = patches[path].original.find(old_code) if old_code else -1
+        if start < 0:
+            failed.append(key)
+            continue
+        try:
+            code = decode_replacement_code(replace_code)
+        except Exception:
+            failed.append(key)
+            continue
+        edits[path].append((start, start + len(old_code), key, code))
+    for path, patch in patches.items():
+        if edits[path]:
+            failed.extend(_apply_file(patch, edits[path]))
+    return {p: fp for p, fp in patches.items() if fp.changed}, failed
+
+
+def write_patches(patches: Dict[str, FilePatch], map_path: Callable[[str], str] = file_convert_proj2src) -> List[Tuple[str, str]]:
+    """把替换后的内容写到 map_path(文件路径)，返回 [(写入位置, 原文)] 便于恢复"""
+    written = []
+    for path, patch in patches.items():
+        target = map_path(path)
+        write_src_file(target, patch.patched)
+        written.append((target, patch.original))
+    return written
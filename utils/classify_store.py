@@ -0,0 +1,135 @@
+# 跨 testcase 共享的函数分类结果
+#
+# 同一份驱动代码（stm32xxx_hal_*.c、fsl_*.c 等）在多个 demo 中重复出现，按 DB 缓存的
+# function_classify 日志无法复用。这里按内容寻址保存分类结果：
+#   key = sha256(分类提示词 + 模型 + 实验配置, 函数名, 规范化函数体,
+#                直接被调用函数的 (函数名, 规范化函数体摘要), 函数体中引用的结构体 (名称, 规范化定义摘要))
+# 函数体或其直接上下文有任何改动都会得到新的 key。
+#
+# 存储位置：$LCMHAL_CLASSIFY_STORE（默认 ~/.cache/lcmhal/classify_store）/<key[:2]>/<key>.json，
+# 内容为 final_response 与来源（provenance：DB、testcase、源文件、时间、模型）。
+# LCMHAL_CLASSIFY_STORE=0 关闭共享复用（仍按 DB 缓存）。
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import config.globs as globs
+from config.model_singleton import get_model_name
+from utils.env import is_off
+
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_IDENT_RE = re.compile(r"\b[A-Za-z_]\w*\b")
+
+
+def classify_store_dir() -> Optional[str]:
+    raw = os.environ.get("LCMHAL_CLASSIFY_STORE", "").strip()
+    if is_off(raw):
+        return None
+    return raw or os.path.join(os.path.expanduser("~"), ".cache", "lcmhal", "classify_store")
+
+
+def normalize_source(code: Optional[str]) -> str:
+    """去掉注释、合并空白；只改排版或注释不影响 key"""
+    code = _COMMENT_RE.sub(" ", code or "")
+    return " ".join(code.split())
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def classify_key(func_name: str, prompt: str, db_path: Optional[str] = None) -> Optional[str]:
+    """函数在当前 DB 中的共享 key；函数不存在或关闭了共享复用时返回 None（不读取函数上下文）"""
+    from tools.collector.collector import get_function_source, get_global_codebase_infos
+
+    if not classify_store_dir():
+        return None
+    db_path = db_path or globs.db_path
+    body = normalize_source(get_function_source(db_path, func_name))
+    if not body:
+        return None
+    common = get_global_codebase_infos(db_path).common_infos
+
+    callees = set()
+    for call in common.func_calltos.get(func_name, []):
+        callee = call.callee_name
+        if callee and callee != func_name:
+            callees.add((callee, _digest(normalize_source(get_function_source(db_path, callee)))))
+
+    structs = set()
+    for ident in set(_IDENT_RE.findall(body)):
+        struct = common.structs.get(ident)
+        if struct is not None:
+            structs.add((ident, _digest(normalize_source(struct.struct_content))))
+
+    h = hashlib.sha256()
+    context = [
+        _digest(prompt), get_model_name(),
+        getattr(globs, "experiment_mode", "full"), getattr(globs, "tool_profile", "full"),
+        func_name, body,
+    ]
+    for part in context:
+        h.update(part.encode("utf-8") + b"\0")
+    for name, digest in sorted(callees) + sorted(structs):
+        h.update(f"{name}:{digest}".encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+def _entry_path(store: str, key: str) -> str:
+    return os.path.join(store, key[:2], key + ".json")
+
+
+def lookup_classification(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """返回 {"final_response": dict, "provenance": dict}，未命中返回 None"""
+    store = classify_store_dir()
+    if not key or not store:
+        return None
+    try:
+        with open(_entry_path(store, key), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get("final_response"), dict):
+        return None
+    return entry
+
+
+def store_classification(key: Optional[str], final_response: Dict[str, Any], func_name: str) -> None:
+    """保存分类结果（同一 key 已存在时保留先写入的那份）"""
+    store = classify_store_dir()
+    if not key or not store:
+        return
+    path = _entry_path(store, key)
+    if os.path.exists(path):
+        return
+    func_info = None
+    try:
+        from tools.collector.collector import get_function_info
+        func_info = get_function_info(globs.db_path, func_name)
+    except Exception:
+        pass
+    entry = {
+        "key": key,
+        "function_name": func_name,
+        "final_response": final_response,
+        "provenance": {
+            "db_path": globs.db_path,
+            "script_path": getattr(globs, "script_path", ""),
+            "file_path": getattr(func_info, "file_path", ""),
+            "model": get_model_name(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        },
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[WARNING] Failed to store shared classification for {func_name}: {e}")
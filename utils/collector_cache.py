@@ -0,0 +1,289 @@
+# 收集器缓存的内容寻址：
+# - 数据库指纹：codeql-database.yml + src.zip + db-cpp 元数据（跳过 evaluator 的 cache 目录）
+# - 查询哈希：.ql 本身 + 递归 import 的本地 .qll + codeql-pack(.lock).yml
+# 每条查询的结果 tuples 以 (数据库指纹, 查询哈希) 为键逐行保存在 <db>/lcmhal_tmp/query_results/，
+# common/driver/mmio_info.json 记录生成时的键（_cache_keys），键不一致即视为过期。
+#
+# LCMHAL_COLLECTOR_CACHE=0 时不复用 query_results，结果只临时落盘（info JSON 的键校验仍然生效）
+
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.env import env_flag
+
+QUERY_RESULTS_DIR = "query_results"
+CACHE_KEYS_FIELD = "_cache_keys"
+
+_IMPORT_RE = re.compile(r"^\s*(?:private\s+)?import\s+([A-Za-z_][\w.]*)", re.MULTILINE)
+_PACK_FILES = ("codeql-pack.yml", "codeql-pack.lock.yml", "qlpack.yml")
+
+_lock = threading.Lock()
+# db_path -> (stat 签名, 指纹)
+_db_fingerprints: Dict[str, Tuple[Any, str]] = {}
+# query_file -> ([(依赖文件, mtime_ns, size)], 哈希)
+_query_hashes: Dict[str, Tuple[List[Tuple[str, int, int]], str]] = {}
+
+
+def query_cache_enabled() -> bool:
+    return env_flag("LCMHAL_COLLECTOR_CACHE", True)
+
+
+# ---- 数据库指纹 ----
+def _db_stat_signature(db_dir: Path) -> List[Tuple[str, int, int]]:
+    entries = []
+    for name in ("codeql-database.yml", "src.zip"):
+        p = db_dir / name
+        if p.exists():
+            st = p.stat()
+            entries.append((name, st.st_size, st.st_mtime_ns))
+    for lang_dir in sorted(db_dir.glob("db-*")):
+        for root, dirs, files in os.walk(lang_dir):
+            # evaluator 的 cache 目录会随每次查询变化，不属于数据库内容
+            dirs[:] = sorted(d for d in dirs if d != "cache")
+            for f in sorted(files):
+                p = Path(root) / f
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((str(p.relative_to(db_dir)), st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def db_fingerprint(db_path: str) -> str:
+    """数据库指纹；src.zip/db-cpp 的文件 stat 不变时直接复用进程内结果"""
+    db_dir = Path(db_path).resolve()
+    signature = _db_stat_signature(db_dir)
+    with _lock:
+        cached = _db_fingerprints.get(str(db_dir))
+        if cached and cached[0] == signature:
+            return cached[1]
+    h = hashlib.sha256()
+    yml = db_dir / "codeql-database.yml"
+    if yml.exists():
+        h.update(yml.read_bytes())
+    for name, size, mtime in signature:
+        h.update(f"{name}\0{size}\0{mtime}\n".encode("utf-8"))
+    fingerprint = h.hexdigest()
+    with _lock:
+        _db_fingerprints[str(db_dir)] = (signature, fingerprint)
+    return fingerprint
+
+
+# ---- 查询哈希 ----
+def _find_pack_root(path: Path) -> Optional[Path]:
+    for parent in path.parents:
+        if any((parent / f).exists() for f in _PACK_FILES):
+            return parent
+    return None
+
+
+def _resolve_import(module: str, importer: Path, pack_root: Optional[Path]) -> Optional[Path]:
+    rel = Path(*module.split(".")).with_suffix(".qll")
+    candidates = [importer.parent / rel]
+    if pack_root is not None:
+        candidates.append(pack_root / rel)
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate.resolve()
+    return None
+
+
+def query_dependencies(query_file: str) -> List[Path]:
+    """.ql 文件及其递归 import 的本地 .qll（不在本仓库的库如 cpp 由 pack 文件覆盖）"""
+    root = Path(query_file).resolve()
+    pack_root = _find_pack_root(root)
+    seen: Dict[Path, None] = {}
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        if path in seen or not path.is_file():
+            continue
+        seen[path] = None
+        text = path.read_text(encoding="utf-8", errors="replace")
+        for module in _IMPORT_RE.findall(text):
+            dep = _resolve_import(module, path, pack_root)
+            if dep is not None and dep not in seen:
+                stack.append(dep)
+    deps = sorted(seen)
+    if pack_root is not None:
+        deps.extend(pack_root / f for f in _PACK_FILES if (pack_root / f).exists())
+    return deps
+
+
+def query_hash(query_file: str) -> str:
+    key = str(Path(query_file).resolve())
+    with _lock:
+        cached = _query_hashes.get(key)
+    if cached:
+        stamps, digest = cached
+        try:
+            if all(os.stat(p).st_mtime_ns == m and os.stat(p).st_size == s for p, m, s in stamps):
+                return digest
+        except OSError:
+            pass
+    h = hashlib.sha256()
+    stamps = []
+    for dep in query_dependencies(query_file):
+        data = dep.read_bytes()
+        st = dep.stat()
+        stamps.append((str(dep), st.st_mtime_ns, st.st_size))
+        h.update(dep.name.encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(data).digest())
+    digest = h.hexdigest()
+    with _lock:
+        _query_hashes[key] = (stamps, digest)
+    return digest
+
+
+def query_result_key(db_path: str, query_file: str) -> str:
+    return hashlib.sha256(f"{db_fingerprint(db_path)}:{query_hash(query_file)}".encode("utf-8")).hexdigest()
+
+
+# ---- info JSON 的缓存键 ----
+def info_cache_keys(db_path: str, query_files: Iterable[str]) -> Dict[str, Any]:
+    return {
+        "db": db_fingerprint(db_path),
+        "queries": {q: query_hash(q) for q in query_files if q},
+    }
+
+
+def cache_keys_match(db_path: str, query_files: Iterable[str], data: Dict[str, Any]) -> bool:
+    """info JSON 中记录的键与当前数据库/查询是否一致；旧格式（无键）视为过期"""
+    recorded = data.get(CACHE_KEYS_FIELD)
+    if not isinstance(recorded, dict):
+        return False
+    try:
+        return recorded == info_cache_keys(db_path, query_files)
+    except OSError:
+        return False
+
+
+# ---- 单条查询结果缓存 ----
+# 每行一个 tuple 的 JSON Lines，最后一行为 {"#end": {"key", "rows"}}；没有结尾行的文件视为不完整。
+# 写入和读取都是逐行进行，峰值内存与结果行数无关。
+_END_FIELD = "#end"
+
+
+def _query_result_path(db_path: str, query_file: str, key: str) -> Path:
+    return Path(db_path) / "lcmhal_tmp" / QUERY_RESULTS_DIR / f"{Path(query_file).stem}-{key[:16]}.jsonl"
+
+
+def _read_footer(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - 4096, 0))
+            tail = f.read().rstrip(b"\n").rsplit(b"\n", 1)[-1]
+        footer = json.loads(tail).get(_END_FIELD)
+    except (OSError, ValueError, AttributeError):
+        return None
+    return footer if isinstance(footer, dict) else None
+
+
+class QueryResult:
+    """
+    以 JSON Lines 文件为后端的查询结果：可多次迭代，len()/bool() 不需要读取内容。
+    temporary=True 的文件（关闭缓存时的落盘）在对象回收时删除。
+    """
+
+    def __init__(self, path: Path, rows: int, temporary: bool = False):
+        self.path = Path(path)
+        self.rows = rows
+        if temporary:
+            weakref.finalize(self, _unlink_quietly, str(self.path))
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for _, line in zip(range(self.rows), f):
+                yield json.loads(line)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __bool__(self) -> bool:
+        return self.rows > 0
+
+    def __repr__(self) -> str:
+        return f"QueryResult({self.path.name}, {self.rows} rows)"
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def load_query_result(db_path: str, query_file: str) -> Tuple[bool, Optional[QueryResult]]:
+    """返回 (是否命中, QueryResult)"""
+    if not query_cache_enabled():
+        return False, None
+    try:
+        key = query_result_key(db_path, query_file)
+    except OSError:
+        return False, None
+    path = _query_result_path(db_path, query_file, key)
+    footer = _read_footer(path)
+    if not footer or footer.get("key") != key or not isinstance(footer.get("rows"), int):
+        return False, None
+    return True, QueryResult(path, footer["rows"])
+
+
+def _spool_tuples(target: Path, key: str, tuples: Iterable[Any]) -> int:
+    """逐行写入临时文件后原子替换到 target，返回行数"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    rows = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item in tuples:
+                f.write(json.dumps(item, ensure_ascii=False))
+                f.write("\n")
+                rows += 1
+            f.write(json.dumps({_END_FIELD: {"key": key, "rows": rows}}))
+            f.write("\n")
+        os.replace(tmp, target)
+    except BaseException:
+        _unlink_quietly(str(tmp))
+        raise
+    return rows
+
+
+def store_query_result(db_path: str, query_file: str, tuples: Iterable[Any]) -> Optional[QueryResult]:
+    """把 tuples（可为生成器）逐行写入缓存；LCMHAL_COLLECTOR_CACHE=0 时写到临时文件，用完即删"""
+    key = query_result_key(db_path, query_file)
+    if not query_cache_enabled():
+        spool_dir = Path(db_path) / "lcmhal_tmp" / QUERY_RESULTS_DIR
+        target = spool_dir / f".spool-{Path(query_file).stem}-{uuid.uuid4().hex}.jsonl"
+        return QueryResult(target, _spool_tuples(target, key, tuples), temporary=True)
+    target = _query_result_path(db_path, query_file, key)
+    rows = _spool_tuples(target, key, tuples)
+    # 同一查询的旧版本结果（含旧的整份 .json 格式）不再有用
+    stem = Path(query_file).stem
+    for old in list(target.parent.glob(f"{stem}-*.json")) + list(target.parent.glob(f"{stem}-*.jsonl")):
+        if old != target:
+            old.unlink(missing_ok=True)
+    return QueryResult(target, rows)
+
+
+def run_cached_query(db_path: str, query_file: str, runner: Callable[[], Iterable[Any]]) -> Tuple[Optional[QueryResult], bool]:
+    """
+    命中缓存则直接返回 QueryResult，否则调用 runner() 得到逐行产出 tuple 的迭代器，边解码边落盘
+    返回 (QueryResult, 是否命中缓存)
+    """
+    hit, result = load_query_result(db_path, query_file)
+    if hit:
+        return result, True
+    tuples = runner()
+    if tuples is None:
+        return None, False
+    return store_query_result(db_path, query_file, tuples), False
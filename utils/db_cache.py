@@ -7,6 +7,7 @@ import glob
 from typing import Dict
 from utils.ai_log_manager import ai_log_manager
 from utils.log_index import log_index_manager
+from utils.db_source import drop_source_store
 
 
 def clear_cache(db_path: str, query_infos: list = []):
@@ -14,6 +15,13 @@ def clear_cache(db_path: str, query_infos: list = []):
         tmp_path = str(Path(db_path) / "lcmhal_tmp")
         # 删除整个tmp文件夹及其内容 （直接删除，不提示确认）
         if Path(tmp_path).exists():
+            # 源码镜像/SQLite 缓存也在 lcmhal_tmp 下，先丢弃进程内缓存
+            drop_source_store(db_path)
+            from tools.collector.sqlite_store import drop_codebase_store
+            drop_codebase_store(db_path)
+            # 共享 collector 服务持有旧的内存索引，一并停掉，下次使用时重新启动
+            from tools.collector.service import stop_collector_service
+            stop_collector_service(db_path)
             shutil.rmtree(tmp_path)
     else:
         for query in query_infos:
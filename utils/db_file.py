@@ -2,154 +2,103 @@
 
 import zipfile
 from pathlib import Path
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Iterable, Optional
+from utils.db_source import get_source_store
+from utils.source_index import DefinitionIndex
 
 MAX_STRUCT_SIZE = 0x100000  # 根据需要设置最大结构体大小
 
+# (file_path, start_line, name, end_line, end_column)，name/end_line/end_column 可为 None
+DefinitionRequest = Tuple[str, int, Optional[str], Optional[int], Optional[int]]
+
 def list_files_in_db_zip(db_path: str) -> list:
     """Lists all files in the src.zip inside a CodeQL database directory."""
-    db_path_resolved = Path(db_path).resolve()
-    if not db_path_resolved.exists():
-        return f"Database path does not exist: {db_path}"
-
-    source_zip = db_path_resolved / "src.zip"
-    if not source_zip.exists():
-        return f"Missing required src.zip in: {db_path}"
+    store = get_source_store(db_path)
+    err = store.check()
+    if err:
+        return err
 
     try:
-        with zipfile.ZipFile(source_zip, 'r') as zip_ref:
-            return zip_ref.namelist()
+        return store.namelist()
     except Exception as e:
         return f"Error reading src.zip: {e}"
 
 def read_file_from_db_zip(db_path: str, file_path: str) -> Tuple[str, bool]:
     """Reads a specific file from the src.zip inside a CodeQL database directory."""
-    if file_path.startswith("/"):
-        file_path = file_path[1:]
-    db_path_resolved = Path(db_path).resolve()
-    if not db_path_resolved.exists():
-        return f"Database path does not exist: {db_path}", False
-
-    source_zip = db_path_resolved / "src.zip"
-    if not source_zip.exists():
-        return f"Missing required src.zip in: {db_path}", False
-
+    # 解压/解码结果由 DbSourceStore 缓存（内存 LRU + lcmhal_tmp/src_decoded 镜像）
+    return get_source_store(db_path).read_text(file_path)
+
+def _source_file_from_db_zip(db_path: str, file_path: str) -> Tuple[Any, bool]:
+    """返回 (SourceFile, True)；失败时返回 (错误信息, False)。"""
+    store = get_source_store(db_path)
+    err = store.check()
+    if err:
+        return err, False
     try:
-        with zipfile.ZipFile(source_zip, 'r') as zip_ref:
-            with zip_ref.open(file_path) as file:
-                file_content = file.read()
-                # 先尝试UTF-8解码
-                try:
-                    return file_content.decode('utf-8'), True
-                except UnicodeDecodeError:
-                    # UTF-8解码失败，尝试Windows-1252编码
-                    try:
-                        print(f"[INFO] UTF-8 decoding failed, trying Windows-1252 for {file_path}")
-                        return file_content.decode('windows-1252'), True
-                    except UnicodeDecodeError:
-                        # 如果Windows-1252也失败，最后使用replace模式
-                        print(f"[WARNING] Both UTF-8 and Windows-1252 decoding failed, using replace mode for {file_path}")
-                        return file_content.decode('utf-8', errors='replace'), True
+        return store.get_file(file_path), True
     except KeyError:
-        return f"File {file_path} not found in src.zip", False
+        return f"File {file_path.lstrip('/')} not found in src.zip", False
     except Exception as e:
-        return f"Error reading file {file_path} from src.zip: {e}", False
+        return f"Error reading file {file_path.lstrip('/')} from src.zip: {e}", False
+
+def read_lines_from_db_zip(db_path: str, file_path: str) -> Tuple[Any, bool]:
+    """返回 (行列表, True)；失败时返回 (错误信息, False)。行列表为缓存共享对象，调用方不要修改。"""
+    source, success = _source_file_from_db_zip(db_path, file_path)
+    return (source.lines, True) if success else (source, False)
 
 def read_line_from_db(db_path: str, file_path: str, line: int) -> str:
     """Reads a specific line from a file in the src.zip inside a CodeQL database directory."""
-    content = read_file_from_db_zip(db_path, file_path)
-    lines, success = content
-    lines = lines.splitlines()
+    lines, success = read_lines_from_db_zip(db_path, file_path)
     if not success:
         return f"Error reading file {file_path} from src.zip: {lines}"
     if line < 1 or line > len(lines):
         return f"Invalid line number {line} for file {file_path}"
     return lines[line-1]
 
-def read_struct_with_start_line_from_db(db_path: str, file_path: str, start_line: int, struct_or_func_name: str = None) -> Tuple[str, Dict[int, str]]:
+def _extract_definition(source: Any, start_line: int, name: str = None,
+                        end_line: int = None, end_column: int = None) -> Tuple[str, Dict[int, str]]:
+    # 每个文件的注释/大括号索引只构建一次；查询给出结束行/列时直接按范围切片，否则从起始行数大括号
+    index = source.definition_index
+    if end_line:
+        content, content_in_lines = index.span(start_line, end_line, end_column, MAX_STRUCT_SIZE)
+    else:
+        content, content_in_lines = index.extract(start_line, MAX_STRUCT_SIZE)
+    # 如果指定了name，则检查其是否在content中
+    if name != None and name not in content:
+        return "", {}
+    return content, content_in_lines
+
+def read_struct_with_start_line_from_db(db_path: str, file_path: str, start_line: int, struct_or_func_name: str = None,
+                                        end_line: int = None, end_column: int = None) -> Tuple[str, Dict[int, str]]:
     """Reads a struct or function definition from the start line of a file in the src.zip inside a CodeQL database directory."""
-    content, success = read_file_from_db_zip(db_path, file_path)
+    source, success = _source_file_from_db_zip(db_path, file_path)
     if not success:
-        return f"Error reading file {file_path} from src.zip: {content}", {}
-    lines = content.splitlines()
-    struct_content, struct_content_in_lines = read_struct_or_func_from_lines(lines, start_line)
-    # 如果指定了struct_or_func_name，则检查其是否在struct_content中
-    if struct_or_func_name != None and struct_or_func_name not in struct_content:
-        return "", {}
-    return struct_content, struct_content_in_lines
+        return f"Error reading file {file_path} from src.zip: {source}", {}
+    return _extract_definition(source, start_line, struct_or_func_name, end_line, end_column)
+
+def read_definitions_from_db(db_path: str, requests: Iterable[DefinitionRequest]) -> Dict[DefinitionRequest, Tuple[str, Dict[int, str]]]:
+    """批量读取定义：requests 为 (file_path, start_line, name, end_line, end_column)，返回 {请求: (content, content_in_lines)}。
+    相同的请求只提取一次，同一文件只取一次 SourceFile；单个结果与 read_struct_with_start_line_from_db 相同。"""
+    results: Dict[DefinitionRequest, Tuple[str, Dict[int, str]]] = {}
+    sources: Dict[str, Tuple[Any, bool]] = {}
+    for request in requests:
+        if request in results:
+            continue
+        file_path, start_line, name, end_line, end_column = request
+        if file_path not in sources:
+            sources[file_path] = _source_file_from_db_zip(db_path, file_path)
+        source, success = sources[file_path]
+        if not success:
+            results[request] = f"Error reading file {file_path} from src.zip: {source}", {}
+        else:
+            results[request] = _extract_definition(source, start_line, name, end_line, end_column)
+    return results
 
 
 def read_struct_or_func_from_lines(lines: list, start_line: int) -> Tuple[str, Dict[int, str]]:
     """Reads a struct or function definition from the start line of a file in the src.zip inside a CodeQL database directory."""
-    current_comment = ""
-    in_comment_block = False
-    if start_line < 1 or start_line > len(lines):
-        print("Invalid start-line number, may be different definition.")
-        return "", {}
-    # 跳转到结构体定义的起始行并存储最近的注释
-    for i in range(1, start_line):
-        line = lines[i-1].strip()
-        # 检查是否在注释中
-        if "/*" in line:
-            if in_comment_block == False:
-                current_comment = ""
-            in_comment_block = True # 开始收集当前注释
-
-        if in_comment_block:
-            current_comment += line + "\n"  # 持续收集注释
-            if "*/" in line:
-                in_comment_block = False  # 结束当前注释
-                # 此时，current_comment 包含了最新的注释内容
-    
-    # 读取结构体定义
-    brace_count = 0  # 大括号计数器
-    # pre_brace_count = 0 # 小括号计数器
-    content_length = 0
-    line_cnt = 0
-    in_content = False  # 指示
-    struct_content = ""
-    struct_content_in_lines = {}
-    
-    for line in lines[start_line-1:]:
-        # # 解决pre_brace_count的问题
-        # if in_content == False:
-        #     pre_brace_count += line.count('(')
-        #     pre_brace_count -= line.count(')')
-        #     if pre_brace_count == 0:
-        #         in_content = True
-        
-        # 寻找大括号
-        brace_count += line.count('{')
-        brace_count -= line.count('}')
-
-        if brace_count > 0:
-            in_content = True
-        
-        # 检查是否超过了全局数组的大小
-        if content_length + len(line) < MAX_STRUCT_SIZE:
-            struct_content += line + "\n"
-            struct_content_in_lines[line_cnt+start_line] = line
-            content_length += len(line)
-        else:
-            print("Struct definition exceeds max size.")
-            break
-
-        if brace_count == 0 and in_content == True:
-            if line_cnt <= 2:
-                line_cnt += 1
-                continue
-            break
-        
-        # 小于0绝对是异常情况
-        if brace_count < 0:
-            line_cnt = 1
-            break
-        line_cnt += 1
-    # 检查是line_cnt是否为1，若为1则说明结构体定义不存在，抛出异常
-    if line_cnt <= 2:
-        return "", {}
-    # 合并最近的注释和结构体定义
-    return current_comment + struct_content, struct_content_in_lines
+    # 单次调用；同一文件多次提取时应复用 SourceFile.definition_index
+    return DefinitionIndex(lines).extract(start_line, MAX_STRUCT_SIZE)
 
 def get_zip_tree_structure(zip_path, indent='    ', max_level=None):
     """
@@ -163,74 +112,78 @@ def get_zip_tree_structure(zip_path, indent='    ', max_level=None):
     返回:
         tree_str: 树状结构字符串
     """
-    tree_lines = []  # 存储每一行的字符串
-    
     try:
         with zipfile.ZipFile(zip_path, 'r') as zf:
             # 获取ZIP内所有文件和目录的路径列表[2,3](@ref)
             namelist = zf.namelist()
-            
-            if not namelist:
-                return f"{zip_path}/\n(空压缩文件)"
-            
-            # 使用字典构建前缀树来表示目录结构[1](@ref)
-            tree = {}
-            
-            for name in namelist:
-                # 分割路径为组成部分
-                parts = name.rstrip('/').split('/')
-                if not parts or not parts[0]:
-                    continue
-                    
-                current = tree
-                # 逐级构建树结构
-                for i, part in enumerate(parts):
-                    is_last_component = (i == len(parts) - 1)
-                    if part not in current:
-                        # 标记是否为文件（路径的最后一部分且不以'/'结尾）
-                        current[part] = {
-                            'is_file': is_last_component and not name.endswith('/'), 
-                            'children': {}
-                        }
-                    current = current[part]['children']
-            
-            def build_tree_node(node, prefix='', level=0):
-                """递归构建树节点字符串"""
-                if max_level is not None and level > max_level:
-                    return []
-                    
-                node_lines = []
-                keys = list(node.keys())
-                
-                for i, key in enumerate(keys):
-                    is_last = (i == len(keys) - 1)
-                    is_file = node[key]['is_file']
-                    
-                    # 当前节点的连接符
-                    connector = '└── ' if is_last else '├── '
-                    line = f"{prefix}{connector}{key}{'' if is_file else '/'}"
-                    node_lines.append(line)
-                    
-                    # 为下一级节点计算新的前缀
-                    new_prefix = prefix + ('    ' if is_last else '│   ')
-                    
-                    # 递归构建子节点
-                    child_lines = build_tree_node(node[key]['children'], new_prefix, level + 1)
-                    node_lines.extend(child_lines)
-                
-                return node_lines
-            
-            # 构建完整的树结构
-            tree_lines.append(f"{zip_path}/")
-            tree_lines.extend(build_tree_node(tree))
-            
     except zipfile.BadZipFile:
         return f"错误: {zip_path} 不是一个有效的ZIP文件"
     except FileNotFoundError:
         return f"错误: 找不到文件 {zip_path}"
     except Exception as e:
         return f"错误: 处理ZIP文件时发生异常 - {str(e)}"
-    
+    return build_tree_from_namelist(zip_path, namelist, indent, max_level)
+
+def build_tree_from_namelist(zip_path, namelist, indent='    ', max_level=None):
+    """
+    根据 ZIP 内的路径列表生成树状目录结构字符串（不再重复打开 ZIP）
+    """
+    tree_lines = []  # 存储每一行的字符串
+
+    if not namelist:
+        return f"{zip_path}/\n(空压缩文件)"
+
+    # 使用字典构建前缀树来表示目录结构[1](@ref)
+    tree = {}
+
+    for name in namelist:
+        # 分割路径为组成部分
+        parts = name.rstrip('/').split('/')
+        if not parts or not parts[0]:
+            continue
+
+        current = tree
+        # 逐级构建树结构
+        for i, part in enumerate(parts):
+            is_last_component = (i == len(parts) - 1)
+            if part not in current:
+                # 标记是否为文件（路径的最后一部分且不以'/'结尾）
+                current[part] = {
+                    'is_file': is_last_component and not name.endswith('/'),
+                    'children': {}
+                }
+            current = current[part]['children']
+
+    def build_tree_node(node, prefix='', level=0):
+        """递归构建树节点字符串"""
+        if max_level is not None and level > max_level:
+            return []
+
+        node_lines = []
+        keys = list(node.keys())
+
+        for i, key in enumerate(keys):
+            is_last = (i == len(keys) - 1)
+            is_file = node[key]['is_file']
+
+            # 当前节点的连接符
+            connector = '└── ' if is_last else '├── '
+            line = f"{prefix}{connector}{key}{'' if is_file else '/'}"
+            node_lines.append(line)
+
+            # 为下一级节点计算新的前缀
+            new_prefix = prefix + ('    ' if is_last else '│   ')
+
+            # 递归构建子节点
+            child_lines = build_tree_node(node[key]['children'], new_prefix, level + 1)
+            node_lines.extend(child_lines)
+
+        return node_lines
+
+    # 构建完整的树结构
+    tree_lines.append(f"{zip_path}/")
+    tree_lines.extend(build_tree_node(tree))
+
     return '\n'.join(tree_lines)
 
 def tree_file_from_db_zip(db_path):
@@ -243,15 +196,17 @@ def tree_file_from_db_zip(db_path):
     返回:
         tree_str: 树状结构字符串
     """
-    db_path_resolved = Path(db_path).resolve()
-    if not db_path_resolved.exists():
-        return f"Database path does not exist: {db_path}"
+    store = get_source_store(db_path)
+    err = store.check()
+    if err:
+        return err
 
-    source_zip = db_path_resolved / "src.zip"
-    if not source_zip.exists():
-        return f"Missing required src.zip in: {db_path}"
-
-    return get_zip_tree_structure(source_zip)
+    try:
+        return store.tree()
+    except zipfile.BadZipFile:
+        return f"错误: {store.source_zip} 不是一个有效的ZIP文件"
+    except Exception as e:
+        return f"错误: 处理ZIP文件时发生异常 - {str(e)}"
 
 if __name__ == "__main__":
     # Example usage
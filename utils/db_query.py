@@ -2,7 +2,16 @@ import subprocess
 import json
 from config.collector_infos import *
 from codeql_mcp import CodeQLQueryServer
+import atexit
+import os
+import time
 import uuid
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from utils.env import env_float
 
 import logging
 
@@ -11,8 +20,129 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-qs = CodeQLQueryServer()
-qs.start()
+# query-server 在第一次真正执行查询时才启动（缓存全部命中时不会启动 JVM），
+# 空闲超过 LCMHAL_QUERY_SERVER_IDLE_S 秒（默认 300，0 表示不关闭）后自动关闭，下次查询时重新启动。
+_server_pool: List[CodeQLQueryServer] = []
+_server_pool_lock = threading.Lock()
+_register_lock = threading.Lock()
+_in_flight = 0
+_last_used = time.monotonic()
+_reaper_thread: Optional[threading.Thread] = None
+
+
+def _idle_timeout_s() -> float:
+    return env_float("LCMHAL_QUERY_SERVER_IDLE_S", 300.0)
+
+
+def _start_reaper() -> None:
+    global _reaper_thread
+    timeout = _idle_timeout_s()
+    if timeout <= 0 or (_reaper_thread is not None and _reaper_thread.is_alive()):
+        return
+    _reaper_thread = threading.Thread(target=_reap_idle_servers, args=(timeout,), daemon=True,
+                                      name="lcmhal-query-server-reaper")
+    _reaper_thread.start()
+
+
+def _reap_idle_servers(timeout: float) -> None:
+    while True:
+        time.sleep(min(max(timeout / 4, 1.0), 30.0))
+        with _server_pool_lock:
+            if not _server_pool:
+                continue
+            if _in_flight > 0 or time.monotonic() - _last_used < timeout:
+                continue
+            logger.info(f"query-server 空闲超过 {timeout:.0f}s，关闭 {len(_server_pool)} 个进程")
+            servers = list(_server_pool)
+            _server_pool.clear()
+        for server in servers:
+            server.stop()
+
+
+def _ensure_pool(size: int) -> List[CodeQLQueryServer]:
+    """调用方需持有 _server_pool_lock"""
+    while len(_server_pool) < size:
+        server = CodeQLQueryServer()
+        server.start()
+        _server_pool.append(server)
+    _start_reaper()
+    return _server_pool[:size]
+
+
+def get_query_server_pool(size: int = 1) -> List[CodeQLQueryServer]:
+    """返回包含 size 个 query-server 的进程池（不足时按需启动新进程）。"""
+    with _server_pool_lock:
+        return _ensure_pool(max(size, 1))
+
+
+def get_query_server() -> CodeQLQueryServer:
+    """全局 query-server（进程池中的第 0 个），首次调用时启动。"""
+    return get_query_server_pool(1)[0]
+
+
+def shutdown_query_servers() -> None:
+    with _server_pool_lock:
+        servers = list(_server_pool)
+        _server_pool.clear()
+    for server in servers:
+        server.stop()
+
+
+atexit.register(shutdown_query_servers)
+
+
+@contextmanager
+def _use_server(server: CodeQLQueryServer):
+    """标记查询在途，期间不会被空闲回收；server 已被回收时换成重新启动的进程"""
+    global _in_flight, _last_used
+    with _server_pool_lock:
+        if server in _server_pool and not server.is_alive():
+            # JVM 意外退出：移出进程池，按需重启
+            _server_pool.remove(server)
+        if server not in _server_pool:
+            pool = _ensure_pool(1)
+            server = pool[0]
+        _in_flight += 1
+        _last_used = time.monotonic()
+    try:
+        yield server
+    finally:
+        with _server_pool_lock:
+            _in_flight -= 1
+            _last_used = time.monotonic()
+
+
+def __getattr__(name: str):
+    # 兼容旧代码中的 utils.db_query.qs
+    if name == "qs":
+        return get_query_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def ensure_database_registered(server: CodeQLQueryServer, db_path: str) -> None:
+    """每个 query-server 对同一数据库只注册一次。"""
+    resolved = str(Path(db_path).resolve())
+    with _register_lock:
+        if resolved in server.registered_dbs:
+            return
+        # 注册失败（JSON-RPC error / 进程退出）时抛出 QueryServerError
+        server.register_databases(
+            [db_path],
+            progress_callback=lambda msg: print("[progress] register:", msg),
+        ).result()
+
+def release_database(db_path: str) -> None:
+    """从进程池中所有 query-server 注销数据库（批量收集时处理完一个数据库即释放）。"""
+    with _server_pool_lock:
+        servers = list(_server_pool)
+    for server in servers:
+        with _register_lock:
+            future = server.deregister_databases([db_path]) if server.is_alive() else None
+        if future is None:
+            continue
+        try:
+            future.result()
+        except Exception as e:
+            logger.warning(f"注销数据库失败 {db_path}: {e}")
 
 def run_query_and_return_json_directly(db_path: str, query_path: str) -> str:
     """Runs a CodeQL query on a given database and returns JSON result. directly run the query and decode the result."""
@@ -39,33 +169,54 @@ def run_query_and_return_json_directly(db_path: str, query_path: str) -> str:
 
 def run_query_and_return_json_server(db_path: str, query_path: str) -> str:
     """Runs a CodeQL query on a given database and returns JSON result."""
+    return run_query_on_server(get_query_server(), db_path, query_path)
+
+def run_query_on_server(server: CodeQLQueryServer, db_path: str, query_path: str) -> str:
+    """在指定的 query-server 上运行查询并返回 JSON 字符串（可被多个线程并发调用）。"""
     output_path = "/tmp/" + str(uuid.uuid4()) + ".bqrs"
-    # register the db
-    callback, done, result_holder = qs.wait_for_completion_callback()
-    qs.register_databases(
-        [db_path],
-        callback=callback,
-        progress_callback=lambda msg: print("[progress] register:", msg),
-    )
-    done.wait()
-
-    # create the tmp file
-    with open(output_path, "w") as fp:
-        pass
-    try:
-        # 执行查询
-        qs.evaluate_and_wait(query_path, db_path, output_path)
-        logger.info(f"查询 {query_path} 已完成，输出路径: {output_path}")
-    except RuntimeError as re:
-        return f"CodeQL evaluation failed: {re}"
-    # decode the bqrs file and return json
-    return qs.decode_bqrs(output_path, "json")
+    with _use_server(server) as server:
+        # register the db
+        ensure_database_registered(server, db_path)
+
+        # create the tmp file
+        with open(output_path, "w") as fp:
+            pass
+        try:
+            # 执行查询
+            server.evaluate_and_wait(query_path, db_path, output_path)
+            logger.info(f"查询 {query_path} 已完成，输出路径: {output_path}")
+        except RuntimeError as re:
+            return f"CodeQL evaluation failed: {re}"
+        # decode the bqrs file and return json
+        return server.decode_bqrs(output_path, "json")
     # result = evaluate_query(query_path, db_path, output_path)
     # if "CodeQL evaluation failed" in result:
     #     return result
     # return decode_bqrs(result, "json")
     # return ""
 
+def iter_query_tuples(db_path: str, query_path: str, server: Optional[CodeQLQueryServer] = None) -> Iterator[list]:
+    """
+    运行查询后分页解码 BQRS，逐行产出 #select 的 tuple（评估在调用时立即完成，失败抛出 RuntimeError）；
+    迭代结束或生成器被关闭时删除临时 BQRS
+    """
+    output_path = "/tmp/" + str(uuid.uuid4()) + ".bqrs"
+    with _use_server(server or get_query_server()) as server:
+        ensure_database_registered(server, db_path)
+        try:
+            server.evaluate_and_wait(query_path, db_path, output_path)
+        except Exception:
+            Path(output_path).unlink(missing_ok=True)
+            raise
+        logger.info(f"查询 {query_path} 已完成，输出路径: {output_path}")
+
+    def _tuples():
+        try:
+            yield from server.iter_bqrs_tuples(output_path)
+        finally:
+            Path(output_path).unlink(missing_ok=True)
+    return _tuples()
+
 def run_query_and_return_json(db_path: str, query_path: str, output_path: str = "/tmp/eval.bqrs") -> str:
     """Runs a CodeQL query on a given database and returns JSON result."""
     # run_query_and_return_json_directly(db_path, query_path)
@@ -0,0 +1,369 @@
+# CodeQL DB 源码存储：src.zip 中每个文件只解压+解码一次
+#
+# - 内存：按解码后文本大小做 LRU（LCMHAL_SRC_CACHE_MB，默认 256MB）
+# - 磁盘：<db>/lcmhal_tmp/src_decoded/<src.zip 指纹>/ 下保存 UTF-8 解码镜像，供后续进程直接读取，
+#   index.json 记录每个文件探测到的原始编码。镜像按 zip 指纹分目录，zip 变化时换一个目录，
+#   不会删除其他进程正在填充的镜像；旧指纹的目录以及 index.json 的合并写入都在 src_decoded/.lock 的文件锁下进行
+
+import atexit
+import fcntl
+import json
+import os
+import shutil
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.env import env_int
+
+DECODED_MIRROR_DIR = "src_decoded"
+MIRROR_INDEX_FILE = "index.json"
+# index.json 每新增多少条编码记录落盘一次（进程退出时也会落盘）
+MIRROR_INDEX_FLUSH_EVERY = 64
+
+
+def _cache_budget_bytes() -> int:
+    return max(env_int("LCMHAL_SRC_CACHE_MB", 256), 1) * 1024 * 1024
+
+
+def decode_source_bytes(data: bytes, file_path: str = "") -> Tuple[str, str]:
+    """按 UTF-8 → Windows-1252 → UTF-8(replace) 顺序解码，返回 (文本, 实际使用的编码)。"""
+    try:
+        return data.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        print(f"[INFO] UTF-8 decoding failed, trying Windows-1252 for {file_path}")
+        return data.decode("windows-1252"), "windows-1252"
+    except UnicodeDecodeError:
+        print(f"[WARNING] Both UTF-8 and Windows-1252 decoding failed, using replace mode for {file_path}")
+        return data.decode("utf-8", errors="replace"), "utf-8-replace"
+
+
+class SourceFile:
+    """单个已解码源文件：文本、编码与按需构建的行表。"""
+
+    __slots__ = ("path", "text", "encoding", "_lines", "_line_offsets", "_definition_index")
+
+    def __init__(self, path: str, text: str, encoding: str):
+        self.path = path
+        self.text = text
+        self.encoding = encoding
+        self._lines: Optional[List[str]] = None
+        self._line_offsets: Optional[List[int]] = None
+        self._definition_index = None
+
+    @property
+    def lines(self) -> List[str]:
+        """与 str.splitlines() 语义一致的行列表（行号从 1 开始对应下标 0）。"""
+        if self._lines is None:
+            self._lines = self.text.splitlines()
+        return self._lines
+
+    @property
+    def line_offsets(self) -> List[int]:
+        """每行起始字符偏移；最后追加一个文本长度作为哨兵。"""
+        if self._line_offsets is None:
+            offsets = []
+            pos = 0
+            for line in self.text.splitlines(keepends=True):
+                offsets.append(pos)
+                pos += len(line)
+            offsets.append(pos)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    @property
+    def definition_index(self):
+        """注释块与大括号范围索引（见 utils.source_index），首次提取定义时构建。"""
+        if self._definition_index is None:
+            from utils.source_index import DefinitionIndex
+            self._definition_index = DefinitionIndex(self.lines)
+        return self._definition_index
+
+    def line(self, line_no: int) -> Optional[str]:
+        lines = self.lines
+        if line_no < 1 or line_no > len(lines):
+            return None
+        return lines[line_no - 1]
+
+    def size(self) -> int:
+        return len(self.text)
+
+
+class DbSourceStore:
+    """一个 CodeQL 数据库对应一个实例，通过 get_source_store(db_path) 获取。"""
+
+    def __init__(self, db_path: str, cache_budget: Optional[int] = None):
+        self.db_path = db_path
+        self.db_dir = Path(db_path).resolve()
+        self.source_zip = self.db_dir / "src.zip"
+        self.mirror_dir = self.db_dir / "lcmhal_tmp" / DECODED_MIRROR_DIR
+        self.cache_budget = cache_budget or _cache_budget_bytes()
+        self._lock = threading.RLock()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._zip_stamp: Optional[str] = None
+        self._namelist: Optional[List[str]] = None
+        self._tree: Optional[str] = None
+        self._files: "OrderedDict[str, SourceFile]" = OrderedDict()
+        self._cached_size = 0
+        self._encodings: Dict[str, str] = {}
+        self._pending_index = 0
+        self._mirror_checked = False
+
+    # ---- 基础检查 ----
+    def check(self) -> Optional[str]:
+        """数据库或 src.zip 不存在时返回与 db_file 旧接口一致的错误字符串，否则 None。"""
+        if not self.db_dir.exists():
+            return f"Database path does not exist: {self.db_path}"
+        if not self.source_zip.exists():
+            return f"Missing required src.zip in: {self.db_path}"
+        return None
+
+    def _current_zip_stamp(self) -> str:
+        st = self.source_zip.stat()
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    def _open_zip(self) -> zipfile.ZipFile:
+        """打开（或在 src.zip 被替换后重新打开）src.zip，调用方需持有锁。"""
+        stamp = self._current_zip_stamp()
+        if self._zip is not None and stamp == self._zip_stamp:
+            return self._zip
+        if self._zip is not None:
+            self._zip.close()
+            self.clear_memory()
+        self._zip = zipfile.ZipFile(self.source_zip, "r")
+        self._zip_stamp = stamp
+        self._mirror_checked = False
+        return self._zip
+
+    # ---- 磁盘镜像 ----
+    def _mirror_root(self) -> Path:
+        return self.mirror_dir / self._zip_stamp
+
+    def _mirror_index_path(self) -> Path:
+        return self._mirror_root() / MIRROR_INDEX_FILE
+
+    def _mirror_lock(self):
+        """src_decoded/.lock 的文件描述符（调用方 flock 后关闭）；无法创建时返回 None"""
+        try:
+            self.mirror_dir.mkdir(parents=True, exist_ok=True)
+            return open(self.mirror_dir / ".lock", "w")
+        except OSError:
+            return None
+
+    def _ensure_mirror(self) -> None:
+        """首次使用镜像前读取当前 zip 指纹对应的编码索引，并删除旧指纹的镜像目录。"""
+        if self._mirror_checked:
+            return
+        self._mirror_checked = True
+        self._encodings = {}
+        try:
+            with open(self._mirror_index_path(), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self._encodings.update(index.get("files", {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+        lock = self._mirror_lock()
+        if lock is None:
+            return
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for entry in self.mirror_dir.iterdir():
+                if entry.is_dir() and entry.name != self._zip_stamp:
+                    shutil.rmtree(entry, ignore_errors=True)
+                elif entry.name == MIRROR_INDEX_FILE:
+                    # 按指纹分目录之前的索引
+                    entry.unlink(missing_ok=True)
+
+    def _mirror_file_path(self, file_path: str) -> Path:
+        return self._mirror_root() / "files" / file_path
+
+    def _read_mirror(self, file_path: str) -> Optional[SourceFile]:
+        encoding = self._encodings.get(file_path)
+        if encoding is None:
+            return None
+        try:
+            with open(self._mirror_file_path(file_path), "r", encoding="utf-8", newline="") as f:
+                return SourceFile(file_path, f.read(), encoding)
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _write_mirror(self, source: SourceFile) -> None:
+        target = self._mirror_file_path(source.path)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(source.text)
+            os.replace(tmp, target)
+        except OSError:
+            return
+        self._encodings[source.path] = source.encoding
+        self._pending_index += 1
+        if self._pending_index >= MIRROR_INDEX_FLUSH_EVERY:
+            self.flush_index()
+
+    def flush_index(self) -> None:
+        """把编码索引合并写入 index.json（多进程共享同一镜像时做并集）。"""
+        with self._lock:
+            if self._pending_index == 0 or self._zip_stamp is None:
+                return
+            index_path = self._mirror_index_path()
+            lock = self._mirror_lock()
+            if lock is None:
+                return
+            # 读取-合并-写回在文件锁内完成，多个进程同时落盘时不会互相覆盖
+            with lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                files = dict(self._encodings)
+                try:
+                    with open(index_path, "r", encoding="utf-8") as f:
+                        existing = json.load(f)
+                    if existing.get("zip_stamp") == self._zip_stamp:
+                        files = {**existing.get("files", {}), **files}
+                except (OSError, ValueError, AttributeError):
+                    pass
+                try:
+                    index_path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = index_path.with_name(f".{index_path.name}.{os.getpid()}.tmp")
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump({"zip_stamp": self._zip_stamp, "files": files}, f, ensure_ascii=False)
+                    os.replace(tmp, index_path)
+                    self._pending_index = 0
+                except OSError:
+                    pass
+
+    # ---- 内存 LRU ----
+    def _remember(self, source: SourceFile) -> None:
+        old = self._files.pop(source.path, None)
+        if old is not None:
+            self._cached_size -= old.size()
+        self._files[source.path] = source
+        self._cached_size += source.size()
+        while self._cached_size > self.cache_budget and len(self._files) > 1:
+            _, evicted = self._files.popitem(last=False)
+            self._cached_size -= evicted.size()
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._cached_size = 0
+            self._namelist = None
+            self._tree = None
+
+    # ---- 对外接口 ----
+    def namelist(self) -> List[str]:
+        with self._lock:
+            zf = self._open_zip()
+            if self._namelist is None:
+                self._namelist = zf.namelist()
+            return self._namelist
+
+    def get_file(self, file_path: str) -> SourceFile:
+        """返回已解码的源文件；文件不存在时抛 KeyError。"""
+        if file_path.startswith("/"):
+            file_path = file_path[1:]
+        with self._lock:
+            zf = self._open_zip()
+            source = self._files.get(file_path)
+            if source is not None:
+                self._files.move_to_end(file_path)
+                return source
+            self._ensure_mirror()
+            source = self._read_mirror(file_path)
+            if source is None:
+                with zf.open(file_path) as fp:
+                    data = fp.read()
+                text, encoding = decode_source_bytes(data, file_path)
+                source = SourceFile(file_path, text, encoding)
+                self._write_mirror(source)
+            self._remember(source)
+            return source
+
+    def read_text(self, file_path: str) -> Tuple[str, bool]:
+        """与 read_file_from_db_zip 相同的返回约定：(内容或错误信息, 是否成功)。"""
+        err = self.check()
+        if err:
+            return err, False
+        try:
+            return self.get_file(file_path).text, True
+        except KeyError:
+            return f"File {file_path.lstrip('/')} not found in src.zip", False
+        except Exception as e:
+            return f"Error reading file {file_path.lstrip('/')} from src.zip: {e}", False
+
+    def get_lines(self, file_path: str) -> Optional[List[str]]:
+        try:
+            return self.get_file(file_path).lines
+        except Exception:
+            return None
+
+    def read_line(self, file_path: str, line: int) -> Optional[str]:
+        try:
+            return self.get_file(file_path).line(line)
+        except Exception:
+            return None
+
+    def get_encoding(self, file_path: str) -> Optional[str]:
+        try:
+            return self.get_file(file_path).encoding
+        except Exception:
+            return None
+
+    def tree(self) -> str:
+        """src.zip 的树状目录结构（结果缓存，zip 变化后失效）。"""
+        from utils.db_file import build_tree_from_namelist
+        with self._lock:
+            names = self.namelist()
+            if self._tree is None:
+                self._tree = build_tree_from_namelist(str(self.source_zip), names)
+            return self._tree
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush_index()
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+            self.clear_memory()
+
+
+_stores: Dict[str, DbSourceStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_source_store(db_path: str) -> DbSourceStore:
+    """按数据库路径获取（或创建）进程内唯一的 DbSourceStore。"""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = DbSourceStore(db_path)
+            _stores[key] = store
+        return store
+
+
+def drop_source_store(db_path: str, flush: bool = False) -> None:
+    """丢弃某个数据库的内存缓存（例如 clear_cache 删除 lcmhal_tmp 之后；批量收集处理完一个数据库后用 flush=True）。"""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.pop(key, None)
+    if store is not None:
+        if not flush:
+            # 镜像目录可能已被删除，不再回写 index.json
+            store._pending_index = 0
+        store.close()
+
+
+@atexit.register
+def _flush_all_indexes() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        try:
+            store.flush_index()
+        except Exception:
+            pass
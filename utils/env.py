@@ -0,0 +1,56 @@
+# LCMHAL_* 环境变量的解析：取值无效时返回默认值并打印警告，不在 import 时抛异常
+
+import os
+
+_ON = ("1", "true", "yes", "on")
+_OFF = ("0", "false", "no", "off")
+
+
+def is_off(value: str) -> bool:
+    """取值是否表示关闭（0/false/no/off，不区分大小写），用于"路径或关闭"类的变量"""
+    return value.strip().lower() in _OFF
+
+
+def env_flag(name: str, default: bool) -> bool:
+    raw = os.environ.get(name, "").strip().lower()
+    if not raw:
+        return default
+    if raw in _ON:
+        return True
+    if raw in _OFF:
+        return False
+    print(f"[WARNING] {name}={raw!r} is not a boolean, using {'1' if default else '0'}")
+    return default
+
+
+def env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw, 10)
+    except ValueError:
+        print(f"[WARNING] {name}={raw!r} is not an integer, using {default}")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"[WARNING] {name}={raw!r} is not a number, using {default}")
+        return default
+
+
+def env_choice(name: str, choices, default: str) -> str:
+    """取值（小写）须在 choices 中，否则返回 default"""
+    raw = os.environ.get(name, "").strip().lower()
+    if not raw:
+        return default
+    if raw in choices:
+        return raw
+    print(f"[WARNING] {name}={raw!r} is not one of {', '.join(choices)}, using {default}")
+    return default
@@ -4,6 +4,7 @@ from prompts.summary_prompt import failcheck_analyze_prompt_en, failcheck_analyz
 import sys
 import config.globs as globs
 from utils.ai_log_manager import ai_log_manager
+from utils.llm_limiter import llm_limiter
 import os
 import time
 import json
@@ -144,7 +145,7 @@ def analyze_failed_conversation(messages, agent_name="Unknown Agent", max_iterat
     
     try:
         # 调用LLM进行分析
-        response = failcheck_model.invoke([HumanMessage(content=prompt)])
+        response = llm_limiter.invoke(failcheck_model, [HumanMessage(content=prompt)])
         analysis_report = response.content
         
         print("\n" + "="*50)
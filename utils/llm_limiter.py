@@ -0,0 +1,228 @@
+"""进程内共享的 LLM 并发控制（AIMD）
+
+所有 agent（analyzer、builder、builder-fixer、fixer、rubric、failcheck 等）的模型调用都经过同一个 llm_limiter：
+- 并发上限从 LCMHAL_LLM_CONCURRENCY_INIT 开始；调用成功且并发已用满时加性增长（每一轮 +1），
+  不超过 LCMHAL_LLM_CONCURRENCY_MAX；
+- 遇到 429 / 超时时乘性减小（减半，不低于 LCMHAL_LLM_CONCURRENCY_MIN），一个冷却期内只减一次，
+  避免同一波并发失败把上限压到底；延迟本身不触发减小（延迟随提示词和输出长度变化，不代表提供商过载）；
+- 可重试的错误（429、超时、连接错误、5xx）按带抖动的指数退避重试，最多 LCMHAL_LLM_MAX_RETRIES 次，
+  服务端给出 Retry-After 时以它为准。
+
+同步调用（线程中的 .invoke）与异步调用（.ainvoke）共用同一个上限与 FIFO 等待队列；
+stats() 返回当前上限、在途与排队数量等，供日志与批量脚本观察。
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from utils.env import env_float, env_int
+
+
+def classify_llm_error(exc: BaseException) -> str:
+    """"throttle"（429/超时，需要降低并发）、"retry"（连接错误/5xx，可重试）或 "fatal\""""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    name = type(exc).__name__.lower()
+    if status == 429 or "ratelimit" in name or "timeout" in name or isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return "throttle"
+    if (isinstance(status, int) and status >= 500) or "connection" in name or "overloaded" in name:
+        return "retry"
+    return "fatal"
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    def __init__(self):
+        self.min_limit = max(env_int("LCMHAL_LLM_CONCURRENCY_MIN", 1), 1)
+        self.max_limit = max(env_int("LCMHAL_LLM_CONCURRENCY_MAX", 64), self.min_limit)
+        init = env_int("LCMHAL_LLM_CONCURRENCY_INIT", 8)
+        self.limit = float(min(max(init, self.min_limit), self.max_limit))
+        self.max_retries = max(env_int("LCMHAL_LLM_MAX_RETRIES", 5), 0)
+        self.backoff_base = max(env_float("LCMHAL_LLM_BACKOFF_BASE_S", 1.0), 0.0)
+        self.backoff_max = max(env_float("LCMHAL_LLM_BACKOFF_MAX_S", 60.0), self.backoff_base)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._ewma_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._successes = 0
+        self._throttled = 0
+        self._errors = 0
+        self._retries = 0
+
+    # ---- 并发槽 ----
+    def _try_take(self) -> bool:
+        """调用方持有 _lock；只有排在队首（或没有排队）时才能拿到槽，保证 FIFO"""
+        if self._in_flight < int(self.limit):
+            self._in_flight += 1
+            return True
+        return False
+
+    def _wake(self) -> None:
+        """调用方持有 _lock：按顺序唤醒能拿到槽的等待者"""
+        while self._waiters and self._in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                self._in_flight += 1
+                waiter.set()
+            else:
+                loop, fut = waiter
+                if fut.done():
+                    continue
+                self._in_flight += 1
+                loop.call_soon_threadsafe(self._grant, fut)
+
+    def _grant(self, fut: asyncio.Future) -> None:
+        # 等待者在唤醒前被取消时把槽还回去
+        if fut.done():
+            self._release()
+        else:
+            fut.set_result(None)
+
+    def acquire(self) -> None:
+        with self._lock:
+            if not self._waiters and self._try_take():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._try_take():
+                return
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # 已经分到槽后才被取消：还回去
+            if fut.done() and not fut.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    # ---- AIMD ----
+    def _on_success(self, latency: float, saturated: bool) -> None:
+        with self._lock:
+            self._successes += 1
+            self._ewma_latency = latency if self._ewma_latency is None else 0.8 * self._ewma_latency + 0.2 * latency
+            if saturated:
+                self.limit = min(self.limit + 1.0 / max(self.limit, 1.0), float(self.max_limit))
+            self._wake()
+
+    def _decrease(self, factor: float) -> None:
+        """调用方持有 _lock；一个冷却期（约一次调用的平均耗时）内只减小一次"""
+        now = time.monotonic()
+        cooldown = self._ewma_latency if self._ewma_latency is not None else 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * factor, float(self.min_limit))
+
+    def _on_error(self, kind: str) -> None:
+        with self._lock:
+            if kind == "throttle":
+                self._throttled += 1
+                self._decrease(0.5)
+            else:
+                self._errors += 1
+
+    def backoff_delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """第 attempt 次重试前的等待时间：指数退避 + 抖动（Retry-After 优先）"""
+        hinted = _retry_after(exc) if exc is not None else None
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.5)
+
+    # ---- 调用 ----
+    def invoke(self, runnable: Any, *args, **kwargs) -> Any:
+        """runnable.invoke(*args, **kwargs)，受并发上限控制并按需重试"""
+        attempt = 0
+        while True:
+            self.acquire()
+            saturated = self._in_flight >= int(self.limit)
+            start = time.monotonic()
+            try:
+                result = runnable.invoke(*args, **kwargs)
+            except Exception as e:
+                kind = classify_llm_error(e)
+                self._on_error(kind)
+                if kind == "fatal" or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                error_name = type(e).__name__
+            else:
+                self._on_success(time.monotonic() - start, saturated)
+                return result
+            finally:
+                self._release()
+            with self._lock:
+                self._retries += 1
+            print(f"[llm_limiter] {error_name}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s (limit={int(self.limit)})")
+            time.sleep(delay)
+            attempt += 1
+
+    async def ainvoke(self, runnable: Any, *args, **kwargs) -> Any:
+        """await runnable.ainvoke(*args, **kwargs)，受并发上限控制并按需重试"""
+        attempt = 0
+        while True:
+            await self.aacquire()
+            saturated = self._in_flight >= int(self.limit)
+            start = time.monotonic()
+            try:
+                result = await runnable.ainvoke(*args, **kwargs)
+            except Exception as e:
+                kind = classify_llm_error(e)
+                self._on_error(kind)
+                if kind == "fatal" or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                error_name = type(e).__name__
+            else:
+                self._on_success(time.monotonic() - start, saturated)
+                return result
+            finally:
+                self._release()
+            with self._lock:
+                self._retries += 1
+            print(f"[llm_limiter] {error_name}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s (limit={int(self.limit)})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "ewma_latency_s": round(self._ewma_latency, 3) if self._ewma_latency is not None else None,
+                "successes": self._successes,
+                "throttled": self._throttled,
+                "errors": self._errors,
+                "retries": self._retries,
+            }
+
+
+llm_limiter = AdaptiveLimiter()
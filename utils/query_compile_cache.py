@@ -0,0 +1,162 @@
+# CodeQL 查询编译缓存（跨数据库、跨进程共享）
+#
+# collectors 下的 .ql（尤其 import MMIOAnalyzer.qll / DriverLocator.qll 的）编译很慢，而 query-server 在每个进程里
+# 对每个数据库的第一次 runQuery 都会重新编译。这里在评估前用 `codeql query compile` 把查询编译进共享的编译缓存，
+# query-server 以同一个 --compilation-cache 启动，runQuery 时直接复用编译结果：
+#   <dir>/cache/                                --compilation-cache 目录（编译计划由 CodeQL 自己按内容管理）
+#   <dir>/cache/lcmhal_stamps/<stem>-<key>.json 已编译标记，key = sha256(查询哈希（.ql + 本地 .qll + pack 文件，见 collector_cache）, CodeQL 版本)
+# 标记放在编译缓存目录里面：清空或删除编译缓存时标记一起失效，不会跳过预编译却读不到编译结果。
+# 每个 key 只编译一次（文件锁 + 原子写入标记），批量收集 50 个数据库时每条查询只编译一次。
+# query-server 不支持 --compilation-cache 时不预编译（它不会读取预编译结果，预编译只会多编译一次）。
+#
+# 环境变量：
+#   LCMHAL_QUERY_COMPILE_CACHE       共享目录（默认 ~/.cache/lcmhal/query_compile），=0 关闭预编译
+#   LCMHAL_QUERY_COMPILE_TIMEOUT_S   单条查询预编译的超时（秒，默认 1800），超时后交给 query-server 照常编译
+
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.env import env_int, is_off
+
+STAMP_DIR = "lcmhal_stamps"
+
+_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+# codeql_path -> 版本；(codeql_path, 子命令) -> 是否支持 --compilation-cache
+_versions: Dict[str, str] = {}
+_supports_cache_flag: Dict[Tuple[str, str], bool] = {}
+
+
+def compile_cache_dir() -> Optional[str]:
+    raw = os.environ.get("LCMHAL_QUERY_COMPILE_CACHE", "").strip()
+    if is_off(raw):
+        return None
+    return raw or os.path.join(os.path.expanduser("~"), ".cache", "lcmhal", "query_compile")
+
+
+def codeql_version(codeql_path: str = "codeql") -> str:
+    with _lock:
+        if codeql_path in _versions:
+            return _versions[codeql_path]
+    try:
+        out = subprocess.run([codeql_path, "version", "--format=terse"], capture_output=True, text=True, timeout=120)
+        version = out.stdout.strip() if out.returncode == 0 else ""
+    except (OSError, subprocess.SubprocessError):
+        version = ""
+    with _lock:
+        _versions[codeql_path] = version
+    return version
+
+
+def _supports_cache(codeql_path: str, *subcommand: str) -> bool:
+    """`codeql <subcommand> --help` 中是否列出了 --compilation-cache"""
+    key = (codeql_path, " ".join(subcommand))
+    with _lock:
+        if key in _supports_cache_flag:
+            return _supports_cache_flag[key]
+    try:
+        out = subprocess.run([codeql_path, *subcommand, "--help", "-v"], capture_output=True, text=True, timeout=120)
+        supported = "--compilation-cache" in out.stdout
+    except (OSError, subprocess.SubprocessError):
+        supported = False
+    with _lock:
+        _supports_cache_flag[key] = supported
+    return supported
+
+
+def _cache_args(codeql_path: str, *subcommand: str) -> List[str]:
+    store = compile_cache_dir()
+    if not store or not _supports_cache(codeql_path, *subcommand):
+        return []
+    return [f"--compilation-cache={os.path.join(store, 'cache')}"]
+
+
+def server_args(codeql_path: str = "codeql") -> List[str]:
+    """启动 query-server2 时追加的参数（与预编译使用同一个编译缓存）"""
+    return _cache_args(codeql_path, "execute", "query-server2")
+
+
+def compile_key(query_file: str, codeql_path: str = "codeql") -> Optional[str]:
+    from utils.collector_cache import query_hash
+    version = codeql_version(codeql_path)
+    if not version:
+        return None
+    try:
+        digest = query_hash(query_file)
+    except OSError:
+        return None
+    return hashlib.sha256(f"{digest}:{version}".encode("utf-8")).hexdigest()
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def ensure_compiled(query_file: str, codeql_path: str = "codeql") -> bool:
+    """查询已在共享缓存中编译过（或本次编译成功）时返回 True；失败时返回 False，由 query-server 照常编译并报告错误"""
+    store = compile_cache_dir()
+    if not store or not query_file.endswith(".ql"):
+        return False
+    key = compile_key(query_file, codeql_path)
+    if not key:
+        return False
+    stamp = Path(store) / "cache" / STAMP_DIR / f"{Path(query_file).stem}-{key[:16]}.json"
+    if stamp.exists():
+        return True
+    with _key_lock(key):
+        if stamp.exists():
+            return True
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        # 多个批量进程同时遇到同一条查询时只有一个去编译，其他进程等待后直接复用
+        with open(stamp.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if stamp.exists():
+                    return True
+                return _compile(query_file, codeql_path, key, stamp)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _compile(query_file: str, codeql_path: str, key: str, stamp: Path) -> bool:
+    cmd = [codeql_path, "query", "compile", "--threads=0",
+           *_cache_args(codeql_path, "query", "compile"), str(Path(query_file).resolve())]
+    start = time.monotonic()
+    timeout = max(env_int("LCMHAL_QUERY_COMPILE_TIMEOUT_S", 1800), 1)
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"[WARNING] Precompiling {query_file} timed out after {timeout}s")
+        return False
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"[WARNING] Failed to precompile {query_file}: {e}")
+        return False
+    if out.returncode != 0:
+        reason = (out.stderr.strip().splitlines() or ["compile failed"])[-1]
+        print(f"[WARNING] Failed to precompile {query_file}: {reason}")
+        return False
+    elapsed = time.monotonic() - start
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=str(stamp.parent))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "key": key,
+                "query": str(Path(query_file).resolve()),
+                "codeql_version": codeql_version(codeql_path),
+                "compile_s": round(elapsed, 1),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, stamp)
+    except OSError as e:
+        print(f"[WARNING] Failed to record precompiled query {query_file}: {e}")
+    print(f"[INFO] precompiled {Path(query_file).name} in {elapsed:.1f}s")
+    return True
@@ -1,14 +1,28 @@
 # Replacement code rubric checker.
 # Uses an AI (LLM) with a prompt to validate replacement code generically (no hardcoded
 # function lists). Used before persisting ReplacementUpdate and after FunctionClassifier output.
+#
+# LLM verdicts are memoized by a hash of (function name, normalized original, normalized
+# replacement, rubric prompts, model name): in memory and in <db_path>/lcmhal_tmp/rubric_cache.jsonl,
+# so analyzer retries, VerifyReplacement and the post-classification check never ask twice.
+# Concurrent checks of the same triple share one LLM call. LCMHAL_RUBRIC_CACHE=0 disables the cache.
 
+import asyncio
+import hashlib
+import json
 import re
-from typing import Optional
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from pydantic import BaseModel, Field
 
-from config.model_singleton import get_model
+import config.globs as globs
+from config.model_singleton import get_model, get_model_name
+from utils.env import env_flag
+from utils.llm_limiter import llm_limiter
 from prompts.replacement_rubric_checker import (
     RUBRIC_CHECK_SYSTEM_PROMPT,
     RUBRIC_CHECK_USER_TEMPLATE,
@@ -128,6 +142,161 @@ def _deterministic_rules_check(func_name: str, replacement_code: str, original_c
     return {"pass": True, "reason": ""}
 
 
+RUBRIC_CACHE_FILE = "rubric_cache.jsonl"
+
+_cache_lock = threading.Lock()
+_verdicts: Dict[str, dict] = {}
+_loaded_files: set = set()
+_inflight: Dict[str, Future] = {}
+
+
+def _rubric_cache_enabled() -> bool:
+    return env_flag("LCMHAL_RUBRIC_CACHE", True)
+
+
+def _normalize_code(code: Optional[str]) -> str:
+    """Whitespace-insensitive form: trailing spaces, blank lines and runs of spaces/tabs do not change the key."""
+    lines = (re.sub(r"[ \t]+", " ", ln).strip() for ln in (code or "").splitlines())
+    return "\n".join(ln for ln in lines if ln)
+
+
+_PROMPT_DIGEST = hashlib.sha256("\0".join((
+    RUBRIC_CHECK_SYSTEM_PROMPT, RUBRIC_CHECK_USER_TEMPLATE, RUBRIC_CHECK_USER_TEMPLATE_WITH_ORIGINAL,
+)).encode("utf-8")).hexdigest()
+
+
+def rubric_cache_key(func_name: str, replacement_code: str, original_code: Optional[str]) -> str:
+    h = hashlib.sha256()
+    for part in (_PROMPT_DIGEST, get_model_name(), func_name, _normalize_code(original_code), _normalize_code(replacement_code)):
+        h.update(part.encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+def _cache_file() -> Optional[Path]:
+    db_path = getattr(globs, "db_path", None)
+    return Path(db_path) / "lcmhal_tmp" / RUBRIC_CACHE_FILE if db_path else None
+
+
+def _load_cache_file(path: Path) -> None:
+    """Caller holds _cache_lock. Later lines win, so the file can simply be appended to."""
+    if str(path) in _loaded_files:
+        return
+    _loaded_files.add(str(path))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    _verdicts[entry["key"]] = {"pass": bool(entry["pass"]), "reason": entry.get("reason") or ""}
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+
+
+def _cached_verdict(key: str) -> Optional[dict]:
+    path = _cache_file()
+    with _cache_lock:
+        if path is not None:
+            _load_cache_file(path)
+        verdict = _verdicts.get(key)
+    return dict(verdict) if verdict else None
+
+
+def _store_verdict(key: str, verdict: dict) -> None:
+    path = _cache_file()
+    with _cache_lock:
+        _verdicts[key] = dict(verdict)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "pass": verdict["pass"], "reason": verdict["reason"]}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[WARNING] Failed to persist rubric verdict: {e}")
+
+
+def _claim(key: str) -> Tuple[Future, bool]:
+    """Return (future, owner). The owner runs the LLM call and resolves the future; others wait on it."""
+    with _cache_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut, False
+        fut = Future()
+        if key in _verdicts:
+            # resolved between the cache lookup and here
+            fut.set_result(dict(_verdicts[key]))
+            return fut, False
+        _inflight[key] = fut
+        return fut, True
+
+
+def _resolve(key: str, fut: Future, verdict: dict, cacheable: bool) -> None:
+    if cacheable:
+        _store_verdict(key, verdict)
+    with _cache_lock:
+        _inflight.pop(key, None)
+    fut.set_result(verdict)
+
+
+def _prepare_rubric(func_name: str, replacement_code: str, original_code: Optional[str]):
+    """Run the cheap checks. Returns (final verdict, None, None) or (None, cache key, LLM messages)."""
+    func_name = (func_name or "").strip()
+    replacement_code = (replacement_code or "").strip()
+
+    if not replacement_code:
+        return {"pass": True, "reason": ""}, None, None
+
+    deterministic = _deterministic_rules_check(func_name, replacement_code, original_code)
+    if not deterministic.get("pass", True):
+        return deterministic, None, None
+
+    if original_code and (original_code or "").strip():
+        user_content = RUBRIC_CHECK_USER_TEMPLATE_WITH_ORIGINAL.format(
+            function_name=func_name,
+            original_code=(original_code or "").strip(),
+            replacement_code=replacement_code,
+        )
+    else:
+        user_content = RUBRIC_CHECK_USER_TEMPLATE.format(
+            function_name=func_name,
+            replacement_code=replacement_code,
+        )
+    messages = [
+        SystemMessage(content=RUBRIC_CHECK_SYSTEM_PROMPT),
+        HumanMessage(content=user_content),
+    ]
+    key = rubric_cache_key(func_name, replacement_code, original_code) if _rubric_cache_enabled() else None
+    return None, key, messages
+
+
+def _structured_model():
+    return get_model().with_structured_output(RubricCheckResult, method="json_mode")
+
+
+def _parse_rubric_result(result) -> Tuple[dict, bool]:
+    """Returns (verdict, cacheable). Only an explicit `passed` from the reviewer is cached;
+    an empty or malformed response is let through once but asked again next time."""
+    if isinstance(result, dict):
+        passed, reason = result.get("passed"), result.get("reason")
+    else:
+        passed, reason = getattr(result, "passed", None), getattr(result, "reason", None)
+    if not isinstance(passed, bool):
+        return {"pass": True, "reason": ""}, False
+    return {"pass": passed, "reason": reason or ""}, True
+
+
+def _rubric_error(e: Exception) -> dict:
+    # On LLM/network error, fail closed: reject the replacement so bad code is not persisted.
+    # Caller can retry or fix; accepting on error allowed stub replacements to slip through.
+    # Errors are never cached, so a retry asks the LLM again.
+    return {
+        "pass": False,
+        "reason": f"[Rubric check failed: {e!s}. Replacement not accepted to avoid persisting invalid code.]",
+    }
+
+
 def check_replacement_rubric(
     func_name: str,
     replacement_code: str,
@@ -139,6 +308,7 @@ def check_replacement_rubric(
     2) AI rubric reviewer for broader semantic/CORE preservation checks.
     When original_code is provided, the reviewer compares original vs replacement and
     enforces e.g. that callers of CORE functions must preserve those calls.
+    Verdicts are memoized (see module comment); use acheck_replacement_rubric from async code.
 
     Args:
         func_name: Name of the function being replaced.
@@ -150,51 +320,62 @@ def check_replacement_rubric(
         {"pass": bool, "reason": str}. If pass is False, reason describes what is wrong
         so the caller can feed it back to the AI for regeneration.
     """
-    func_name = (func_name or "").strip()
-    replacement_code = (replacement_code or "").strip()
+    verdict, key, messages = _prepare_rubric(func_name, replacement_code, original_code)
+    if verdict is not None:
+        return verdict
+    if key is None:
+        try:
+            return _parse_rubric_result(llm_limiter.invoke(_structured_model(), messages))[0]
+        except Exception as e:
+            return _rubric_error(e)
 
-    if not replacement_code:
-        return {"pass": True, "reason": ""}
+    cached = _cached_verdict(key)
+    if cached is not None:
+        return cached
+    fut, owner = _claim(key)
+    if not owner:
+        return dict(fut.result())
+    try:
+        verdict, cacheable = _parse_rubric_result(llm_limiter.invoke(_structured_model(), messages))
+    except Exception as e:
+        verdict, cacheable = _rubric_error(e), False
+    except BaseException as e:
+        # cancelled: release the waiters, nothing is cached
+        _resolve(key, fut, _rubric_error(e), False)
+        raise
+    _resolve(key, fut, verdict, cacheable)
+    return dict(verdict)
 
-    deterministic = _deterministic_rules_check(func_name, replacement_code, original_code)
-    if not deterministic.get("pass", True):
-        return deterministic
 
-    if original_code and (original_code or "").strip():
-        user_content = RUBRIC_CHECK_USER_TEMPLATE_WITH_ORIGINAL.format(
-            function_name=func_name,
-            original_code=(original_code or "").strip(),
-            replacement_code=replacement_code,
-        )
-    else:
-        user_content = RUBRIC_CHECK_USER_TEMPLATE.format(
-            function_name=func_name,
-            replacement_code=replacement_code,
-        )
+async def acheck_replacement_rubric(
+    func_name: str,
+    replacement_code: str,
+    original_code: Optional[str] = None,
+) -> dict:
+    """Async variant of check_replacement_rubric: the LLM call uses ainvoke, so other
+    classifications on the same event loop keep running while the rubric is checked."""
+    verdict, key, messages = _prepare_rubric(func_name, replacement_code, original_code)
+    if verdict is not None:
+        return verdict
+    if key is None:
+        try:
+            return _parse_rubric_result(await llm_limiter.ainvoke(_structured_model(), messages))[0]
+        except Exception as e:
+            return _rubric_error(e)
 
+    cached = _cached_verdict(key)
+    if cached is not None:
+        return cached
+    fut, owner = _claim(key)
+    if not owner:
+        return dict(await asyncio.wrap_future(fut))
     try:
-        model = get_model()
-        structured_model = model.with_structured_output(RubricCheckResult, method="json_mode")
-        messages = [
-            SystemMessage(content=RUBRIC_CHECK_SYSTEM_PROMPT),
-            HumanMessage(content=user_content),
-        ]
-        result = structured_model.invoke(messages)
-        if result is None:
-            return {"pass": True, "reason": ""}
-        if isinstance(result, dict):
-            return {
-                "pass": result.get("passed", True),
-                "reason": result.get("reason") or "",
-            }
-        return {
-            "pass": getattr(result, "passed", True),
-            "reason": getattr(result, "reason", "") or "",
-        }
+        verdict, cacheable = _parse_rubric_result(await llm_limiter.ainvoke(_structured_model(), messages))
     except Exception as e:
-        # On LLM/network error, fail closed: reject the replacement so bad code is not persisted.
-        # Caller can retry or fix; accepting on error allowed stub replacements to slip through.
-        return {
-            "pass": False,
-            "reason": f"[Rubric check failed: {e!s}. Replacement not accepted to avoid persisting invalid code.]",
-        }
+        verdict, cacheable = _rubric_error(e), False
+    except BaseException as e:
+        # cancelled: release the waiters, nothing is cached
+        _resolve(key, fut, _rubric_error(e), False)
+        raise
+    _resolve(key, fut, verdict, cacheable)
+    return dict(verdict)
@@ -0,0 +1,152 @@
+# 单个源文件的定义索引：定义前的注释块 + 定义范围
+#
+# 每个文件只扫描一次：
+#   - 注释块区间（与原先逐行扫描的规则一致：行内出现 "/*" 开始、出现 "*/" 结束），
+#     取某一行之前最近的注释 = 对区间起点 bisect；
+#   - 每行的大括号净增量与行内第一个 '{' / '}' / ';'（跳过字符串、字符常量与注释），
+#     以及每行结束时的累计深度：定义从起始行后第一个 '{' 开始，到深度回到起始深度的行结束（见 extract），
+#     '{' 之前先遇到 ';'（函数原型、变量声明）说明不是定义，不再向后扫描；
+#   - CodeQL 给出定义的结束行/列时直接校验并切片（见 span）。
+# 由 SourceFile.definition_index 按需构建并随源码缓存复用（见 utils.db_source）。
+
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+
+def _brace_deltas(lines: List[str]) -> Tuple[List[int], List[str]]:
+    """每行 '{' 与 '}' 的差值，以及每行第一个 '{' / '}' / ';'（没有时为 ""）；
+    字符串/字符常量/注释中的字符不计，块注释可跨行"""
+    deltas = []
+    firsts = []
+    in_block = False
+    for line in lines:
+        depth = 0
+        first = ""
+        quote = None
+        i, n = 0, len(line)
+        while i < n:
+            c = line[i]
+            if in_block:
+                if c == "*" and line.startswith("*/", i):
+                    in_block = False
+                    i += 2
+                    continue
+            elif quote:
+                if c == "\\":
+                    i += 2
+                    continue
+                if c == quote:
+                    quote = None
+            elif c == "/" and line.startswith("//", i):
+                break
+            elif c == "/" and line.startswith("/*", i):
+                in_block = True
+                i += 2
+                continue
+            elif c == '"' or c == "'":
+                quote = c
+            elif c == "{":
+                depth += 1
+                first = first or c
+            elif c == "}":
+                depth -= 1
+                first = first or c
+            elif c == ";":
+                first = first or c
+            i += 1
+        deltas.append(depth)
+        firsts.append(first)
+    return deltas, firsts
+
+
+def _comment_spans(lines: List[str]) -> List[Tuple[int, int]]:
+    """注释块 [(起始下标, 结束下标)]；未闭合的注释延续到文件末尾"""
+    spans = []
+    start = None
+    for i, line in enumerate(lines):
+        if start is None and "/*" in line:
+            start = i
+        if start is not None and "*/" in line:
+            spans.append((start, i))
+            start = None
+    if start is not None:
+        spans.append((start, len(lines) - 1))
+    return spans
+
+
+class DefinitionIndex:
+    """lines 为 str.splitlines() 得到的行列表（行号从 1 开始）"""
+
+    __slots__ = ("lines", "_spans", "_span_starts", "_firsts", "_depths")
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self._spans = _comment_spans(lines)
+        self._span_starts = [s for s, _ in self._spans]
+        deltas, self._firsts = _brace_deltas(lines)
+        self._depths = list(accumulate(deltas))
+
+    def leading_comment(self, start_line: int) -> str:
+        """start_line 之前最近的注释块（每行 strip 后以换行结尾）；注释跨过 start_line 时只取之前的部分"""
+        k = bisect_right(self._span_starts, start_line - 2) - 1
+        if k < 0:
+            return ""
+        start, end = self._spans[k]
+        end = min(end, start_line - 2)
+        return "".join(self.lines[i].strip() + "\n" for i in range(start, end + 1))
+
+    def extract(self, start_line: int, max_size: int) -> Tuple[str, Dict[int, str]]:
+        """从 start_line 开始的结构体/函数定义：返回 (最近的注释 + 定义, {行号: 行内容})；不是定义时返回 ("", {})。
+        定义体超过 max_size 时截断"""
+        lines = self.lines
+        if start_line < 1 or start_line > len(lines):
+            print("Invalid start-line number, may be different definition.")
+            return "", {}
+        base = self._depths[start_line - 2] if start_line > 1 else 0
+        # 定义体从第一个 '{' 开始；之前先遇到 ';'（原型/声明）或 '}'（起始行在别的定义内部）说明不是定义
+        opened = start_line - 1
+        while opened < len(lines) and not self._firsts[opened]:
+            opened += 1
+        if opened == len(lines) or self._firsts[opened] != "{":
+            return "", {}
+        # 深度回到 base 的第一行即对应的 '}' 所在行；不平衡时取到文件末尾
+        end = opened
+        while end < len(lines) - 1 and self._depths[end] > base:
+            end += 1
+        content_in_lines: Dict[int, str] = {}
+        content_length = 0
+        for idx in range(start_line - 1, end + 1):
+            # 检查是否超过了全局数组的大小
+            if content_length + len(lines[idx]) >= max_size:
+                print("Struct definition exceeds max size.")
+                break
+            content_in_lines[idx + 1] = lines[idx]
+            content_length += len(lines[idx])
+        if not content_in_lines:
+            return "", {}
+        content = "".join(line + "\n" for line in content_in_lines.values())
+        return self.leading_comment(start_line) + content, content_in_lines
+
+    def span(self, start_line: int, end_line: Optional[int], end_col: Optional[int],
+             max_size: int) -> Tuple[str, Dict[int, str]]:
+        """按 CodeQL 给出的定义范围 [start_line, end_line] 直接切片（返回值同 extract）。
+        范围内大括号不平衡、结束列不是 '}'、没有定义体、包含多个定义（起止来自同名函数的不同定义）
+        或超过 max_size 时退回 extract"""
+        lines = self.lines
+        if not end_line or start_line < 1 or end_line < start_line or end_line > len(lines):
+            return self.extract(start_line, max_size)
+        if end_col and lines[end_line - 1][end_col - 1:end_col] != "}":
+            return self.extract(start_line, max_size)
+        base = self._depths[start_line - 2] if start_line > 1 else 0
+        body = lines[start_line - 1:end_line]
+        if self._depths[end_line - 1] != base or not any("{" in line for line in body) \
+                or sum(len(line) for line in body) >= max_size:
+            return self.extract(start_line, max_size)
+        # 定义体打开后在 end_line 之前回到起始深度：范围内不止一个定义
+        inner = self._depths[start_line - 1:end_line - 1]
+        opened = next((i for i, depth in enumerate(inner) if depth > base), len(inner))
+        if any(depth <= base for depth in inner[opened:]):
+            return self.extract(start_line, max_size)
+        content_in_lines = dict(zip(range(start_line, end_line + 1), body))
+        return self.leading_comment(start_line) + "".join(line + "\n" for line in body), content_in_lines
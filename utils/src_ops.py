@@ -167,20 +167,63 @@ def src_replace(file_path: str, old_code: str, replace_code: str) -> str:
         print(f"Diff information saved to: {diff_filepath}")
         
         return ""
+    content = apply_src_replacement(file_path, content, old_code, replace_code)
+    # print(f"Modifying src file {file_path}")
+
+    # 写回文件时使用UTF-8编码
+    write_src_file(file_path, content)
+    return content
+
+def apply_src_replacement(file_path: str, content: str, old_code: str, replace_code: str) -> str:
+    """
+    在内存中对文件内容做与 src_replace 相同的替换（不读写文件），调用方需保证 old_code 在 content 中
+    """
     # 检查是否已经包含了弱函数定义，没有则添加（防止编译错误）
     # 只在 .c 文件中添加，不添加到 .h 头文件（避免头文件被包含时产生重复定义）
     if weak_funcdef not in content and not file_path.endswith('.h'):
         content = weak_funcdef + content
-    # 处理转义字符：将 \n 转换为真正的换行符
-    # JSON存储时 \n 是转义形式，需要解码为真正的换行符
-    replace_code_decoded = replace_code.encode('utf-8').decode('unicode_escape')
-    content = content.replace(old_code, replace_code_decoded)
-    # print(f"Modifying src file {file_path}")
+    return content.replace(old_code, decode_replacement_code(replace_code))
 
-    # 写回文件时使用UTF-8编码
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    return content
+def decode_replacement_code(replace_code: str) -> str:
+    """
+    处理转义字符：将 \\n 转换为真正的换行符
+    JSON存储时 \\n 是转义形式，需要解码为真正的换行符
+    """
+    return replace_code.encode('utf-8').decode('unicode_escape')
+
+def write_src_file(file_path: str, content) -> bool:
+    """
+    写入临时文件后替换原文件（str 按 UTF-8 编码），不在原 inode 上截断重写，
+    这样与构建工作区（tools/builder/workspace.py 的 hardlink 副本）共享 inode 的文件不会被一起改掉。
+    内容与现有文件相同时不写入（保留 mtime，增量编译不会重编该文件），返回是否写入
+    """
+    import os
+    import tempfile
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    try:
+        if os.path.getsize(file_path) == len(data):
+            with open(file_path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    dir_name = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".lcmhal-", dir=dir_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+        return True
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
 
 def src_insert(file_path: str, insert_code: str, start_line: int = -1) -> str:
     """